@@ -0,0 +1,246 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Offline benchmark of the i3-xfce roles.
+
+Each part is installed then uninstalled against a throwaway home directory and
+system root. The modules and commands reaching the network or the package
+database are replaced by stubs recording their calls, so no network is needed.
+Wall time, number of task results and peak RSS are reported for each phase.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import getpass
+import logging
+import argparse
+import tempfile
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHDIR, "..", "src"))
+
+# Ansible modules replaced by stub_module.py
+STUBBED_MODULES = ["apt", "apt_repository", "pip", "git", "get_url", "i3xfce_build"]
+# Commands run by shell tasks and replaced by a script recording their calls
+STUBBED_COMMANDS = ["apt-get", "pip", "git", "chsh", "cmake", "make"]
+
+STUB_COMMAND = """#!/bin/sh
+echo "{name} $*" >> "$I3XFCE_BENCH_RECORD"
+sleep "$I3XFCE_BENCH_LATENCY"
+"""
+
+# Stock xfce4-session.xml the base role edits
+SESSION_FIXTURE = """<?xml version="1.0" encoding="UTF-8"?>
+
+<channel name="xfce4-session" version="1.0">
+  <property name="general" type="empty">
+    <property name="FailsafeSessionName" type="string" value="Failsafe"/>
+  </property>
+  <property name="sessions" type="empty">
+    <property name="Failsafe" type="empty">
+      <property name="IsFailsafe" type="bool" value="true"/>
+      <property name="Count" type="int" value="5"/>
+      <property name="Client0_Command" type="array">
+        <value type="string" value="xfwm4"/>
+      </property>
+      <property name="Client0_PerScreen" type="bool" value="false"/>
+      <property name="Client1_Command" type="array">
+        <value type="string" value="xfsettingsd"/>
+      </property>
+      <property name="Client1_PerScreen" type="bool" value="false"/>
+      <property name="Client2_Command" type="array">
+        <value type="string" value="xfce4-panel"/>
+      </property>
+      <property name="Client2_PerScreen" type="bool" value="false"/>
+      <property name="Client3_Command" type="array">
+        <value type="string" value="Thunar"/>
+        <value type="string" value="--daemon"/>
+      </property>
+      <property name="Client3_PerScreen" type="bool" value="false"/>
+      <property name="Client4_Command" type="array">
+        <value type="string" value="xfdesktop"/>
+      </property>
+      <property name="Client4_PerScreen" type="bool" value="false"/>
+    </property>
+  </property>
+  <property name="splash" type="empty">
+    <property name="Engine" type="string" value="mice"/>
+  </property>
+</channel>
+"""
+
+FIXTURES = {
+    "etc/xdg/xfce4/xfconf/xfce-perchannel-xml/xsettings.xml": """<?xml version="1.0" encoding="UTF-8"?>
+
+<channel name="xsettings" version="1.0">
+  <property name="Net" type="empty">
+    <property name="ThemeName" type="string" value="Greybird"/>
+    <property name="IconThemeName" type="string" value="elementary-xfce-dark"/>
+  </property>
+</channel>
+""",
+    "etc/lightdm/lightdm-gtk-greeter.conf": "[greeter]\n",
+    "usr/share/applications/xfce-wm-settings.desktop": "[Desktop Entry]\nName=Window Manager\n",
+    "etc/xdg/xfce4/xfconf/xfce-perchannel-xml/xfce4-session.xml": SESSION_FIXTURE,
+}
+
+def create_sandbox(root):
+  """
+  Create the throwaway home, system root and stubs
+  """
+  sandbox = dict((name, os.path.join(root, name)) for name in ["home", "sysroot", "cache", "state", "modules", "bin",
+                                                                 "records"])
+  for path in sandbox.values():
+    os.makedirs(path)
+
+  for relpath, content in FIXTURES.items():
+    path = os.path.join(sandbox["sysroot"], relpath)
+    if not os.path.isdir(os.path.dirname(path)):
+      os.makedirs(os.path.dirname(path))
+    with open(path, "w") as fixture:
+      fixture.write(content)
+  for relpath in ["usr/share/backgrounds", "usr/local/bin"]:
+    os.makedirs(os.path.join(sandbox["sysroot"], relpath))
+
+  with open(os.path.join(BENCHDIR, "stub_module.py")) as stub:
+    stub_source = stub.read()
+  for name in STUBBED_MODULES:
+    with open(os.path.join(sandbox["modules"], name + ".py"), "w") as module:
+      module.write(stub_source.replace('MODULE_NAME = "stub"', 'MODULE_NAME = "{}"'.format(name)))
+  for name in STUBBED_COMMANDS:
+    path = os.path.join(sandbox["bin"], name)
+    with open(path, "w") as command:
+      command.write(STUB_COMMAND.format(name=name))
+    os.chmod(path, 0o755)
+  return sandbox
+
+def execute_phase(action, part, sandbox, args):
+  """
+  Execute an action on a part in the current process, returns the number of task results
+  """
+  # Imported here so that the parent process does not pay for ansible
+  import i3xfce.loggers
+  from ansible.plugins import module_loader
+
+  i3xfce.loggers.init_loggers()
+  i3xfce.loggers.set_log_level(logging.DEBUG if args.verbose else logging.ERROR)
+  module_loader.add_directory(sandbox["modules"])
+  cli = i3xfce.core.CmdLine()
+  cli_args = cli.parse_args(["i3-xfce", action, "-p", part, "--user", getpass.getuser(),
+                             "--home", sandbox["home"], "--sysroot", sandbox["sysroot"],
+                             "--cache-dir", sandbox["cache"], "--state-dir", sandbox["state"]])
+  try:
+    cli.execute_action(action, cli_args)
+  finally:
+    results_nb = 0
+    if cli._results_callback is not None: # pylint: disable=protected-access
+      for report in cli._results_callback.get_hosts_report().values(): # pylint: disable=protected-access
+        results_nb += report["ok"] + report["failed"] + report["skipped"] + report["unreachable"]
+  return results_nb
+
+def run_phase(action, part, sandbox, args):
+  """
+  Run a phase in a child process to measure its own peak RSS
+  """
+  record_file = os.path.join(sandbox["records"], "{}-{}.log".format(action, part))
+  read_fd, write_fd = os.pipe()
+  start = time.time()
+  pid = os.fork()
+  if pid == 0:
+    os.close(read_fd)
+    os.environ["PATH"] = sandbox["bin"] + os.pathsep + os.environ["PATH"]
+    os.environ["I3XFCE_BENCH_RECORD"] = record_file
+    os.environ["I3XFCE_BENCH_LATENCY"] = str(args.latency)
+    # The stubs leave their files in the sandbox, never in the paths of the host the roles name
+    os.environ["I3XFCE_BENCH_ROOT"] = os.path.dirname(sandbox["home"])
+    os.environ["I3XFCE_BENCH_SYSROOT"] = sandbox["sysroot"]
+    if not args.verbose:
+      devnull = os.open(os.devnull, os.O_WRONLY)
+      os.dup2(devnull, 1)
+      os.dup2(devnull, 2)
+    res = dict(tasks=0, error=None)
+    try:
+      res["tasks"] = execute_phase(action, part, sandbox, args)
+    except BaseException as exc: # pylint: disable=broad-except
+      res["error"] = str(exc) or exc.__class__.__name__
+    os.write(write_fd, json.dumps(res))
+    os._exit(0) # pylint: disable=protected-access
+
+  os.close(write_fd)
+  output = ""
+  while True:
+    chunk = os.read(read_fd, 4096)
+    if not chunk:
+      break
+    output += chunk
+  os.close(read_fd)
+  _, _, rusage = os.wait4(pid, 0)
+  res = json.loads(output) if output else dict(tasks=0, error="Phase crashed")
+  calls = 0
+  if os.path.exists(record_file):
+    with open(record_file) as record:
+      calls = len(record.readlines())
+  res.update(action=action, part=part, wall_time=time.time() - start, peak_rss_kb=rusage.ru_maxrss,
+             stubbed_calls=calls)
+  return res
+
+def main():
+  """
+  Main function
+  """
+  import i3xfce.core
+  roles_dir = i3xfce.core.ROLESDIR
+  parts = sorted(os.listdir(os.path.join(roles_dir, "install")))
+
+  parser = argparse.ArgumentParser(description="Offline benchmark of the i3-xfce roles")
+  parser.add_argument("--parts", "-p", action="append", choices=parts, help="Parts to benchmark")
+  parser.add_argument("--latency", type=float, default=0.0, help="Latency added to every stubbed call in seconds")
+  parser.add_argument("--output", "-o", type=str, default=None, help="Write the results to this JSON file")
+  parser.add_argument("--keep", action="store_true", default=False, help="Keep the sandbox directory")
+  parser.add_argument("--verbose", action="store_true", default=False, help="Show the i3-xfce output")
+  args = parser.parse_args()
+
+  root = tempfile.mkdtemp(prefix="i3xfce-bench-")
+  results = []
+  try:
+    sandbox = create_sandbox(root)
+    for part in args.parts or parts:
+      for action in ["install", "uninstall"]:
+        res = run_phase(action, part, sandbox, args)
+        results.append(res)
+        print "{:<10} {:<10} {:>8.2f}s {:>5} tasks {:>5} stubbed calls {:>8} KB peak RSS {}".format(
+            action, part, res["wall_time"], res["tasks"], res["stubbed_calls"], res["peak_rss_kb"],
+            "FAILED: {}".format(res["error"]) if res["error"] else "")
+  finally:
+    if args.keep:
+      print "Sandbox kept in {}".format(root)
+    else:
+      shutil.rmtree(root, ignore_errors=True)
+
+  if args.output is not None:
+    with open(args.output, "w") as output:
+      json.dump(results, output, indent=2, sort_keys=True)
+  sys.exit(1 if any(res["error"] for res in results) else 0)
+
+if __name__ == "__main__":
+  main()
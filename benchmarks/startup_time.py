@@ -0,0 +1,113 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Benchmark of the i3-xfce command line startup.
+
+The help and version commands are timed in fresh interpreters, and the modules
+loaded while parsing the command line are checked: Ansible, progressbar and
+pkg_resources must only be loaded when an action is executed.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+SRCDIR = os.path.join(BENCHDIR, "..", "src")
+
+COMMANDS = [["--help"], ["--version"], ["install", "--help"]]
+FORBIDDEN_MODULES = ["ansible", "progressbar", "pkg_resources", "yaml"]
+
+LOADED_MODULES_SCRIPT = """
+import sys
+import json
+import i3xfce.core
+try:
+  i3xfce.core.CmdLine.parse_args(["i3-xfce"] + sys.argv[1:])
+except SystemExit:
+  pass
+sys.stderr.write(json.dumps(sorted(sys.modules.keys())))
+"""
+
+def get_env():
+  """
+  Get the environment of the benchmarked interpreters
+  """
+  env = dict(os.environ)
+  env["PYTHONPATH"] = SRCDIR + os.pathsep + env.get("PYTHONPATH", "")
+  return env
+
+def time_command(cmd, runs):
+  """
+  Time a command line in fresh interpreters, returns the duration of each run
+  """
+  res = []
+  with open(os.devnull, "w") as devnull:
+    for _ in range(runs):
+      start = time.time()
+      subprocess.call([sys.executable, "-m", "i3xfce"] + cmd, stdout=devnull, stderr=devnull, env=get_env())
+      res.append(time.time() - start)
+  return res
+
+def get_forbidden_modules(cmd):
+  """
+  Get the forbidden modules loaded while parsing a command line
+  """
+  proc = subprocess.Popen([sys.executable, "-c", LOADED_MODULES_SCRIPT] + cmd, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, env=get_env())
+  _, err = proc.communicate()
+  modules = json.loads(err.splitlines()[-1])
+  return sorted(set(module.split(".")[0] for module in modules) & set(FORBIDDEN_MODULES))
+
+def main():
+  """
+  Main function
+  """
+  parser = argparse.ArgumentParser(description="Benchmark of the i3-xfce command line startup")
+  parser.add_argument("--runs", "-n", type=int, default=10, help="Number of runs of each command")
+  parser.add_argument("--max-time", type=float, default=None,
+                      help="Fail when the median startup time of a command exceeds this number of seconds")
+  parser.add_argument("--output", "-o", type=str, default=None, help="Write the results to this JSON file")
+  args = parser.parse_args()
+
+  results = []
+  failed = False
+  for cmd in COMMANDS:
+    durations = sorted(time_command(cmd, args.runs))
+    median = durations[len(durations) // 2]
+    forbidden = get_forbidden_modules(cmd)
+    results.append(dict(command=" ".join(cmd), min=durations[0], median=median, max=durations[-1],
+                        forbidden_modules=forbidden))
+    print "{:<18} min {:>6.3f}s median {:>6.3f}s max {:>6.3f}s {}".format(
+        " ".join(cmd), durations[0], median, durations[-1],
+        "LOADS: {}".format(", ".join(forbidden)) if forbidden else "")
+    if forbidden or (args.max_time is not None and median > args.max_time):
+      failed = True
+
+  if args.output is not None:
+    with open(args.output, "w") as output:
+      json.dump(results, output, indent=2, sort_keys=True)
+  sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+  main()
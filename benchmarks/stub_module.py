@@ -0,0 +1,71 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Ansible module stub recording its calls instead of touching the network or the package database.
+The benchmark copies this file once per stubbed module and sets MODULE_NAME in each copy.
+"""
+
+import os
+import json
+import time
+import fcntl
+
+from ansible.module_utils.basic import AnsibleModule
+
+MODULE_NAME = "stub"
+
+def get_sandbox_path(path):
+  """
+  Get the path a stub writes instead of a destination, the ones outside of the sandbox are moved in its system root
+  """
+  root = os.getenv("I3XFCE_BENCH_ROOT")
+  if root is None:
+    return None
+  if path.startswith(root + "/"):
+    return path
+  return os.path.join(os.getenv("I3XFCE_BENCH_SYSROOT", root), path.lstrip("/"))
+
+def main():
+  """
+  Module entry point
+  """
+  module = AnsibleModule(argument_spec=dict(), check_invalid_arguments=False, supports_check_mode=True)
+  params = dict((key, value) for key, value in module.params.items() if not key.startswith("_ansible"))
+
+  record_file = os.getenv("I3XFCE_BENCH_RECORD")
+  if record_file is not None:
+    with open(record_file, "a") as record:
+      fcntl.flock(record, fcntl.LOCK_EX)
+      record.write(json.dumps(dict(module=MODULE_NAME, params=params, time=time.time())) + "\n")
+  time.sleep(float(os.getenv("I3XFCE_BENCH_LATENCY", "0")))
+
+  # Leave behind what the following tasks expect to find
+  dest = get_sandbox_path(str(params["dest"])) if params.get("dest") is not None else None
+  if not module.check_mode and dest is not None:
+    if MODULE_NAME == "git" and not os.path.isdir(dest):
+      os.makedirs(dest)
+    elif MODULE_NAME == "get_url" and not os.path.exists(dest):
+      if not os.path.isdir(os.path.dirname(dest)):
+        os.makedirs(os.path.dirname(dest))
+      open(dest, "w").close()
+  module.exit_json(changed=True, stub=MODULE_NAME)
+
+if __name__ == "__main__":
+  main()
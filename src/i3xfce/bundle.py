@@ -0,0 +1,238 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce bundle module
+
+A bundle is an archive of everything the selected parts download: a local
+apt repository, a wheelhouse, git mirrors and tarballs. Importing a bundle
+seeds the cache directory so that the install does not reach the network.
+"""
+
+import os
+import gzip
+import json
+import time
+import shutil
+import urllib2
+import urlparse
+import tarfile
+import tempfile
+import subprocess
+
+import i3xfce
+import i3xfce.loggers
+import i3xfce.phases
+from i3xfce.manifest import get_part_packages, render_path
+
+BUNDLE_VERSION = 1
+BUNDLE_FILE = "bundle.json"
+APT_DIR = "apt"
+WHEELS_DIR = "wheels"
+GIT_DIR = "git"
+TARBALLS_DIR = "tarballs"
+
+class BundleException(Exception):
+  """
+  Exception raised when a bundle cannot be exported or imported
+  """
+
+  def __init__(self, msg):
+    """
+    Constructor
+    """
+    Exception.__init__(self)
+    self._msg = msg
+
+  def __str__(self):
+    """
+    Convert exception to string
+    """
+    return self._msg
+
+def _run(cmd, cwd=None):
+  """
+  Run a command and return its output, raise a BundleException when it fails
+  """
+  i3xfce.loggers.ROOTLOGGER.debug("Running %s", " ".join(cmd))
+  try:
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  except OSError as exc:
+    raise BundleException("Unable to run {}: {}".format(cmd[0], exc))
+  out, err = proc.communicate()
+  if proc.returncode != 0:
+    raise BundleException("Command '{}' failed: {}".format(" ".join(cmd), err.strip()))
+  return out
+
+def _get_variable(value):
+  """
+  Get the name of the variable a task argument consists of, None if it is not a single variable
+  """
+  value = value.strip()
+  if not value.startswith("{{") or not value.endswith("}}"):
+    return None
+  name = value[2:-2].strip()
+  return name if name.replace("_", "").isalnum() else None
+
+class BundleExporter(object):
+  """
+  Class collecting what the selected parts download into a bundle
+  """
+
+  def __init__(self, planner, parts):
+    """
+    Constructor
+    """
+    self._planner = planner
+    self._parts = parts
+    self._plan = planner.plan("install", parts)
+    self._defaults = {}
+    for part in parts:
+      self._defaults.update(planner.get_role_defaults("install", part))
+
+  def _export_packages(self, apt_dir):
+    """
+    Download the apt packages and their dependencies and index them as a flat repository
+    """
+    packages = []
+    for part in self._parts:
+      packages.extend([pkg for pkg in get_part_packages(self._plan, part) if pkg not in packages])
+    if len(packages) == 0:
+      return packages
+    out = _run(["apt-cache", "depends", "--recurse", "--no-recommends", "--no-suggests", "--no-conflicts",
+                "--no-breaks", "--no-replaces", "--no-enhances"] + packages)
+    # Dependencies are indented and virtual packages are between angle brackets
+    names = sorted(set(line.strip() for line in out.splitlines() if line.strip() and line[0] not in " <"))
+    i3xfce.loggers.ROOTLOGGER.info("Downloading %i apt packages", len(names))
+    _run(["apt-get", "download", "-q"] + names, cwd=apt_dir)
+    index = _run(["apt-ftparchive", "packages", "."], cwd=apt_dir)
+    with open(os.path.join(apt_dir, "Packages"), "w") as index_file:
+      index_file.write(index)
+    with gzip.open(os.path.join(apt_dir, "Packages.gz"), "wb") as index_file:
+      index_file.write(index)
+    return packages
+
+  def _export_wheels(self, wheels_dir):
+    """
+    Build the wheels of the pip packages
+    """
+    pip_packages = self._defaults.get("pip_packages", [])
+    if len(pip_packages) != 0:
+      i3xfce.loggers.ROOTLOGGER.info("Building %i python packages", len(pip_packages))
+      _run(["pip", "wheel", "-q", "--wheel-dir={}".format(wheels_dir)] + pip_packages)
+    return pip_packages
+
+  def _export_sources(self, bundle_dir):
+    """
+    Mirror the git repositories and download the tarballs, returns the variables to override at import
+    """
+    overrides = {}
+    for task in self._plan.get_tasks():
+      if task.module == "git":
+        arg = "repo"
+      elif task.module == "get_url":
+        arg = "url"
+      else:
+        continue
+      var = _get_variable(task.args.get(arg, ""))
+      url = render_path(task.args.get(arg, ""), self._defaults)
+      if var is None or url is None:
+        raise BundleException("The {} of task '{}' must be given by a role default to be bundled".format(
+            arg, task.name))
+      name = os.path.basename(urlparse.urlparse(url).path.rstrip("/"))
+      if task.module == "git":
+        path = os.path.join(GIT_DIR, name if name.endswith(".git") else name + ".git")
+        i3xfce.loggers.ROOTLOGGER.info("Mirroring %s", url)
+        _run(["git", "clone", "-q", "--mirror", url, os.path.join(bundle_dir, path)])
+      else:
+        path = os.path.join(TARBALLS_DIR, name)
+        i3xfce.loggers.ROOTLOGGER.info("Downloading %s", url)
+        try:
+          response = urllib2.urlopen(url)
+          with open(os.path.join(bundle_dir, path), "wb") as tarball:
+            shutil.copyfileobj(response, tarball)
+        except (urllib2.URLError, IOError) as exc:
+          raise BundleException("Unable to download {}: {}".format(url, exc))
+      overrides[var] = dict(module=task.module, path=path)
+    return overrides
+
+  def export(self, output):
+    """
+    Export the bundle to an archive, the archive appears atomically
+    """
+    work_dir = tempfile.mkdtemp(prefix="i3xfce-bundle-")
+    try:
+      for subdir in [APT_DIR, WHEELS_DIR, GIT_DIR, TARBALLS_DIR]:
+        os.makedirs(os.path.join(work_dir, subdir))
+      content = dict(version=BUNDLE_VERSION,
+                     i3xfce_version=i3xfce.__version__,
+                     created=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+                     parts=self._parts,
+                     packages=self._export_packages(os.path.join(work_dir, APT_DIR)),
+                     pip_packages=self._export_wheels(os.path.join(work_dir, WHEELS_DIR)),
+                     overrides=self._export_sources(work_dir))
+      with open(os.path.join(work_dir, BUNDLE_FILE), "w") as bundle_file:
+        json.dump(content, bundle_file, indent=2, sort_keys=True)
+
+      output = os.path.abspath(output)
+      tmp_fd, tmp_output = tempfile.mkstemp(dir=os.path.dirname(output), suffix=".tmp")
+      os.close(tmp_fd)
+      try:
+        with tarfile.open(tmp_output, "w:gz") as archive:
+          # The temporary directory itself is not archived, its mode would replace the one of the cache directory
+          for name in sorted(os.listdir(work_dir)):
+            archive.add(os.path.join(work_dir, name), arcname=name)
+        os.rename(tmp_output, output)
+      finally:
+        if os.path.exists(tmp_output):
+          os.remove(tmp_output)
+    finally:
+      shutil.rmtree(work_dir, ignore_errors=True)
+    i3xfce.loggers.ROOTLOGGER.info("Bundle of %s written to %s", ", ".join(self._parts), output)
+
+def import_bundle(path, cache_dir, parts):
+  """
+  Extract a bundle in the cache directory, returns the variables making the play use it
+  """
+  try:
+    with tarfile.open(path) as archive:
+      members = []
+      for member in archive.getmembers():
+        if os.path.isabs(member.name) or ".." in member.name.split("/"):
+          raise BundleException("Bundle {} contains the unsafe path {}".format(path, member.name))
+        # The root entry of the archive would change the mode and owner of the cache directory
+        if os.path.normpath(member.name) != ".":
+          members.append(member)
+      archive.extractall(cache_dir, members)
+    with open(os.path.join(cache_dir, BUNDLE_FILE)) as bundle_file:
+      content = json.load(bundle_file)
+  except (IOError, OSError, ValueError, tarfile.TarError) as exc:
+    raise BundleException("Unable to import bundle {}: {}".format(path, exc))
+  if content.get("version") != BUNDLE_VERSION:
+    raise BundleException("Bundle {} was exported by an incompatible version of i3-xfce".format(path))
+  missing = [part for part in parts if part not in content.get("parts", [])]
+  if len(missing) != 0:
+    raise BundleException("Bundle {} does not contain the parts {}".format(path, ", ".join(missing)))
+  i3xfce.loggers.ROOTLOGGER.info("Bundle exported on %s imported in %s", content.get("created"), cache_dir)
+
+  res = {i3xfce.phases.OFFLINE_VAR: True}
+  for var, override in content.get("overrides", {}).items():
+    location = os.path.join(cache_dir, override["path"])
+    res[var] = "file://" + location if override["module"] == "get_url" else location
+  return res
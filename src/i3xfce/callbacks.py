@@ -0,0 +1,395 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3xfce callbacks module
+"""
+
+import sys
+import json
+import time
+import logging
+import threading
+
+try:
+  from ansible.plugins.callback import CallbackBase
+except ImportError:
+  sys.exit("ansible package is missing")
+
+try:
+  import progressbar
+except ImportError:
+  sys.exit("progressbar2 package is missing")
+
+import i3xfce.loggers
+from i3xfce.profiler import profiled
+from i3xfce.scheduler import SCHEDULER_VAR
+from i3xfce.journal import JOURNAL_VAR, parse_task_id
+
+# Maximum length of a task result kept in the crash buffer
+MAX_RESULT_LEN = 4096
+
+def format_result(result):
+  """
+  Serialize the result of a task, truncated so that the crash buffer keeps many of them
+  """
+  res = json.dumps(result, default=str, sort_keys=True)
+  if len(res) > MAX_RESULT_LEN:
+    res = res[:MAX_RESULT_LEN] + "... ({} characters truncated)".format(len(res) - MAX_RESULT_LEN)
+  return res
+
+class TaskCountCallback(CallbackBase):
+  """
+  Ansible callback used to count tasks
+  """
+
+  _total_tasks_num = 0
+  _task_name_max_len = 0
+
+  def v2_playbook_on_task_start(self, task, is_conditional):
+    """
+    Function executed when a task starts
+    """
+    i3xfce.loggers.ROOTLOGGER.debug("Counted task: %s", task)
+    self._total_tasks_num = self._total_tasks_num + 1
+    if len(task.name) > self._task_name_max_len:
+      self._task_name_max_len = len(task.name)
+
+  def get_total_tasks_num(self):
+    """
+    Get the total number of tasks being executed
+    """
+    return self._total_tasks_num
+
+  def get_task_name_max_len(self):
+    """
+    Get the maximum length of the name between each tasks being executed
+    """
+    return self._task_name_max_len
+
+class ExecutionProgressBar(threading.Thread):
+  """
+  Class representing a progressbar redrawn only when a task event is received
+  """
+
+  def __init__(self, tasks_nb, step_name_len, max_refresh_rate=10, hosts_nb=1):
+    """
+    Constructor
+    """
+    threading.Thread.__init__(self)
+    self.daemon = True
+    self._condition = threading.Condition()
+    self._running = True
+    self._pending = False
+    self._last_redraw = 0
+    self._min_redraw_interval = 1.0 / max_refresh_rate
+    self._started_tasks = 0
+    self._running_jobs = {}
+    self._current_step = 0
+    self._tasks_nb = tasks_nb
+    # Each task is completed once per host
+    self._steps_nb = tasks_nb * hosts_nb
+    self._step_name_len = step_name_len + len(str(tasks_nb)) * 2 + 2
+    self._widgets = [" ".ljust(self._step_name_len),
+                     ' [', progressbar.Timer(), '] ',
+                     progressbar.Bar(),
+                     ' (', progressbar.ETA(), ') ',
+                    ]
+    self._pbar = progressbar.ProgressBar(max_value=self._steps_nb, widgets=self._widgets)
+
+  def run(self):
+    """
+    Run thread body
+    """
+    while True:
+      with self._condition:
+        while self._running and not self._pending:
+          self._condition.wait()
+        if not self._running:
+          break
+        delay = self._last_redraw + self._min_redraw_interval - time.time()
+        if delay > 0:
+          # Coalesce the events received until the next allowed redraw
+          self._condition.wait(delay)
+          continue
+        self._pending = False
+        self._last_redraw = time.time()
+        current_step = self._current_step
+      self._pbar.update(current_step)
+    self._pbar.update(self._current_step)
+
+  def stop(self):
+    """
+    Stop thread
+    """
+    with self._condition:
+      self._running = False
+      self._condition.notify()
+
+  def _notify(self):
+    """
+    Request a redraw of the progressbar, must be called with the condition acquired
+    """
+    self._pending = True
+    self._condition.notify()
+
+  def _set_label(self, task_index, name):
+    """
+    Display the name of a step and the number of tasks running in the background, must be called with the
+    condition acquired
+    """
+    if len(self._running_jobs) != 0:
+      name = "{} (+{} running)".format(name, len(self._running_jobs))
+    self._widgets[0] = "{}/{} {}".format(str(task_index).zfill(len(str(self._tasks_nb))),
+                                         self._tasks_nb, name.ljust(self._step_name_len))
+    self._notify()
+
+  def start_step(self, name, background=False):
+    """
+    Display the name of the step being started, a step started in the background runs until it is waited for
+    """
+    with self._condition:
+      # Tasks start again for each batch of hosts
+      task_index = self._started_tasks % max(self._tasks_nb, 1) + 1
+      self._started_tasks += 1
+      if background:
+        self._running_jobs[name] = task_index
+      self._set_label(task_index, name)
+
+  def wait_step(self, name):
+    """
+    Display the name of the step started in the background being waited for
+    """
+    with self._condition:
+      task_index = self._running_jobs.pop(name, self._started_tasks % max(self._tasks_nb, 1))
+      self._set_label(task_index, name)
+
+  def finish_step(self, count=1):
+    """
+    Increment current step
+    """
+    with self._condition:
+      self._current_step = min(self._current_step + count, self._steps_nb)
+      self._notify()
+
+  def get_progress(self):
+    """
+    Get the number of completed steps and the total number of steps
+    """
+    with self._condition:
+      return self._current_step, self._steps_nb
+
+class PlaybookExecutionCallback(CallbackBase):
+  """
+  Ansible callback executed for real playbook execution
+  """
+
+  _pbar = None
+  _task_failed = False
+
+  def __init__(self, total_tasks_num, task_name_max_len, max_refresh_rate=10, hosts_nb=1, profiler=None, # pylint: disable=too-many-arguments
+               journal=None):
+    """
+    Constructor
+    """
+    CallbackBase.__init__(self)
+    self._pbar = ExecutionProgressBar(total_tasks_num, task_name_max_len, max_refresh_rate, hosts_nb)
+    self._task_start_time = time.time()
+    self._hosts_report = {}
+    self._hosts_nb = hosts_nb
+    self._profiler = profiler
+    self._journal = journal
+    self._job_ids = []
+
+  def _report_host_result(self, result, status):
+    """
+    Account the result of a task in the report of its host
+    """
+    report = self._hosts_report.setdefault(result._host.get_name(), # pylint: disable=protected-access
+                                           dict(ok=0, changed=0, failed=0, skipped=0, unreachable=0, time=0.0))
+    report[status] += 1
+    changed = status == "ok" and result._result.get("changed", False) # pylint: disable=protected-access
+    if changed:
+      report["changed"] += 1
+    duration = time.time() - self._task_start_time
+    report["time"] += duration
+    task = result._task # pylint: disable=protected-access
+    host = result._host.get_name() # pylint: disable=protected-access
+    outcome = "changed" if changed else status
+    fields = dict(host=host, role=task._role.get_name() if task._role else None, task=task.get_name(), # pylint: disable=protected-access
+                  status=outcome, duration=round(duration, 3))
+    # The fields given as extra are written to the JSON lines log and the crash log
+    if i3xfce.loggers.ROOTLOGGER.isEnabledFor(logging.DEBUG):
+      i3xfce.loggers.ROOTLOGGER.debug("Task '%s' %s on %s in %.2fs", task.get_name(), outcome, host, duration,
+                                      extra=fields)
+    if i3xfce.loggers.RESULTLOGGER.isEnabledFor(logging.DEBUG):
+      i3xfce.loggers.RESULTLOGGER.debug("Result of '%s' on %s: %s", task.get_name(), host,
+                                        format_result(result._result), extra=fields) # pylint: disable=protected-access
+    if self._profiler is not None:
+      self._profiler.result_received()
+    # A task started in the background is completed when it is waited for
+    task_vars = task.vars or {}
+    if task_vars.get(SCHEDULER_VAR) == "start":
+      if "ansible_job_id" in result._result: # pylint: disable=protected-access
+        self._job_ids.append(result._result["ansible_job_id"]) # pylint: disable=protected-access
+      return
+    if self._journal is not None and status in ["ok", "skipped"] and JOURNAL_VAR in task_vars:
+      self._journal.task_completed(*parse_task_id(task_vars[JOURNAL_VAR]))
+    # A task executed once stands for all the hosts
+    self._pbar.finish_step(self._hosts_nb if task.run_once else 1)
+
+  def _report_item_result(self, result):
+    """
+    Account the result of a loop item in the profiler
+    """
+    if self._profiler is not None:
+      self._profiler.item_completed(result._result.get("item")) # pylint: disable=protected-access
+
+  @profiled
+  def v2_runner_on_ok(self, result):
+    """
+    Function executed when a task is completed
+    """
+    self._report_host_result(result, "ok")
+
+  @profiled
+  def v2_runner_on_skipped(self, result):
+    """
+    Function executed when a task is skipped
+    """
+    if "skip_reason" in result._result: # pylint: disable=protected-access
+      i3xfce.loggers.ROOTLOGGER.debug("Task skipped: %s", result._result["skip_reason"]) # pylint: disable=protected-access
+    else:
+      i3xfce.loggers.ROOTLOGGER.warn("Task skipped: %s", result._result.get("msg")) # pylint: disable=protected-access
+    self._report_host_result(result, "skipped")
+
+  @profiled
+  def v2_runner_on_failed(self, result, ignore_errors=False):
+    """
+    Function executed when a task fails
+    """
+    if ignore_errors:
+      i3xfce.loggers.ROOTLOGGER.warn("Task '%s' failed on %s, error ignored: %s", result._task.get_name(), # pylint: disable=protected-access
+                                     result._host.get_name(), result._result.get("msg")) # pylint: disable=protected-access
+      self._report_host_result(result, "ok")
+    else:
+      i3xfce.loggers.ROOTLOGGER.error("Task '%s' failed on %s: %s", result._task.get_name(), # pylint: disable=protected-access
+                                      result._host.get_name(), result._result.get("msg")) # pylint: disable=protected-access
+      self._task_failed = True
+      self._report_host_result(result, "failed")
+
+  @profiled
+  def v2_runner_on_unreachable(self, result):
+    """
+    Function executed when the host cannot be reached
+    """
+    i3xfce.loggers.ROOTLOGGER.error("Host %s unreachable: %s", result._host.get_name(), # pylint: disable=protected-access
+                                    result._result.get("msg")) # pylint: disable=protected-access
+    self._task_failed = True
+    self._report_host_result(result, "unreachable")
+
+  def v2_playbook_on_play_start(self, play):
+    """
+    Function executed when the playbook starts
+    """
+    i3xfce.loggers.ROOTLOGGER.debug("Playbook is started")
+    # The play starts once per batch of hosts
+    if self._pbar.ident is None:
+      self._pbar.start()
+
+  @profiled
+  def v2_playbook_on_task_start(self, task, is_conditional):
+    """
+    Function executed when a task starts
+    """
+    self._task_start_time = time.time()
+    if self._profiler is not None:
+      self._profiler.task_started(task._role.get_name() if task._role else "play", # pylint: disable=protected-access
+                                  task.name or task.action)
+    scheduled = (task.vars or {}).get(SCHEDULER_VAR)
+    if scheduled == "wait":
+      self._pbar.wait_step(task.get_name())
+    else:
+      self._pbar.start_step(task.get_name(), scheduled == "start")
+
+  @profiled
+  def v2_runner_item_on_ok(self, result):
+    """
+    Function executed when a loop item is completed
+    """
+    self._report_item_result(result)
+
+  @profiled
+  def v2_runner_item_on_skipped(self, result):
+    """
+    Function executed when a loop item is skipped
+    """
+    self._report_item_result(result)
+
+  @profiled
+  def v2_runner_item_on_failed(self, result):
+    """
+    Function executed when a loop item fails
+    """
+    self._report_item_result(result)
+
+  def v2_playbook_on_stats(self, stats):
+    """
+    Function executed when the playbook ends
+    """
+    i3xfce.loggers.ROOTLOGGER.debug("Playbook is finished")
+    self.close()
+
+  def close(self):
+    """
+    Stop the progressbar and wait for its last redraw
+    """
+    self._pbar.stop()
+    if self._pbar.is_alive():
+      self._pbar.join()
+
+  def get_progress_bar(self):
+    """
+    Progressbar getter
+    """
+    return self._pbar
+
+  def get_task_failed(self):
+    """
+    Get if task of the playbook has failed
+    """
+    return self._task_failed
+
+  def get_profiler(self):
+    """
+    Profiler getter
+    """
+    return self._profiler
+
+  def get_job_ids(self):
+    """
+    Get the identifiers of the jobs started in the background
+    """
+    return list(self._job_ids)
+
+  def get_hosts_report(self):
+    """
+    Get the task results and the time spent in tasks for each host
+    """
+    return self._hosts_report
@@ -0,0 +1,178 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce cancellation module
+
+Stops a run when it is interrupted. The play stops scheduling tasks and the
+processes started by the run, the Ansible workers, the modules and the
+commands they execute, are terminated with their process groups. The ones
+still running after a grace period are killed, which releases the locks they
+hold like the dpkg one. Background jobs started with Ansible async detach
+from the run, they are found by their job identifier.
+"""
+
+import os
+import time
+import signal
+
+import i3xfce.loggers
+
+# Delay between two checks of the terminated processes in seconds
+_POLL_DELAY = 0.1
+# Programs leaving the package database half configured when they are killed
+_PACKAGE_PROGRAMS = frozenset(["apt", "apt-get", "aptitude", "dpkg"])
+
+def _get_processes():
+  """
+  Get the parent pid and the command line of the running processes, by pid
+  """
+  res = {}
+  for entry in os.listdir("/proc"):
+    if not entry.isdigit():
+      continue
+    try:
+      with open("/proc/{}/stat".format(entry)) as stat_file:
+        stat = stat_file.read()
+      with open("/proc/{}/cmdline".format(entry)) as cmdline_file:
+        cmdline = [arg for arg in cmdline_file.read().split("\0") if arg]
+    except (IOError, OSError):
+      # The process exited meanwhile
+      continue
+    # The command name between parentheses may contain spaces, the state and the parent pid follow it
+    fields = stat[stat.rindex(")") + 2:].split()
+    if fields[0] != "Z":
+      res[int(entry)] = (int(fields[1]), cmdline)
+  return res
+
+def _is_running(pid):
+  """
+  Check whether a process is running, zombies waiting to be collected by their parent are not
+  """
+  try:
+    with open("/proc/{}/stat".format(pid)) as stat_file:
+      stat = stat_file.read()
+  except (IOError, OSError):
+    return False
+  return stat[stat.rindex(")") + 2:].split()[0] != "Z"
+
+def get_run_processes(job_ids):
+  """
+  Get the command lines of the processes started by the run, by pid: the descendants of the current process and the
+  background jobs with their descendants
+  """
+  processes = _get_processes()
+  roots = set([os.getpid()])
+  # The async wrapper is given the job identifier without the pid suffix it adds
+  job_args = set(str(job_id) for job_id in job_ids) | set(str(job_id).split(".")[0] for job_id in job_ids)
+  roots.update(pid for pid, (_, cmdline) in processes.items() if job_args.intersection(cmdline))
+  children = {}
+  for pid, (ppid, _) in processes.items():
+    children.setdefault(ppid, []).append(pid)
+  res = set(roots)
+  pending = list(roots)
+  while len(pending) != 0:
+    for child in children.get(pending.pop(), []):
+      if child not in res:
+        res.add(child)
+        pending.append(child)
+  res.discard(os.getpid())
+  return dict((pid, processes[pid][1]) for pid in res if pid in processes)
+
+def _send_signal(pids, sig):
+  """
+  Send a signal to processes and to the process groups they belong to, except the group of the current process
+  """
+  own_group = os.getpgrp()
+  groups = set()
+  for pid in pids:
+    try:
+      group = os.getpgid(pid)
+      if group != own_group and group not in groups:
+        groups.add(group)
+        os.killpg(group, sig)
+      os.kill(pid, sig)
+    except OSError:
+      # The process or its group exited meanwhile
+      pass
+
+def terminate_processes(pids, grace_period):
+  """
+  Terminate processes, the ones still running after the grace period in seconds are killed. Returns the pids of the
+  killed processes
+  """
+  _send_signal(pids, signal.SIGTERM)
+  deadline = time.time() + grace_period
+  running = [pid for pid in pids if _is_running(pid)]
+  while len(running) != 0 and time.time() < deadline:
+    time.sleep(_POLL_DELAY)
+    running = [pid for pid in running if _is_running(pid)]
+  if len(running) != 0:
+    _send_signal(running, signal.SIGKILL)
+  return running
+
+class Cancellation(object):
+  """
+  Class stopping the running play and the processes it started
+  """
+
+  def __init__(self, grace_period):
+    """
+    Constructor
+    """
+    self._grace_period = grace_period
+    self._tqm = None
+    self._cancelled = False
+
+  def set_task_queue_manager(self, tqm):
+    """
+    Set the task queue manager executing the play, None once it is finished
+    """
+    self._tqm = tqm
+
+  def is_cancelled(self):
+    """
+    Check whether the run is cancelled
+    """
+    return self._cancelled
+
+  def request(self):
+    """
+    Tell the running play to stop, it must be safe to call from a signal handler
+    """
+    self._cancelled = True
+    if self._tqm is not None:
+      self._tqm.terminate()
+
+  def stop_processes(self, job_ids):
+    """
+    Terminate the processes started by the run and the background jobs, must be called before the Ansible workers
+    are collected so that their children can be found
+    """
+    processes = get_run_processes(job_ids)
+    if len(processes) == 0:
+      return
+    i3xfce.loggers.ROOTLOGGER.info("Terminating %i processes, waiting %gs for them to exit", len(processes),
+                                   self._grace_period)
+    killed = terminate_processes(list(processes), self._grace_period)
+    if len(killed) != 0:
+      i3xfce.loggers.ROOTLOGGER.warn("%i processes did not exit in time and were killed", len(killed))
+    if any(os.path.basename(cmdline[0]) in _PACKAGE_PROGRAMS for cmdline in processes.values() if cmdline):
+      i3xfce.loggers.ROOTLOGGER.warn("A package operation was interrupted, run 'dpkg --configure -a' if the next \
+package installation asks for it")
@@ -23,37 +23,25 @@ i3-xfce core module
 
 import os
 import re
+import pwd
 import sys
 import argparse
-import time
 import signal
-import threading
-import distutils.spawn
 from collections import namedtuple
 from functools import partial
 import logging
-import pkg_resources
 from enum import Enum
 
-try:
-  from ansible import constants as C
-  from ansible.parsing.dataloader import DataLoader
-  from ansible.vars import VariableManager
-  from ansible.inventory import Inventory
-  from ansible.playbook.play import Play
-  from ansible.executor.task_queue_manager import TaskQueueManager
-  from ansible.plugins.callback import CallbackBase
-except ImportError:
-  sys.exit("ansible package is missing")
-
-try:
-  import progressbar
-except ImportError:
-  sys.exit("progressbar2 package is missing")
-
+# Ansible, progressbar and the planner are imported when an action is executed so that the command line, its help
+# and its version are available without loading them
+import i3xfce
 import i3xfce.loggers
+import i3xfce.phases
 
-ROLESDIR = os.path.join(pkg_resources.resource_filename(__name__, 'resources'), "roles")
+RESOURCESDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+ROLESDIR = os.path.join(RESOURCESDIR, "roles")
+LIBRARYDIR = os.path.join(RESOURCESDIR, "library")
+ACTIONPLUGINSDIR = os.path.join(RESOURCESDIR, "action_plugins")
 
 class RegexedQuestion(object): # pylint: disable=too-few-public-methods
   """
@@ -162,155 +150,41 @@ class TaskExecutionException(Exception):
     """
     return self._msg
 
-class TaskCountCallback(CallbackBase):
-  """
-  Ansible callback used to count tasks
-  """
-
-  _total_tasks_num = 0
-  _task_name_max_len = 0
-
-  def v2_playbook_on_task_start(self, task, is_conditional):
-    """
-    Function executed when a task starts
-    """
-    i3xfce.loggers.ROOTLOGGER.debug("Counted task: %s", task)
-    self._total_tasks_num = self._total_tasks_num + 1
-    if len(task.name) > self._task_name_max_len:
-      self._task_name_max_len = len(task.name)
-
-  def get_total_tasks_num(self):
-    """
-    Get the total number of tasks being executed
-    """
-    return self._total_tasks_num
-
-  def get_task_name_max_len(self):
-    """
-    Get the maximum length of the name between each tasks being executed
-    """
-    return self._task_name_max_len
-
-class ExecutionProgressBar(threading.Thread):
+class TaskCancelledException(TaskExecutionException):
   """
-  Class representing a progressbar
+  Exception raised when the execution is cancelled by the user
   """
 
-  def __init__(self, steps_nb, step_name_len):
-    """
-    Constructor
-    """
-    threading.Thread.__init__(self)
-    self._running = False
-    self._current_step = 0
-    self._steps_nb = steps_nb
-    self._step_name_len = step_name_len + len(str(steps_nb)) * 2 + 2
-    self._widgets = [" ".ljust(self._step_name_len),
-                     ' [', progressbar.Timer(), '] ',
-                     progressbar.Bar(),
-                     ' (', progressbar.ETA(), ') ',
-                    ]
-    self._pbar = progressbar.ProgressBar(max_value=steps_nb, widgets=self._widgets)
-
-  def run(self):
-    """
-    Run thread body
-    """
-    self._running = True
-    while self._running:
-      self._pbar.update(self._current_step)
-      time.sleep(0.1)
-      if not self._running:
-        return
-
-  def stop(self):
-    """
-    Stop thread
-    """
-    self._running = False
-
-  def increment_step(self, name=None):
-    """
-    Increment current step
-    """
-    self._current_step = self._current_step + 1
-    if name != None:
-      self._widgets[0] = "{}/{} {}".format(str(self._current_step).zfill(len(str(self._steps_nb))),
-                                           self._steps_nb, name.ljust(self._step_name_len))
-    time.sleep(1)
-
-class PlaybookExecutionCallback(CallbackBase):
-  """
-  Ansible callback executed for real playbook execution
-  """
-
-  _pbar = None
-  _task_failed = False
-
-  def __init__(self, total_tasks_num, task_name_max_len):
-    """
-    Constructor
-    """
-    CallbackBase.__init__(self)
-    self._pbar = ExecutionProgressBar(total_tasks_num, task_name_max_len)
-
-  def v2_runner_on_ok(self, result):
-    """
-    Function executed when a task is completed
-    """
-    i3xfce.loggers.ROOTLOGGER.debug("Task completed")
-
-  def v2_runner_on_skipped(self, result):
-    """
-    Function executed when a task is skipped
-    """
-    i3xfce.loggers.ROOTLOGGER.warn("Task skipped: %s", result._result["msg"]) # pylint: disable=protected-access
-
-  def v2_runner_on_failed(self, result, ignore_errors=False):
-    """
-    Function executed when a task fails
-    """
-    i3xfce.loggers.ROOTLOGGER.error("Task failed: %s", result._result["msg"]) # pylint: disable=protected-access
-    self._task_failed = True
-
-  def v2_playbook_on_play_start(self, play):
-    """
-    Function executed when the playbook starts
-    """
-    i3xfce.loggers.ROOTLOGGER.debug("Playbook is started")
-    self._pbar.start()
-
-  def v2_playbook_on_task_start(self, task, is_conditional):
-    """
-    Function executed when a task starts
-    """
-    self.get_progress_bar().increment_step(task.get_name())
-
-  def get_progress_bar(self):
-    """
-    Progressbar getter
-    """
-    return self._pbar
-
-  def get_task_failed(self):
-    """
-    Get if task of the playbook has failed
-    """
-    return self._task_failed
-
 class CmdLine(object):
   """
   Main command line class
   """
 
   _results_callback = None
+  _cancellation = None
 
   @staticmethod
-  def _execute_play(play_source, inventory, var_mgr, loader, options, callback):  # pylint: disable=too-many-arguments
+  def _execute_play(play_source, inventory, var_mgr, loader, options, callback, in_process_files=False,  # pylint: disable=too-many-arguments
+                    system_tasks_once=False, jobs=0, journal=None, cancellation=None):
     """
     Execute the playbook
     """
+    from ansible.playbook.play import Play
+    from ansible.executor.task_queue_manager import TaskQueueManager
+
     play = Play().load(play_source, variable_manager=var_mgr, loader=loader)
+    if in_process_files:
+      from i3xfce.fastpath import use_in_process_actions
+      use_in_process_actions(play)
+    if system_tasks_once:
+      from i3xfce.users import run_system_tasks_once
+      run_system_tasks_once(play)
+    if journal is not None:
+      from i3xfce.journal import apply_journal
+      i3xfce.loggers.ROOTLOGGER.debug("%i tasks completed by the failed run are skipped", apply_journal(play, journal))
+    if jobs > 0:
+      from i3xfce.scheduler import Scheduler
+      Scheduler(jobs).schedule(play, var_mgr, loader)
     tqm = None
     try:
       tqm = TaskQueueManager(
@@ -321,27 +195,103 @@ class CmdLine(object):
           passwords=None,
           stdout_callback=callback,
           )
+      if cancellation is not None:
+        cancellation.set_task_queue_manager(tqm)
       _ = tqm.run(play)
+      if cancellation is not None and cancellation.is_cancelled():
+        # Ansible stopped the play without letting the interruption through
+        raise KeyboardInterrupt()
+    except KeyboardInterrupt:
+      if cancellation is not None:
+        from i3xfce.callbacks import PlaybookExecutionCallback
+        # The children of the workers are found before the workers are collected by the cleanup
+        cancellation.stop_processes(callback.get_job_ids() if isinstance(callback, PlaybookExecutionCallback) else [])
+      raise TaskCancelledException("Execution cancelled by the user")
     except Exception as exc:
       raise TaskExecutionException(str(exc))
     finally:
+      if cancellation is not None:
+        cancellation.set_task_queue_manager(None)
       if tqm is not None:
         tqm.cleanup()
 
+  @staticmethod
+  def _get_user_home(username):
+    """
+    Get the home directory of a local user
+    """
+    try:
+      return pwd.getpwnam(username).pw_dir
+    except KeyError:
+      return os.path.join("/home", username)
+
+  @staticmethod
+  def _log_hosts_report(hosts_report):
+    """
+    Log the results and the time spent in tasks for each host
+    """
+    log = i3xfce.loggers.ROOTLOGGER.info if len(hosts_report) > 1 else i3xfce.loggers.ROOTLOGGER.debug
+    for host in sorted(hosts_report):
+      report = hosts_report[host]
+      log("%s: ok=%i changed=%i failed=%i skipped=%i unreachable=%i time=%.1fs", host, report["ok"],
+          report["changed"], report["failed"], report["skipped"], report["unreachable"], report["time"])
+
+  @staticmethod
+  def _write_crash_log(args):
+    """
+    Write the last debug messages and task results kept in memory once the run failed
+    """
+    if args.crash_buffer_size == 0:
+      return
+    path = args.crash_log or os.path.join(args.state_dir, "crash.log")
+    try:
+      if not os.path.isdir(os.path.dirname(os.path.abspath(path))):
+        os.makedirs(os.path.dirname(os.path.abspath(path)))
+      records_nb = i3xfce.loggers.write_crash_log(path)
+      i3xfce.loggers.ROOTLOGGER.info("The last %i debug messages and task results are written to %s", records_nb,
+                                     path)
+    except (IOError, OSError) as exc:
+      i3xfce.loggers.ROOTLOGGER.warn("Unable to write the crash log %s: %s", path, exc)
+
   def execute_action(self, action, args):
     """
     Execute the requested operation
     """
+    try:
+      from ansible import constants as C
+      from ansible.parsing.dataloader import DataLoader
+      from ansible.vars import VariableManager
+      from ansible.inventory import Inventory
+      from ansible.plugins import module_loader, action_loader
+    except ImportError:
+      sys.exit("ansible package is missing")
+    from i3xfce.callbacks import TaskCountCallback, PlaybookExecutionCallback
+    from i3xfce.planner import RolePlanner, PlanningException, ExecutionPlan
+    from i3xfce.profiler import TaskProfiler
+    from i3xfce.manifest import Manifest, MANIFEST_FILE, get_part_inputs
+    from i3xfce.bundle import import_bundle
+    from i3xfce.users import get_users, add_user_hosts
+    from i3xfce.journal import Journal, JOURNAL_FILE
+    from i3xfce.cancel import Cancellation
+
     C.DEFAULT_ROLES_PATH = [os.path.join(ROLESDIR, str(action))]
+    module_loader.add_directory(LIBRARYDIR)
+    if args.file_ops == "in-process":
+      action_loader.add_directory(ACTIONPLUGINSDIR)
 
     i3xfce.loggers.ROOTLOGGER.debug("Executing the %s action", action)
+    self._cancellation = Cancellation(args.grace_period)
+    users = None
+    if args.users is not None or args.group is not None:
+      users = get_users(args.users, args.group)
+      i3xfce.loggers.ROOTLOGGER.info("Configuring users %s", ", ".join(users))
     # Get the real user behind the sudo
-    username = os.getenv("SUDO_USER")
+    username = args.user or os.getenv("SUDO_USER")
 
-    if username is None:
+    if username is None and users is None:
       i3xfce.loggers.ROOTLOGGER.debug("Unable to get SUDO_USER environment variable. This means i3-xfce has not been \
       started using sudo")
-      raise Exception("This program must be ran using sudo ")
+      raise Exception("This program must be ran using sudo or with the --user option")
 
     i3xfce.loggers.ROOTLOGGER.debug("Creating the option tuple")
     options_tuple = namedtuple('Options', ['connection', 'forks', 'module_path', 'become_user', 'become',
@@ -349,45 +299,183 @@ class CmdLine(object):
     try:
       # initialize needed objects
       variable_manager = VariableManager()
-      variable_manager.extra_vars = dict(action=str(action),
-                                         remote_user=username)
+      extra_vars = dict(action=str(action),
+                        sysroot=args.sysroot.rstrip("/"),
+                        i3xfce_state_dir=args.state_dir,
+                        i3xfce_cache_dir=args.cache_dir,
+                        i3xfce_git_mirror_dir=args.git_mirror_dir or os.path.join(args.cache_dir, "git"))
+      offline = getattr(args, "bundle", None) is not None
+      if offline:
+        extra_vars.update(import_bundle(args.bundle, args.cache_dir, args.parts))
 
       loader = DataLoader()
-      i3xfce.loggers.ROOTLOGGER.debug("Creating option to count number of tasks to execute")
-      options = options_tuple(connection=None, module_path=None, forks=1, become_user=None,
-                              become=None, become_method=None, verbosity=0, check=True)
-      tasks_count_callback = TaskCountCallback()
       # create inventory and pass to var manager
-      inventory = Inventory(loader=loader, variable_manager=variable_manager, host_list=None)
+      inventory = Inventory(loader=loader, variable_manager=variable_manager, host_list=args.inventory)
       variable_manager.set_inventory(inventory)
+      if args.inventory is not None:
+        # The user is a group variable so that hosts and groups of the fleet inventory can override it
+        inventory.get_group("all").set_variable("remote_user", username)
+        inventory.get_group("all").set_variable("user_home", args.home or "/home/{{remote_user}}")
+        hosts_pattern = "all"
+      elif users is not None:
+        # Each user is a local host, the tasks that do not configure the user run once
+        add_user_hosts(inventory, users)
+        hosts_pattern = "all"
+      else:
+        extra_vars["remote_user"] = username
+        extra_vars["user_home"] = args.home or CmdLine._get_user_home(username)
+        hosts_pattern = "localhost"
+      variable_manager.extra_vars = extra_vars
+      hosts = inventory.get_hosts(hosts_pattern)
+      if len(hosts) == 0:
+        raise TaskExecutionException("No host matched in the inventory")
       # create play with tasks
       play_source = dict(
           name="Ansible Play",
-          hosts='localhost',
+          hosts=hosts_pattern,
           gather_facts='no',
           ignore_errors="yes",
           roles=args.parts
           )
-      CmdLine._execute_play(play_source, inventory, variable_manager, loader, options, tasks_count_callback)
-
-      i3xfce.loggers.ROOTLOGGER.debug("%i tasks are going to be executed", tasks_count_callback.get_total_tasks_num())
+      parts = args.parts
+      manifest = None
+      journal = None
+      # Remote hosts are reached with the connection user and need privilege escalation
+      become, become_method = (True, "sudo") if args.inventory is not None else (None, None)
+      try:
+        planner = RolePlanner(ROLESDIR)
+        roles_plan = planner.plan(action, args.parts)
+        if args.inventory is None and users is None:
+          # The manifest describes the local system, the hosts of an inventory are always fully configured
+          manifest = Manifest(os.path.join(args.state_dir, MANIFEST_FILE), extra_vars)
+          manifest.load()
+        if manifest is not None:
+          inputs = dict((part, get_part_inputs(planner.get_role_dir(action, part), LIBRARYDIR)) for part in parts)
+          if str(action) == "install" and not args.force:
+            parts = manifest.get_changed_parts(parts, inputs)
+            if len(parts) == 0:
+              i3xfce.loggers.ROOTLOGGER.info("All parts are up to date, use --force to install them again")
+              return False
+            roles_plan = ExecutionPlan([task for task in roles_plan.get_tasks() if task.role in parts])
+            play_source["roles"] = parts
+        if manifest is not None and not args.dryrun:
+          # The journal lets the next run resume after the tasks completed by this one
+          journal = Journal(os.path.join(args.state_dir, JOURNAL_FILE), action, extra_vars)
+          journal.start(dict((part, (os.path.join(planner.get_role_dir(action, part), "tasks", "main.yml"),
+                                     inputs[part])) for part in parts), args.resume)
+        pre_tasks = i3xfce.phases.get_pre_tasks(action, roles_plan, offline)
+        post_tasks = i3xfce.phases.get_post_tasks(action, roles_plan, offline)
+        tasks_count = ExecutionPlan(planner.plan_tasks(i3xfce.phases.PHASES_ROLE, pre_tasks) +
+                                    [task for task in roles_plan.get_tasks()
+                                     if journal is None or task.index not in journal.get_done_tasks(task.role)] +
+                                    planner.plan_tasks(i3xfce.phases.PHASES_ROLE, post_tasks))
+        play_source.update(pre_tasks=pre_tasks, post_tasks=post_tasks, vars=i3xfce.phases.get_play_vars())
+      except PlanningException as exc:
+        if offline:
+          raise TaskExecutionException("Unable to plan the tasks of the bundle install: {}".format(exc))
+        i3xfce.loggers.ROOTLOGGER.debug("Unable to plan tasks (%s), counting them by running the play", exc)
+        if str(action) == "install":
+          play_source["post_tasks"] = i3xfce.phases.get_fallback_ownership_tasks()
+        i3xfce.loggers.ROOTLOGGER.debug("Creating option to count number of tasks to execute")
+        options = options_tuple(connection=None, module_path=LIBRARYDIR, forks=args.forks, become_user=None,
+                                become=become, become_method=become_method, verbosity=0, check=True)
+        tasks_count = TaskCountCallback()
+        CmdLine._execute_play(play_source, inventory, variable_manager, loader, options, tasks_count,
+                              cancellation=self._cancellation)
+
+      i3xfce.loggers.ROOTLOGGER.debug("%i tasks are going to be executed", tasks_count.get_total_tasks_num())
       play_source["ignore_errors"] = "no"
-      options = options_tuple(connection=None, module_path=None, forks=1, become_user=None, become=None,
-                              become_method=None, verbosity=0, check=args.dryrun)
-      self._results_callback = PlaybookExecutionCallback(tasks_count_callback.get_total_tasks_num(),
-                                                         tasks_count_callback.get_task_name_max_len())
-      CmdLine._execute_play(play_source, inventory, variable_manager, loader, options, self._results_callback)
-
-      self._results_callback.get_progress_bar().stop()
-      self._results_callback.get_progress_bar().join()
-
+      options = options_tuple(connection=None, module_path=LIBRARYDIR, forks=args.forks, become_user=None,
+                              become=become, become_method=become_method, verbosity=0, check=args.dryrun)
+      profiler = TaskProfiler() if args.profile is not None else None
+      self._results_callback = PlaybookExecutionCallback(tasks_count.get_total_tasks_num(),
+                                                         tasks_count.get_task_name_max_len(),
+                                                         args.refresh_rate, len(hosts), profiler, journal)
+      batch_size = args.batch_size or len(hosts)
+      # Background jobs are not supported in check mode
+      jobs = args.jobs if args.schedule == "dag" and not args.dryrun else 0
+      try:
+        for batch_start in range(0, len(hosts), batch_size):
+          if batch_size < len(hosts):
+            inventory.restrict_to_hosts(hosts[batch_start:batch_start + batch_size])
+          CmdLine._execute_play(play_source, inventory, variable_manager, loader, options, self._results_callback,
+                                args.file_ops == "in-process", users is not None, jobs, journal, self._cancellation)
+      except TaskCancelledException:
+        completed, total = self._results_callback.get_progress_bar().get_progress()
+        i3xfce.loggers.ROOTLOGGER.error("Execution cancelled after %i of %i tasks", completed, total)
+        if journal is not None:
+          i3xfce.loggers.ROOTLOGGER.info("Completed tasks are recorded, use --resume to skip them in the next run")
+        raise
+      finally:
+        inventory.remove_restriction()
+        self._results_callback.close()
+        CmdLine._log_hosts_report(self._results_callback.get_hosts_report())
+        if profiler is not None:
+          profiler.stop()
+          profiler.log_summary(args.profile_top)
+          try:
+            profiler.write_report(args.profile)
+          except (IOError, OSError) as exc:
+            i3xfce.loggers.ROOTLOGGER.warn("Unable to write the profiling report: %s", exc)
+
+      failed_hosts = sorted([host for host, report in self._results_callback.get_hosts_report().items()
+                             if report["failed"] != 0 or report["unreachable"] != 0])
       if self._results_callback.get_task_failed() is True:
-        raise TaskExecutionException("")
+        if journal is not None:
+          i3xfce.loggers.ROOTLOGGER.info("Completed tasks are recorded, use --resume to skip them in the next run")
+        raise TaskExecutionException("Tasks failed on {}".format(", ".join(failed_hosts)) if len(hosts) > 1 else "")
+      if manifest is not None and not args.dryrun:
+        for part in parts:
+          if str(action) == "install":
+            manifest.update_part(part, inputs[part], roles_plan, extra_vars)
+          else:
+            manifest.remove_part(part)
+        try:
+          manifest.save()
+        except (IOError, OSError) as exc:
+          i3xfce.loggers.ROOTLOGGER.warn("Unable to write the manifest, the next run will execute every part: %s",
+                                         exc)
+      if journal is not None:
+        journal.remove()
+      return True
     except TaskExecutionException as exc:
+      CmdLine._write_crash_log(args)
       raise
     except Exception as exc:
+      CmdLine._write_crash_log(args)
       raise TaskExecutionException(str(exc))
 
+  @staticmethod
+  def show_status(args):
+    """
+    Report the drift of the installed parts from the last installation, returns True when the system drifted
+    """
+    import json
+    from i3xfce.manifest import Manifest, MANIFEST_FILE
+    from i3xfce.status import StatusChecker
+
+    manifest = Manifest(os.path.join(args.state_dir, MANIFEST_FILE), {})
+    manifest.load()
+    parts = args.parts or sorted(manifest.get_parts())
+    if len(parts) == 0:
+      i3xfce.loggers.ROOTLOGGER.info("No part was installed by i3-xfce")
+    report = StatusChecker(manifest, args.jobs).check(parts)
+    if args.json is True:
+      sys.stdout.write(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    else:
+      StatusChecker.log_report(report)
+    return any(len(drifts) != 0 for drifts in report.values())
+
+  @staticmethod
+  def export_bundle(args):
+    """
+    Export what the selected parts download to a bundle
+    """
+    from i3xfce.planner import RolePlanner
+    from i3xfce.bundle import BundleExporter
+
+    BundleExporter(RolePlanner(ROLESDIR), args.parts).export(args.output)
+
   @staticmethod
   def parse_args(raw_args):
     """
@@ -397,35 +485,131 @@ class CmdLine(object):
     # Create main parser
     parser = argparse.ArgumentParser(prog="i3-xfce", description='i3-xfce-installer.')
     parser.add_argument("--version", "-v", help="Display version", action='version',
-                        version="{}".format(pkg_resources.require("i3-xfce")[0].version))
+                        version=i3xfce.__version__)
     root_subparsers = parser.add_subparsers(dest="function")
 
-    # Parser for list command
-    install_parser = root_subparsers.add_parser('install', help='install files')
-    install_parser.add_argument('--parts', '-p', help='Parts to install', action="append", metavar=dirs,
-                                type=str, choices=dirs)
-    install_parser.add_argument('--verbose', help='Verbose mode', action='store_true', default=False)
-    install_parser.add_argument('--dryrun', "-d", help='Dry run mode', action='store_true', default=False)
-
-    # Parser for list command
-    uninstall_parser = root_subparsers.add_parser('uninstall', help='uninstall files')
-    uninstall_parser.add_argument('--parts', '-p', help='Parts to install', action="append", metavar=dirs, type=str,
-                                  choices=dirs)
-    uninstall_parser.add_argument('--verbose', help='Verbose mode', action='store_true', default=False)
-    uninstall_parser.add_argument('--dryrun', "-d", help='Dry run mode', action='store_true', default=False)
+    # Options shared by every action
+    action_parser = argparse.ArgumentParser(add_help=False)
+    action_parser.add_argument('--parts', '-p', help='Parts to install', action="append", metavar=dirs, type=str,
+                               choices=dirs)
+    action_parser.add_argument('--verbose', help='Verbose mode', action='store_true', default=False)
+    action_parser.add_argument('--dryrun', "-d", help='Dry run mode', action='store_true', default=False)
+    action_parser.add_argument('--resume', help='Skip the tasks completed by the last run when it failed, if the \
+parts did not change since', action='store_true', default=False)
+    action_parser.add_argument('--force', help='Install the parts even if they did not change since the last run',
+                               action='store_true', default=False)
+    action_parser.add_argument('--cache-dir', help='Directory caching builds between runs, it can be shared',
+                               type=str, default="/var/cache/i3-xfce")
+    action_parser.add_argument('--git-mirror-dir', help='Directory of the git mirrors, defaults to <cache-dir>/git. \
+Mirrors are only updated when the directory is writable', type=str, default=None)
+    action_parser.add_argument('--user', '-u', help='User to configure, defaults to the user running sudo',
+                               type=str, default=None)
+    action_parser.add_argument('--home', help='Home directory of the user to configure', type=str, default=None)
+    action_parser.add_argument('--users', help='Local users to configure in the same run, the system is configured \
+once and the users in parallel', nargs="+", type=str, default=None)
+    action_parser.add_argument('--group', help='Configure every local user member of this group in the same run',
+                               type=str, default=None)
+    # Only the files written by the roles and the builds go to the system root, the packages, PPAs, pip packages and
+    # user shell are still managed on the host. It lets the benchmarks run in a sandbox and is hidden from the help
+    action_parser.add_argument('--sysroot', help=argparse.SUPPRESS, type=str, default="")
+    action_parser.add_argument('--state-dir', help='Directory where i3-xfce keeps its state between runs',
+                               type=str, default=i3xfce.phases.STATE_DIR)
+    action_parser.add_argument('--inventory', '-i', help='Ansible inventory of the hosts to configure, the local \
+host is configured when omitted', type=str, default=None)
+    action_parser.add_argument('--forks', '-f', help='Number of hosts or users configured in parallel', type=int,
+                               default=5)
+    action_parser.add_argument('--batch-size', help='Number of hosts configured before starting the next ones, \
+all hosts at once by default', type=int, default=0)
+    action_parser.add_argument('--profile', help='Write the time spent in each task, loop item and part to this \
+JSON file', type=str, default=None)
+    action_parser.add_argument('--profile-top', help='Number of slowest tasks logged when profiling', type=int,
+                               default=10)
+    action_parser.add_argument('--file-ops', help='Execute the copy, file and lineinfile tasks with the stock \
+modules or in the i3-xfce process when the connection is local', choices=["module", "in-process"], default="module")
+    action_parser.add_argument('--schedule', help='Execute the tasks in the order of the roles, or along their \
+dependencies with the long ones running in the background', choices=["linear", "dag"], default="linear")
+    action_parser.add_argument('--jobs', '-j', help='Maximum number of tasks running at once with --schedule dag, \
+the ones in the background and the one executed by the play', type=int, default=4)
+    action_parser.add_argument('--log-json', help='Also write every message, debug ones included, to this file as \
+JSON lines giving the time, host, part, task and duration', type=str, default=None)
+    action_parser.add_argument('--crash-log', help='File where the last debug messages and task results are \
+written when the run fails, defaults to <state-dir>/crash.log', type=str, default=None)
+    action_parser.add_argument('--crash-buffer-size', help='Memory used to keep the last debug messages and task \
+results in KiB, 0 disables the crash log', type=int, default=i3xfce.loggers.CRASH_BUFFER_SIZE // 1024)
+    action_parser.add_argument('--grace-period', help='Seconds given to the processes of the run to exit when it \
+is cancelled, before they are killed', type=float, default=5)
+    action_parser.add_argument('--refresh-rate', help='Maximum number of progressbar redraws per second',
+                               type=float, default=10)
+
+    # Parser for install command
+    install_parser = root_subparsers.add_parser('install', help='install files', parents=[action_parser])
+    install_parser.add_argument('--bundle', help='Install from a bundle archive only, without reaching the network',
+                                type=str, default=None)
+
+    # Parser for uninstall command
+    root_subparsers.add_parser('uninstall', help='uninstall files', parents=[action_parser])
+
+    # Parser for status command
+    status_parser = root_subparsers.add_parser('status', help='report the drift of the installed parts')
+    status_parser.add_argument('--parts', '-p', help='Parts to check, defaults to the installed ones',
+                               action="append", metavar=dirs, type=str, choices=dirs)
+    status_parser.add_argument('--verbose', help='Verbose mode', action='store_true', default=False)
+    status_parser.add_argument('--state-dir', help='Directory where i3-xfce keeps its state between runs',
+                               type=str, default=i3xfce.phases.STATE_DIR)
+    status_parser.add_argument('--jobs', '-j', help='Number of files checked in parallel', type=int, default=8)
+    status_parser.add_argument('--json', help='Print the report as JSON', action='store_true', default=False)
+
+    # Parser for bundle command
+    bundle_parser = root_subparsers.add_parser('bundle', help='manage bundles for offline installs')
+    bundle_subparsers = bundle_parser.add_subparsers(dest="bundle_action")
+    export_parser = bundle_subparsers.add_parser('export', help='export what the parts download to an archive')
+    export_parser.add_argument('--parts', '-p', help='Parts to bundle', action="append", metavar=dirs, type=str,
+                               choices=dirs)
+    export_parser.add_argument('--output', '-o', help='Archive to write', type=str, required=True)
+    export_parser.add_argument('--verbose', help='Verbose mode', action='store_true', default=False)
 
     res = parser.parse_args(raw_args[1:])
+    if res.function == "status":
+      if res.jobs <= 0:
+        parser.error("--jobs must be positive")
+      return res
     if res.parts is None:
       res.parts = dirs
+    if res.function == "bundle":
+      return res
+    if getattr(res, "bundle", None) is not None and res.inventory is not None:
+      parser.error("--bundle cannot be used with --inventory")
+    if (res.users is not None or res.group is not None) and \
+       (res.inventory is not None or res.user is not None or res.home is not None):
+      parser.error("--users and --group cannot be used with --inventory, --user or --home")
+    if res.refresh_rate <= 0:
+      parser.error("--refresh-rate must be a positive number")
+    if res.forks <= 0 or res.batch_size < 0:
+      parser.error("--forks must be positive and --batch-size cannot be negative")
+    if res.jobs <= 0:
+      parser.error("--jobs must be positive")
+    if res.crash_buffer_size < 0:
+      parser.error("--crash-buffer-size must not be negative")
+    if res.grace_period < 0:
+      parser.error("--grace-period must not be negative")
     return res
 
-  def signal_handler(self, *_):
+  def signal_handler(self, pid, signum, *_):
     """
-    Handler called when ctrl-c is pressed
+    Handler called when ctrl-c is pressed or i3-xfce is terminated, the running play is cancelled
     """
-    if self._results_callback != None:
-      self._results_callback.get_progress_bar().stop()
-    sys.exit(0)
+    if os.getpid() != pid:
+      # The Ansible workers inherit the handler, they exit when the main process terminates them
+      if signum == signal.SIGTERM:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        os.kill(os.getpid(), signal.SIGTERM)
+      return
+    if self._cancellation is not None:
+      if self._cancellation.is_cancelled():
+        # The processes of the run are being terminated
+        return
+      self._cancellation.request()
+    raise KeyboardInterrupt()
 
 def main():
   """
@@ -434,29 +618,46 @@ def main():
   i3xfce.loggers.init_loggers()
 
   try:
-    res = distutils.spawn.find_executable("ansible")
-    if res is None:
-      raise Exception("Ansible not found please check your configuration")
     cli = CmdLine()
-    signal.signal(signal.SIGINT, partial(cli.signal_handler, cli))
+    signal.signal(signal.SIGINT, partial(cli.signal_handler, os.getpid()))
+    signal.signal(signal.SIGTERM, partial(cli.signal_handler, os.getpid()))
     args = cli.parse_args(sys.argv)
 
-    if args.function != None:
+    if args.function == "status":
+      i3xfce.loggers.set_log_level(logging.DEBUG if args.verbose is True else logging.INFO)
+      sys.exit(1 if cli.show_status(args) else 0)
+    elif args.function == "bundle":
+      i3xfce.loggers.set_log_level(logging.DEBUG if args.verbose is True else logging.INFO)
+      cli.export_bundle(args)
+    elif args.function != None:
+      import distutils.spawn
+      res = distutils.spawn.find_executable("ansible")
+      if res is None:
+        raise Exception("Ansible not found please check your configuration")
+      if args.log_json is not None:
+        i3xfce.loggers.add_json_log(args.log_json)
+      i3xfce.loggers.set_crash_buffer_size(args.crash_buffer_size * 1024)
       if args.verbose is True:
         i3xfce.loggers.set_log_level(logging.DEBUG)
       else:
         i3xfce.loggers.set_log_level(logging.INFO)
 
       res = cli.execute_action(args.function, args)
+      i3xfce.loggers.flush_loggers()
 
-      if(BinaryQuestion("Do you want to reboot your computer now for changes to take effect?",
-                        "Enter a Y or a N", "N").ask() is True):
+      if(res is True and BinaryQuestion("Do you want to reboot your computer now for changes to take effect?",
+                                        "Enter a Y or a N", "N").ask() is True):
         os.system("reboot now")
     else:
       cli.parse_args([None, "-h"])
     sys.exit()
+  except (KeyboardInterrupt, TaskCancelledException):
+    i3xfce.loggers.ROOTLOGGER.error("i3-xfce was cancelled")
+    i3xfce.loggers.flush_loggers()
+    sys.exit(130)
   except Exception as exc:  # pylint: disable=broad-except
     i3xfce.loggers.ROOTLOGGER.error("A task failed to execute, check the messages and correct \
 the issue before restarting i3-xfce")
+    i3xfce.loggers.flush_loggers()
     sys.exit(exc)
 
@@ -0,0 +1,404 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce fastpath module
+
+Executes the copy, file and lineinfile tasks in the Ansible process when the
+connection is local, instead of shipping a module to a new interpreter. Tasks
+using options that are not reproduced here run the stock modules.
+"""
+
+import os
+import re
+import pwd
+import grp
+import sys
+import stat
+import shutil
+import hashlib
+import tempfile
+
+try:
+  from ansible.plugins.action import ActionBase
+  from ansible.playbook.block import Block
+  from ansible.utils.vars import merge_hash
+  from ansible.constants import mk_boolean
+except ImportError:
+  sys.exit("ansible package is missing")
+
+# Stock modules executed in-process and the action plugins doing it
+IN_PROCESS_ACTIONS = {"copy": "i3xfce_copy", "file": "i3xfce_file", "lineinfile": "i3xfce_lineinfile"}
+
+_SYMBOLIC_MODE_RE = re.compile(r"^(?P<users>[ugoa]*)(?P<operator>[-+=])(?P<perms>[rwxXst]*)$")
+_PERMS = {"u": {"r": stat.S_IRUSR, "w": stat.S_IWUSR, "x": stat.S_IXUSR, "s": stat.S_ISUID, "t": 0},
+          "g": {"r": stat.S_IRGRP, "w": stat.S_IWGRP, "x": stat.S_IXGRP, "s": stat.S_ISGID, "t": 0},
+          "o": {"r": stat.S_IROTH, "w": stat.S_IWOTH, "x": stat.S_IXOTH, "s": 0, "t": stat.S_ISVTX}}
+_USER_MASKS = {"u": stat.S_IRWXU | stat.S_ISUID, "g": stat.S_IRWXG | stat.S_ISGID, "o": stat.S_IRWXO | stat.S_ISVTX}
+
+class UnsupportedTask(Exception):
+  """
+  Exception raised when a task has to be executed by the stock module
+  """
+  pass
+
+class TaskFailure(Exception):
+  """
+  Exception raised when a task executed in-process fails
+  """
+
+  def __init__(self, msg):
+    """
+    Constructor
+    """
+    Exception.__init__(self)
+    self._msg = msg
+
+  def __str__(self):
+    """
+    Convert exception to string
+    """
+    return self._msg
+
+def use_in_process_actions(play):
+  """
+  Make the copy, file and lineinfile tasks of a loaded play use the in-process action plugins
+  """
+  blocks = list(play.pre_tasks) + list(play.tasks) + list(play.post_tasks)
+  for role in play.get_roles():
+    blocks.extend(role._task_blocks) # pylint: disable=protected-access
+  while len(blocks) != 0:
+    block = blocks.pop()
+    for task in block.block + block.rescue + block.always:
+      if isinstance(task, Block):
+        blocks.append(task)
+      elif task.action in IN_PROCESS_ACTIONS:
+        task.action = IN_PROCESS_ACTIONS[task.action]
+
+def get_new_mode(path_mode, mode):
+  """
+  Get the mode a path takes when the mode argument of a task is applied to it
+  """
+  if isinstance(mode, int):
+    return mode
+  mode = str(mode)
+  if re.match(r"^[0-7]+$", mode):
+    return int(mode, 8)
+  is_dir = stat.S_ISDIR(path_mode)
+  new_mode = stat.S_IMODE(path_mode)
+  for clause in mode.split(","):
+    match = _SYMBOLIC_MODE_RE.match(clause)
+    if match is None:
+      raise UnsupportedTask()
+    users = match.group("users").replace("a", "ugo") or "ugo"
+    for user in users:
+      bits = 0
+      for perm in match.group("perms"):
+        if perm == "X":
+          if is_dir or new_mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH):
+            bits |= _PERMS[user]["x"]
+        else:
+          bits |= _PERMS[user][perm]
+      if match.group("operator") == "=":
+        new_mode = (new_mode & ~_USER_MASKS[user]) | bits
+      elif match.group("operator") == "+":
+        new_mode |= bits
+      else:
+        new_mode &= ~bits
+  return new_mode
+
+def check_mode_arg(mode):
+  """
+  Make sure a mode argument is reproduced in-process before anything is modified
+  """
+  if mode is not None:
+    get_new_mode(stat.S_IFREG, mode)
+
+def set_attributes(path, owner, group, mode, check_mode):
+  """
+  Set the owner, group and mode of a path when they differ, returns True when one of them changed
+  """
+  changed = False
+  path_stat = os.lstat(path)
+  uid, gid = -1, -1
+  if owner is not None:
+    try:
+      uid = int(owner) if str(owner).isdigit() else pwd.getpwnam(owner).pw_uid
+    except KeyError:
+      raise TaskFailure("chown failed: failed to look up user {}".format(owner))
+  if group is not None:
+    try:
+      gid = int(group) if str(group).isdigit() else grp.getgrnam(group).gr_gid
+    except KeyError:
+      raise TaskFailure("chgrp failed: failed to look up group {}".format(group))
+  if (uid != -1 and uid != path_stat.st_uid) or (gid != -1 and gid != path_stat.st_gid):
+    changed = True
+    if not check_mode:
+      os.lchown(path, uid, gid)
+  if mode is not None and not stat.S_ISLNK(path_stat.st_mode):
+    new_mode = get_new_mode(path_stat.st_mode, mode)
+    if new_mode != stat.S_IMODE(path_stat.st_mode):
+      changed = True
+      if not check_mode:
+        os.chmod(path, new_mode)
+  return changed
+
+def get_path_state(path):
+  """
+  Get the state of a path as named by the file module
+  """
+  if os.path.islink(path):
+    return "link"
+  if os.path.isdir(path):
+    return "directory"
+  if os.path.exists(path):
+    return "file"
+  return "absent"
+
+def atomic_write(path, data):
+  """
+  Replace the content of a file atomically, an existing file keeps its owner and mode
+  """
+  tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".i3xfce-")
+  try:
+    with os.fdopen(tmp_fd, "wb") as tmp_file:
+      tmp_file.write(data)
+    if os.path.exists(path):
+      path_stat = os.stat(path)
+      os.chown(tmp_path, path_stat.st_uid, path_stat.st_gid)
+      os.chmod(tmp_path, stat.S_IMODE(path_stat.st_mode))
+    else:
+      umask = os.umask(0)
+      os.umask(umask)
+      os.chmod(tmp_path, 0o666 & ~umask)
+    os.rename(tmp_path, path)
+  finally:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+
+def run_file(args, check_mode):
+  """
+  Execute a file task
+  """
+  path = os.path.expanduser(args.get("path") or args.get("dest") or args.get("name"))
+  prev_state = get_path_state(path)
+  state = args.get("state") or (prev_state if prev_state != "absent" else "file")
+  owner, group, mode = args.get("owner"), args.get("group"), args.get("mode")
+  if state not in ["absent", "file", "directory"]:
+    raise UnsupportedTask()
+  check_mode_arg(mode)
+
+  if state == "absent":
+    if prev_state != "absent" and not check_mode:
+      if prev_state == "directory":
+        shutil.rmtree(path)
+      else:
+        os.unlink(path)
+    return dict(path=path, changed=prev_state != "absent", state="absent")
+
+  if state == "file":
+    if prev_state == "absent":
+      raise TaskFailure("file ({}) is absent, cannot continue".format(path))
+    if prev_state != "file":
+      raise TaskFailure("file ({}) is {}, cannot continue".format(path, prev_state))
+    return dict(path=path, changed=set_attributes(path, owner, group, mode, check_mode), state="file")
+
+  if state == "directory":
+    changed = False
+    if prev_state == "absent":
+      if check_mode:
+        return dict(path=path, changed=True, state="directory")
+      # Each directory created takes the attributes of the task
+      missing = []
+      parent = path.rstrip("/")
+      while parent and not os.path.exists(parent):
+        missing.insert(0, parent)
+        parent = os.path.dirname(parent)
+      for directory in missing:
+        os.mkdir(directory)
+        set_attributes(directory, owner, group, mode, check_mode)
+      changed = True
+    elif prev_state != "directory":
+      raise TaskFailure("{} already exists as a {}".format(path, prev_state))
+    changed = set_attributes(path, owner, group, mode, check_mode) or changed
+    if mk_boolean(args.get("recurse", False)):
+      for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+          changed = set_attributes(os.path.join(root, name), owner, group, mode, check_mode) or changed
+  return dict(path=path, changed=changed, state="directory")
+
+def _file_checksum(path):
+  """
+  Compute the sha1 of a file, as reported by the copy module
+  """
+  res = hashlib.sha1()
+  with open(path, "rb") as stream:
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+      res.update(chunk)
+  return res.hexdigest()
+
+def run_copy(src, args, check_mode):
+  """
+  Execute a copy task whose source was found on the controller
+  """
+  if os.path.isdir(src):
+    raise UnsupportedTask()
+  dest = os.path.expanduser(args["dest"])
+  owner, group, mode = args.get("owner"), args.get("group"), args.get("mode")
+  check_mode_arg(mode)
+  checksum = _file_checksum(src)
+  created_dirs = []
+  if dest.endswith(os.sep):
+    dest = os.path.join(dest, os.path.basename(src))
+    parent = os.path.dirname(dest)
+    while not os.path.exists(parent):
+      created_dirs.insert(0, parent)
+      parent = os.path.dirname(parent)
+  elif os.path.isdir(dest):
+    dest = os.path.join(dest, os.path.basename(src))
+  elif not os.path.exists(os.path.dirname(dest)):
+    raise TaskFailure("Destination directory {} does not exist".format(os.path.dirname(dest)))
+
+  changed = False
+  if not os.path.exists(dest) or (mk_boolean(args.get("force", True)) and _file_checksum(dest) != checksum):
+    changed = True
+    if check_mode:
+      return dict(dest=dest, src=src, checksum=checksum, changed=True)
+    # Like the stock module without directory_mode, the mode of the file is not applied to the directories
+    for directory in created_dirs:
+      os.mkdir(directory)
+      set_attributes(directory, owner, group, None, check_mode)
+    with open(src, "rb") as src_file:
+      atomic_write(dest, src_file.read())
+  changed = set_attributes(dest, owner, group, mode, check_mode) or changed
+  return dict(dest=dest, src=src, checksum=checksum, changed=changed)
+
+def run_lineinfile(args, check_mode):
+  """
+  Execute a lineinfile task
+  """
+  path = os.path.expanduser(args.get("dest") or args.get("path") or args.get("name"))
+  state = args.get("state", "present")
+  regexp = re.compile(args["regexp"]) if args.get("regexp") is not None else None
+  line = args.get("line")
+  check_mode_arg(args.get("mode"))
+  if not os.path.exists(path):
+    if state == "absent":
+      return dict(changed=False, msg="file not present")
+    raise TaskFailure("Destination {} does not exist !".format(path))
+  with open(path, "rb") as dest_file:
+    lines = dest_file.readlines()
+
+  def matches(cur_line):
+    """
+    Check whether a line of the file is the one managed by the task
+    """
+    if regexp is not None:
+      return regexp.search(cur_line) is not None
+    return line == cur_line.rstrip("\r\n")
+
+  msg = ""
+  changed = False
+  if state == "absent":
+    kept = [cur_line for cur_line in lines if not matches(cur_line)]
+    changed = len(kept) != len(lines)
+    msg = "{} line(s) removed".format(len(lines) - len(kept)) if changed else ""
+    lines = kept
+  else:
+    if line is None:
+      raise TaskFailure("line= is required with state=present")
+    insertafter = args.get("insertafter")
+    insre = re.compile(insertafter) if insertafter not in [None, "BOF", "EOF"] else None
+    index = [-1, -1]
+    for lineno, cur_line in enumerate(lines):
+      if matches(cur_line):
+        index[0] = lineno
+      elif insre is not None and insre.search(cur_line):
+        index[1] = lineno + 1
+    if index[0] != -1:
+      if lines[index[0]] != line + os.linesep:
+        lines[index[0]] = line + os.linesep
+        msg, changed = "line replaced", True
+    elif insertafter == "BOF":
+      lines.insert(0, line + os.linesep)
+      msg, changed = "line added", True
+    elif insertafter in [None, "EOF"] or index[1] == -1:
+      if len(lines) != 0 and lines[-1][-1:] not in ["\n", "\r"]:
+        lines.append(os.linesep)
+      lines.append(line + os.linesep)
+      msg, changed = "line added", True
+    else:
+      lines.insert(index[1], line + os.linesep)
+      msg, changed = "line added", True
+
+  if changed and not check_mode:
+    atomic_write(path, "".join(lines))
+  if set_attributes(path, args.get("owner"), args.get("group"), args.get("mode"), check_mode):
+    msg = msg + " and ownership, perms or SE linux context changed" if changed else \
+          "ownership, perms or SE linux context changed"
+    changed = True
+  return dict(changed=changed, msg=msg, backup="")
+
+class InProcessAction(ActionBase):
+  """
+  Action plugin executing a stock module in-process when the connection is local
+  """
+
+  # Name of the stock module
+  MODULE = None
+  # Arguments reproduced in-process
+  SUPPORTED_ARGS = frozenset()
+
+  def _can_run_in_process(self):
+    """
+    Check whether the task can be executed in the Ansible process
+    """
+    return (self._play_context.connection == "local" and not self._play_context.become and
+            not self._play_context.diff and self._task.delegate_to is None and not self._task.async and
+            set(self._task.args).issubset(self.SUPPORTED_ARGS))
+
+  def _run_module(self, tmp, task_vars):
+    """
+    Execute the stock module
+    """
+    return self._execute_module(module_name=self.MODULE, module_args=self._task.args, tmp=tmp,
+                                task_vars=task_vars)
+
+  def _run_in_process(self, check_mode):
+    """
+    Execute the task in-process
+    """
+    raise NotImplementedError()
+
+  def run(self, tmp=None, task_vars=None):
+    """
+    Execute the task
+    """
+    if task_vars is None:
+      task_vars = dict()
+    result = super(InProcessAction, self).run(tmp, task_vars)
+    if self._can_run_in_process():
+      try:
+        return merge_hash(result, self._run_in_process(self._play_context.check_mode))
+      except UnsupportedTask:
+        pass
+      except (TaskFailure, IOError, OSError, re.error) as exc:
+        result.update(failed=True, msg=str(exc))
+        return result
+    return merge_hash(result, self._run_module(tmp, task_vars))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce journal module
+
+The journal records the tasks of each part completed by a run, by their index
+in the tasks file of the role. When a run fails, the next one can resume
+after the completed tasks as long as the role files and the variables of the
+run did not change. Tasks registering a variable are always executed again
+since the tasks following them use their result.
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+try:
+  from ansible.playbook.block import Block
+except ImportError:
+  sys.exit("ansible package is missing")
+
+import i3xfce.loggers
+from i3xfce.manifest import file_hash, MANIFEST_VARIABLES
+
+JOURNAL_VERSION = 1
+JOURNAL_FILE = "journal.json"
+# Task variable identifying a task of a role in the journal
+JOURNAL_VAR = "i3xfce_journal"
+
+class Journal(object):
+  """
+  Class recording the tasks completed by the current run
+  """
+
+  def __init__(self, path, action, variables):
+    """
+    Constructor
+    """
+    self._path = path
+    self._action = str(action)
+    self._variables = dict((name, variables.get(name)) for name in MANIFEST_VARIABLES)
+    self._roles = {}
+
+  def _load(self):
+    """
+    Load the journal of the previous run, None if there is none or it cannot be read
+    """
+    if not os.path.exists(self._path):
+      return None
+    try:
+      with open(self._path) as journal_file:
+        content = json.load(journal_file)
+    except (IOError, ValueError) as exc:
+      i3xfce.loggers.ROOTLOGGER.warn("Ignoring unreadable journal %s: %s", self._path, exc)
+      return None
+    if content.get("version") != JOURNAL_VERSION:
+      return None
+    return content
+
+  def start(self, roles, resume):
+    """
+    Start the journal of a run, roles giving the tasks file and inputs of each part. When resuming, the completed
+    tasks of the previous run are kept for the parts that did not change
+    """
+    previous = self._load() if resume else None
+    if resume and previous is None:
+      i3xfce.loggers.ROOTLOGGER.info("No failed run to resume, every task is executed")
+    elif previous is not None and (previous.get("action") != self._action or
+                                   previous.get("variables") != self._variables):
+      i3xfce.loggers.ROOTLOGGER.info("The failed run was not a %s for the same user and system, every task is \
+executed", self._action)
+      previous = None
+
+    self._roles = {}
+    for role, (tasks_file, inputs) in roles.items():
+      record = dict(tasks=file_hash(tasks_file), inputs=inputs, done=[])
+      previous_record = (previous or {}).get("roles", {}).get(role)
+      if previous_record is not None:
+        if previous_record.get("tasks") == record["tasks"] and previous_record.get("inputs") == inputs:
+          record["done"] = previous_record.get("done", [])
+          i3xfce.loggers.ROOTLOGGER.info("Resuming part %s after %i completed tasks", role, len(record["done"]))
+        else:
+          i3xfce.loggers.ROOTLOGGER.info("Part %s changed since the failed run, all its tasks are executed", role)
+      self._roles[role] = record
+    self.save()
+
+  def get_done_tasks(self, role):
+    """
+    Get the indexes of the completed tasks of a role
+    """
+    return set(self._roles.get(role, {}).get("done", []))
+
+  def task_completed(self, role, index):
+    """
+    Record a completed task
+    """
+    record = self._roles.get(role)
+    if record is None or index in record["done"]:
+      return
+    record["done"].append(index)
+    self.save()
+
+  def save(self):
+    """
+    Write the journal, it is replaced atomically so that a run killed while writing it leaves the previous one
+    """
+    journal_dir = os.path.dirname(self._path)
+    if not os.path.isdir(journal_dir):
+      os.makedirs(journal_dir)
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=journal_dir, suffix=".tmp")
+    try:
+      with os.fdopen(tmp_fd, "w") as journal_file:
+        json.dump(dict(version=JOURNAL_VERSION, action=self._action, variables=self._variables, roles=self._roles),
+                  journal_file, indent=2, sort_keys=True)
+      os.rename(tmp_path, self._path)
+    finally:
+      if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+  def remove(self):
+    """
+    Remove the journal once the run succeeded
+    """
+    if os.path.exists(self._path):
+      os.remove(self._path)
+
+def get_task_id(role, index):
+  """
+  Get the value of the journal variable of a task
+  """
+  return "{}:{}".format(role, index)
+
+def parse_task_id(task_id):
+  """
+  Get the role and index of a task from the value of its journal variable
+  """
+  role, _, index = task_id.rpartition(":")
+  return role, int(index)
+
+def apply_journal(play, journal):
+  """
+  Tag the role tasks of a loaded play with their journal identifier and remove the completed ones, returns the number
+  of removed tasks
+  """
+  res = 0
+  for role in play.get_roles():
+    done = journal.get_done_tasks(role.get_name())
+    index = 0
+    for block in role._task_blocks: # pylint: disable=protected-access
+      kept = []
+      for task in block.block:
+        if isinstance(task, Block) or task.register:
+          # Nested blocks and the tasks registering a variable are executed again
+          kept.append(task)
+        elif index in done:
+          res += 1
+        else:
+          task.vars = dict(task.vars or {}, **{JOURNAL_VAR: get_task_id(role.get_name(), index)})
+          kept.append(task)
+        index += 1
+      block.block = kept
+  return res
@@ -2,15 +2,213 @@
 i3-xfce core module
 """
 
+import json
+import time
+import Queue
+import atexit
 import logging
+import threading
+from collections import deque
 from colorlog import ColoredFormatter
 
 ROOTLOGGER = logging.getLogger("i3-xfce")
+# Logger of the task results, they are only kept in the crash buffer
+RESULTLOGGER = logging.getLogger("i3-xfce.results")
+RESULTLOGGER.propagate = False
+
+# Default memory used by the crash buffer in bytes
+CRASH_BUFFER_SIZE = 1024 * 1024
+# Estimated memory used by a record besides its message
+_RECORD_SIZE = 512
+
+# Attributes given with the extra argument of the logging calls that are written to the JSON lines
+JSON_FIELDS = ["host", "role", "task", "status", "duration"]
+
+class QueueHandler(logging.Handler):
+  """
+  Handler only queueing the records, they are formatted and written by the thread of a QueueListener
+  """
+
+  def __init__(self, queue):
+    """
+    Constructor
+    """
+    logging.Handler.__init__(self)
+    self._queue = queue
+
+  def emit(self, record):
+    """
+    Queue a record, its message is formatted by the thread of the listener
+    """
+    self._queue.put_nowait(record)
+
+class QueueListener(threading.Thread):
+  """
+  Thread passing the queued records to the handlers consuming them
+  """
+
+  def __init__(self, queue):
+    """
+    Constructor
+    """
+    threading.Thread.__init__(self)
+    self.daemon = True
+    self._queue = queue
+    self._handlers = []
+    self._lock = threading.Lock()
+
+  def add_handler(self, handler):
+    """
+    Add a handler consuming the records
+    """
+    with self._lock:
+      self._handlers = self._handlers + [handler]
+
+  def run(self):
+    """
+    Run thread body
+    """
+    while True:
+      record = self._queue.get()
+      if record is None:
+        self._queue.task_done()
+        break
+      with self._lock:
+        handlers = self._handlers
+      for handler in handlers:
+        if record.levelno >= handler.level:
+          handler.handle(record)
+      self._queue.task_done()
+
+  def flush(self):
+    """
+    Wait until the queued records are handled
+    """
+    if self.is_alive():
+      self._queue.join()
+
+  def stop(self):
+    """
+    Stop the thread once the queued records are handled
+    """
+    if self.is_alive():
+      self._queue.put_nowait(None)
+      self.join()
+    for handler in self._handlers:
+      handler.flush()
+
+class JsonFormatter(logging.Formatter):
+  """
+  Formatter writing a record as a JSON object on a single line
+  """
+
+  def format(self, record):
+    """
+    Format a record
+    """
+    res = dict(time="{}.{:03d}Z".format(time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)),
+                                        int(record.msecs)),
+               level=record.levelname,
+               message=record.getMessage())
+    for field in JSON_FIELDS:
+      if hasattr(record, field):
+        res[field] = getattr(record, field)
+    if record.exc_info:
+      res["exception"] = self.formatException(record.exc_info)
+    return json.dumps(res, sort_keys=True)
+
+class RingBufferHandler(logging.Handler):
+  """
+  Handler keeping the last records in memory, the oldest ones are dropped when their estimated size exceeds the
+  capacity. Records are only formatted when the buffer is written
+  """
+
+  def __init__(self, capacity):
+    """
+    Constructor
+    """
+    logging.Handler.__init__(self)
+    self._records = deque()
+    self._size = 0
+    self._capacity = capacity
+
+  def set_capacity(self, capacity):
+    """
+    Set the maximum size of the records kept in bytes
+    """
+    self.acquire()
+    try:
+      self._capacity = capacity
+      self._trim()
+    finally:
+      self.release()
+
+  def get_capacity(self):
+    """
+    Capacity getter
+    """
+    return self._capacity
+
+  def _trim(self):
+    """
+    Drop the oldest records until the buffer fits in its capacity, must be called with the lock acquired
+    """
+    while len(self._records) != 0 and self._size > self._capacity:
+      self._size -= self._records.popleft()[0]
+
+  def emit(self, record):
+    """
+    Keep a record
+    """
+    try:
+      # str() would fail on a non ascii unicode message
+      size = _RECORD_SIZE + (len(record.msg) if isinstance(record.msg, basestring) else len(repr(record.msg)))
+      if isinstance(record.args, tuple):
+        size += sum(len(arg) for arg in record.args if isinstance(arg, basestring))
+      self._records.append((size, record))
+      self._size += size
+      self._trim()
+    except (KeyboardInterrupt, SystemExit):
+      raise
+    except Exception: # pylint: disable=broad-except
+      self.handleError(record)
+
+  def write(self, path):
+    """
+    Write the records kept as JSON lines
+    """
+    self.acquire()
+    try:
+      records = [record for _, record in self._records]
+    finally:
+      self.release()
+    formatter = JsonFormatter()
+    with open(path, "w") as crash_file:
+      for record in records:
+        crash_file.write(formatter.format(record) + "\n")
+    return len(records)
+
+_LISTENER = None
+_QUEUE_HANDLER = None
+_CONSOLE_HANDLER = None
+_JSON_HANDLER = None
+_CRASH_HANDLER = None
+
+def _update_levels():
+  """
+  Only create the records needed by the console, the JSON lines log or the crash buffer
+  """
+  queue_level = logging.DEBUG if _JSON_HANDLER is not None else _CONSOLE_HANDLER.level
+  _QUEUE_HANDLER.setLevel(queue_level)
+  crash_level = logging.DEBUG if _CRASH_HANDLER.get_capacity() > 0 else logging.CRITICAL + 1
+  ROOTLOGGER.setLevel(min(queue_level, crash_level))
+  RESULTLOGGER.setLevel(crash_level)
 
 def init_loggers():
   """
   Function initialize loggers
   """
+  global _LISTENER, _QUEUE_HANDLER, _CONSOLE_HANDLER, _CRASH_HANDLER # pylint: disable=global-statement
   formatter = ColoredFormatter("%(log_color)s%(levelname)-8s%(reset)s %(white)s%(message)s",
                                datefmt=None,
                                reset=True,
@@ -25,13 +223,65 @@ def init_loggers():
                                style='%'
                               )
 
-  handler = logging.StreamHandler()
-  handler.setFormatter(formatter)
+  _CONSOLE_HANDLER = logging.StreamHandler()
+  _CONSOLE_HANDLER.setFormatter(formatter)
+  _CONSOLE_HANDLER.setLevel(logging.WARNING)
+
+  # Records are formatted and written by a thread so that the callbacks of the play do not wait for the terminal
+  queue = Queue.Queue()
+  _LISTENER = QueueListener(queue)
+  _LISTENER.add_handler(_CONSOLE_HANDLER)
+  _LISTENER.start()
+  atexit.register(stop_loggers)
+  _QUEUE_HANDLER = QueueHandler(queue)
+  ROOTLOGGER.addHandler(_QUEUE_HANDLER)
+
+  # The debug records and task results are kept in memory whatever the log level, to be written when a run fails
+  _CRASH_HANDLER = RingBufferHandler(CRASH_BUFFER_SIZE)
+  ROOTLOGGER.addHandler(_CRASH_HANDLER)
+  RESULTLOGGER.addHandler(_CRASH_HANDLER)
+  _update_levels()
+
+def add_json_log(path):
+  """
+  Write every record, debug ones included, to a file as JSON lines
+  """
+  global _JSON_HANDLER # pylint: disable=global-statement
+  _JSON_HANDLER = logging.FileHandler(path)
+  _JSON_HANDLER.setFormatter(JsonFormatter())
+  _LISTENER.add_handler(_JSON_HANDLER)
+  _update_levels()
+
+def set_crash_buffer_size(size):
+  """
+  Set the memory used to keep the last debug records and task results in bytes, 0 disables the crash buffer
+  """
+  _CRASH_HANDLER.set_capacity(size)
+  _update_levels()
+
+def write_crash_log(path):
+  """
+  Write the last debug records and task results kept in memory to a file, returns the number of records written
+  """
+  return _CRASH_HANDLER.write(path)
+
+def flush_loggers():
+  """
+  Wait until the queued records are written, before writing to the terminal without the loggers
+  """
+  if _LISTENER is not None:
+    _LISTENER.flush()
 
-  ROOTLOGGER.addHandler(handler)
+def stop_loggers():
+  """
+  Write the queued records and stop the logging thread
+  """
+  if _LISTENER is not None:
+    _LISTENER.stop()
 
 def set_log_level(lvl):
   """
   Function to set log level
   """
-  ROOTLOGGER.setLevel(lvl)
+  _CONSOLE_HANDLER.setLevel(lvl)
+  _update_levels()
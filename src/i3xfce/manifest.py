@@ -0,0 +1,261 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce manifest module
+
+The manifest records, for each installed part, the hashes of the files it was
+installed from and the state of the files and packages it left on the system.
+A part whose inputs and targets did not change since does not need to run again.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import subprocess
+
+import i3xfce
+import i3xfce.loggers
+import i3xfce.phases
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+# Modules whose destination is left in a known state by the part
+_TARGET_MODULES = frozenset(["copy", "template", "file", "lineinfile", "patch", "git", "unarchive", "i3xfce_xfconf",
+                              "i3xfce_ini"])
+# Destinations used as scratch space, their state does not matter
+_TRANSIENT_DIRS = ("/tmp/",)
+# Variables the manifest is able to resolve in a destination
+_VAR_RE = re.compile(r"{{\s*(\w+)\s*}}")
+# Variables of the run a part is installed for
+MANIFEST_VARIABLES = ["remote_user", "user_home", "sysroot"]
+
+def file_hash(path):
+  """
+  Compute the sha256 of a file
+  """
+  res = hashlib.sha256()
+  with open(path, "rb") as stream:
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+      res.update(chunk)
+  return res.hexdigest()
+
+def tree_hash(path):
+  """
+  Compute a sha256 of the relative paths and contents of the files of a directory
+  """
+  res = hashlib.sha256()
+  for root, dirs, files in os.walk(path):
+    dirs.sort()
+    for name in sorted(files):
+      file_path = os.path.join(root, name)
+      res.update(os.path.relpath(file_path, path))
+      res.update(file_hash(file_path))
+  return res.hexdigest()
+
+def get_target_state(path):
+  """
+  Get the state of a target path: the hash of a file, the target of a link, whether it is a directory or None
+  when it does not exist
+  """
+  if os.path.islink(path):
+    return "link:" + os.readlink(path)
+  if os.path.isdir(path):
+    return "directory"
+  if os.path.isfile(path):
+    return "sha256:" + file_hash(path)
+  return None
+
+def render_path(value, variables):
+  """
+  Replace the variables of a path, returns None when one of them is unknown
+  """
+  unresolved = [name for name in _VAR_RE.findall(value) if name not in variables]
+  if len(unresolved) != 0:
+    return None
+  return _VAR_RE.sub(lambda match: str(variables[match.group(1)]), value)
+
+def get_part_targets(plan, part, variables):
+  """
+  Get the paths left in a known state by a part
+  """
+  res = []
+  for task in plan.get_role_tasks(part):
+    if task.module not in _TARGET_MODULES:
+      continue
+    for dest in i3xfce.phases.get_task_destinations(task):
+      path = render_path(dest, variables)
+      if path is None or path.startswith(_TRANSIENT_DIRS) or path in res:
+        continue
+      res.append(path)
+  return res
+
+def get_part_packages(plan, part):
+  """
+  Get the apt packages installed by a part
+  """
+  res = []
+  for task in plan.get_role_tasks(part):
+    if task.module == "apt" and task.args.get("state", "present") in ["present", "installed"]:
+      res.extend([pkg for pkg in task.items or [] if pkg not in res])
+  return res
+
+def get_part_repositories(plan, part):
+  """
+  Get the apt repositories added by a part
+  """
+  res = []
+  for task in plan.get_role_tasks(part):
+    if task.module == "apt_repository" and task.args.get("state", "present") == "present":
+      res.extend([repo for repo in task.items or [task.args.get("repo")] if repo not in res])
+  return res
+
+def get_installed_packages(packages):
+  """
+  Get which of the given packages are installed on the host, in a single dpkg query
+  """
+  if len(packages) == 0:
+    return set()
+  cmd = ["dpkg-query", "-W", "-f=${Package} ${Status}\n"] + packages
+  try:
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  except OSError as exc:
+    i3xfce.loggers.ROOTLOGGER.debug("Unable to query the installed packages: %s", exc)
+    return set()
+  out, _ = proc.communicate()
+  res = set()
+  for line in out.splitlines():
+    fields = line.split(" ", 1)
+    if len(fields) == 2 and fields[1].endswith("install ok installed"):
+      res.add(fields[0])
+  return res
+
+def get_part_inputs(role_dir, library_dir):
+  """
+  Get the hashes of what a part is installed from
+  """
+  return dict(version=i3xfce.__version__, role=tree_hash(role_dir), library=tree_hash(library_dir))
+
+class Manifest(object):
+  """
+  Class recording what was installed by the previous runs
+  """
+
+  def __init__(self, path, variables):
+    """
+    Constructor
+    """
+    self._path = path
+    self._variables = dict((name, variables.get(name)) for name in MANIFEST_VARIABLES)
+    self._parts = {}
+
+  def load(self):
+    """
+    Load the manifest written by the previous run, an unreadable manifest is considered empty
+    """
+    self._parts = {}
+    if not os.path.exists(self._path):
+      return
+    try:
+      with open(self._path) as manifest_file:
+        content = json.load(manifest_file)
+      if content.get("version") == MANIFEST_VERSION:
+        self._parts = content.get("parts", {})
+      else:
+        i3xfce.loggers.ROOTLOGGER.debug("Ignoring manifest %s written by another version", self._path)
+    except (IOError, ValueError) as exc:
+      i3xfce.loggers.ROOTLOGGER.warn("Ignoring unreadable manifest %s: %s", self._path, exc)
+
+  def save(self):
+    """
+    Write the manifest, it is replaced atomically
+    """
+    manifest_dir = os.path.dirname(self._path)
+    if not os.path.isdir(manifest_dir):
+      os.makedirs(manifest_dir)
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=manifest_dir, suffix=".tmp")
+    try:
+      with os.fdopen(tmp_fd, "w") as manifest_file:
+        json.dump(dict(version=MANIFEST_VERSION, parts=self._parts), manifest_file, indent=2, sort_keys=True)
+      os.rename(tmp_path, self._path)
+    finally:
+      if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    i3xfce.loggers.ROOTLOGGER.debug("Manifest written to %s", self._path)
+
+  def get_parts(self):
+    """
+    Get the recorded parts
+    """
+    return self._parts
+
+  def get_change_reason(self, part, inputs):
+    """
+    Get why a part has to be executed again, None if it is up to date
+    """
+    record = self._parts.get(part)
+    if record is None:
+      return "not installed by a previous run"
+    if record.get("variables") != self._variables:
+      return "installed for another user or system root"
+    if record.get("inputs") != inputs:
+      return "its files changed"
+    for path, state in sorted(record.get("targets", {}).items()):
+      if get_target_state(path) != state:
+        return "{} was modified".format(path)
+    missing = set(record.get("packages", [])) - get_installed_packages(record.get("packages", []))
+    if len(missing) != 0:
+      return "packages {} are not installed".format(", ".join(sorted(missing)))
+    return None
+
+  def get_changed_parts(self, parts, inputs):
+    """
+    Get the parts that have to be executed again
+    """
+    res = []
+    for part in parts:
+      reason = self.get_change_reason(part, inputs[part])
+      if reason is None:
+        i3xfce.loggers.ROOTLOGGER.info("Part %s is up to date", part)
+      else:
+        i3xfce.loggers.ROOTLOGGER.debug("Part %s has to be executed: %s", part, reason)
+        res.append(part)
+    return res
+
+  def update_part(self, part, inputs, plan, variables):
+    """
+    Record the state left by a successful installation of a part
+    """
+    self._parts[part] = dict(inputs=inputs,
+                             variables=self._variables,
+                             installed=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+                             packages=get_part_packages(plan, part),
+                             repositories=get_part_repositories(plan, part),
+                             targets=dict((path, get_target_state(path))
+                                          for path in get_part_targets(plan, part, variables)))
+
+  def remove_part(self, part):
+    """
+    Forget a part that was uninstalled
+    """
+    self._parts.pop(part, None)
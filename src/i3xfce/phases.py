@@ -0,0 +1,322 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce phases module
+
+Phases are tasks built from the plan of every selected part and executed
+once for all of them, before or after the roles.
+"""
+
+import os
+import re
+
+import i3xfce.loggers
+
+# Variable registered by the apt transaction, role apt tasks are skipped when it succeeded
+APT_TRANSACTION_VAR = "i3xfce_apt_transaction"
+# Play variable telling the roles that their PPAs are handled by the repository phase
+REPOSITORY_PHASE_VAR = "i3xfce_repository_phase"
+# Variable set when installing from a bundle, tasks reaching the network are skipped
+OFFLINE_VAR = "i3xfce_offline"
+# Variable registered when the git mirrors were prefetched, role mirror updates are skipped when it succeeded
+PREFETCH_GIT_VAR = "i3xfce_prefetch_git"
+# Role variable listing the python packages, their wheels are prefetched when a task uses it
+PIP_PACKAGES_VAR = "pip_packages"
+
+# Default directory where i3-xfce keeps its state between runs, the play uses i3xfce_state_dir
+STATE_DIR = "/var/lib/i3-xfce"
+
+# Refreshes the apt cache only if the sources differ from the ones of the last refresh. Packages and PPAs are always
+# managed on the host, whatever the system root
+_APT_REFRESH_CMD = ("sum=$(cat /etc/apt/sources.list /etc/apt/sources.list.d/*.list 2>/dev/null | sha1sum); "
+                    "if [ \"$sum\" != \"$(cat {stamp} 2>/dev/null)\" ]; then "
+                    "apt-get -q update && mkdir -p {{{{i3xfce_state_dir}}}} && "
+                    "echo \"$sum\" > {stamp} && echo refreshed; "
+                    "fi").format(stamp="{{i3xfce_state_dir}}/apt-sources.sha1")
+
+# Apt source of the repository extracted from a bundle, it is the only source refreshed
+_BUNDLE_SOURCE = "/etc/apt/sources.list.d/i3-xfce-bundle.list"
+_BUNDLE_REFRESH_CMD = ("apt-get -q -o Dir::Etc::sourcelist=sources.list.d/i3-xfce-bundle.list "
+                       "-o Dir::Etc::sourceparts=- -o APT::Get::List-Cleanup=0 update")
+
+# Clones or updates the mirror of a git repository, the mirror appears atomically
+_GIT_MIRROR_CMD = ("if [ ! -d {mirror} ]; then "
+                   "mkdir -p {{{{i3xfce_git_mirror_dir}}}} && rm -rf {mirror}.tmp && "
+                   "git clone -q --mirror {repo} {mirror}.tmp && mv {mirror}.tmp {mirror}; "
+                   "elif [ -w {mirror} ]; then git --git-dir={mirror} fetch -q --prune; fi")
+_PIP_WHEEL_CMD = ("pip wheel -q --wheel-dir={{{{i3xfce_cache_dir}}}}/wheels "
+                  "--find-links={{{{i3xfce_cache_dir}}}}/wheels {{{{{var}|join(' ')}}}}").format(var=PIP_PACKAGES_VAR)
+# Maximum duration of a prefetch in seconds and delay between two checks of its completion
+_PREFETCH_TIMEOUT = 1800
+_PREFETCH_DELAY = 2
+
+PHASES_ROLE = "i3-xfce"
+
+USER_HOME = "{{user_home}}"
+# Modules whose destination is a whole tree written by i3-xfce
+_TREE_MODULES = frozenset(["git", "unarchive"])
+# Files matching this find expression do not have the expected ownership or mode
+_BAD_OWNERSHIP_EXPR = ("\\( ! -user {{remote_user}} -o ! -group {{remote_user}} -o ! -perm -u+rw "
+                       "-o \\( -type d ! -perm -u+x \\) \\)")
+# Trees of the user home given back to the user when the tasks cannot be planned
+_HOME_TREES = [".config", ".i3", ".conky", ".fonts", ".oh-my-zsh"]
+_ITEM_RE = re.compile(r"{{\s*item\s*}}")
+_VARIABLE_RE = re.compile(r"^{{\s*(\w+)\s*}}$")
+
+def _unique(values):
+  """
+  Remove duplicates from a list while keeping its order
+  """
+  res = []
+  for value in values:
+    if value not in res:
+      res.append(value)
+  return res
+
+def _get_looped_items(plan, module, states):
+  """
+  Get the items looped over by the tasks of a module, grouped by role
+  """
+  res = {}
+  for task in plan.get_tasks():
+    if task.module != module or task.items is None or task.args.get("state", "present") not in states:
+      continue
+    res.setdefault(task.role, []).extend(task.items)
+  return res
+
+def get_repository_tasks(plan, state):
+  """
+  Get the tasks adding or removing the PPAs of every selected part, followed by a single apt cache refresh
+  """
+  repositories = _unique([repo for role in plan.get_roles()
+                          for repo in _get_looped_items(plan, "apt_repository", [state]).get(role, [])])
+  if len(repositories) == 0:
+    return []
+  return [{"name": "{} PPA repositories of the selected parts".format("Add" if state == "present" else "Remove"),
+           "apt_repository": "repo='{{{{item}}}}' state={} update_cache=false".format(state),
+           "with_items": repositories},
+          {"name": "Refresh apt cache",
+           "shell": _APT_REFRESH_CMD,
+           "register": "i3xfce_apt_refresh",
+           "changed_when": "'refreshed' in i3xfce_apt_refresh.stdout"}]
+
+def get_bundle_repository_tasks(state):
+  """
+  Get the tasks adding or removing the apt repository of an imported bundle
+  """
+  if state == "absent":
+    return [{"name": "Remove the apt repository of the bundle",
+             "file": {"path": _BUNDLE_SOURCE, "state": "absent"}}]
+  return [{"name": "Add the apt repository of the bundle",
+           "copy": {"content": "deb [trusted=yes] file:{{i3xfce_cache_dir}}/apt ./\n", "dest": _BUNDLE_SOURCE}},
+          {"name": "Refresh apt cache of the bundle repository",
+           "shell": _BUNDLE_REFRESH_CMD}]
+
+def get_apt_transaction_tasks(plan):
+  """
+  Get the tasks installing the apt packages of every selected part in one transaction
+  """
+  packages = _get_looped_items(plan, "apt", ["present", "installed"])
+  if len(packages) == 0:
+    return []
+
+  for role, role_packages in packages.items():
+    i3xfce.loggers.ROOTLOGGER.debug("Packages of part %s: %s", role, ", ".join(role_packages))
+
+  # Errors are ignored, the apt task of each part reports the failure against its part
+  return [{"name": "Install packages of the selected parts using apt",
+           "apt": {"name": _unique([pkg for role in plan.get_roles() for pkg in packages.get(role, [])]),
+                   "force": "yes", "state": "installed"},
+           "register": APT_TRANSACTION_VAR,
+           "ignore_errors": "yes"}]
+
+def get_mirror_path(repo):
+  """
+  Get the path of the mirror of a git repository, named after the last component of its url
+  """
+  match = _VARIABLE_RE.match(repo.strip())
+  if match is not None:
+    return "{{{{i3xfce_git_mirror_dir}}}}/{{{{{}|basename}}}}".format(match.group(1))
+  return "{{{{i3xfce_git_mirror_dir}}}}/{}".format(os.path.basename(repo.strip().rstrip("/")))
+
+def _get_prefetch_tasks(name, var, task):
+  """
+  Get the tasks starting a download in the background and waiting for it
+  """
+  job_var = var + "_job"
+  start = dict(task)
+  start.update({"name": "Start prefetch of {}".format(name),
+                "register": job_var,
+                "async": _PREFETCH_TIMEOUT,
+                "poll": 0})
+  # A prefetch failure is not fatal, the task using the download fetches it again
+  wait = {"name": "Wait for prefetch of {}".format(name),
+          "async_status": "jid={{{{{}.ansible_job_id}}}}".format(job_var),
+          "register": var,
+          "until": "{}.finished".format(var),
+          "retries": _PREFETCH_TIMEOUT // _PREFETCH_DELAY,
+          "delay": _PREFETCH_DELAY,
+          "ignore_errors": "yes"}
+  return start, wait
+
+def get_prefetch_tasks(plan):
+  """
+  Get the tasks starting the downloads of every selected part in the background, and the tasks waiting for them
+  """
+  downloads = []
+  for task in plan.get_tasks():
+    if task.module == "get_url" and "url" in task.args and "dest" in task.args:
+      downloads.append((os.path.basename(task.args["dest"]),
+                        "i3xfce_prefetch_{}_{}".format(task.role, task.index),
+                        {"get_url": {"url": task.args["url"], "dest": task.args["dest"]}}))
+  repositories = _unique([task.args["repo"] for task in plan.get_tasks()
+                          if task.module == "git" and "repo" in task.args])
+  if len(repositories) != 0:
+    cmd = " && ".join("({})".format(_GIT_MIRROR_CMD.format(repo=repo, mirror=get_mirror_path(repo)))
+                      for repo in repositories)
+    downloads.append(("git mirrors", PREFETCH_GIT_VAR, {"shell": cmd}))
+  if any(PIP_PACKAGES_VAR in str(task.args.get("_raw_params", "")) for task in plan.get_tasks()):
+    # pip may only be installed by the apt phase on a new system, the prefetch is then skipped
+    downloads.append(("python wheels", "i3xfce_prefetch_pip",
+                      {"shell": "! command -v pip >/dev/null || {}".format(_PIP_WHEEL_CMD)}))
+
+  starts = []
+  waits = []
+  for name, var, task in downloads:
+    start, wait = _get_prefetch_tasks(name, var, task)
+    starts.append(start)
+    waits.append(wait)
+  return starts, waits
+
+def _expand_item(value, item):
+  """
+  Get the value taken by a task argument for an item of the loop
+  """
+  if item is None:
+    return value
+  return _ITEM_RE.sub(str(item), value)
+
+def get_task_destinations(task, include_removed=False):
+  """
+  Get the paths written by a planned task, one per item of its loop, the paths removed by the task are only included
+  when requested
+  """
+  if task.args.get("state") == "absent" and not include_removed:
+    return []
+  dest = task.args.get("dest", task.args.get("path"))
+  if dest is None:
+    return []
+  res = []
+  for item in task.items or [None]:
+    task_dest = _expand_item(dest, item)
+    if task.module == "copy" and task_dest.endswith("/"):
+      task_dest += os.path.basename(_expand_item(task.args.get("src", ""), item))
+    res.append(task_dest.rstrip("/"))
+  return res
+
+def get_written_paths(plan):
+  """
+  Get the paths written in the user home by the planned tasks, as a tuple of the paths whose own ownership is
+  managed and of the trees managed recursively
+  """
+  paths = []
+  trees = []
+  for task in plan.get_tasks():
+    for task_dest in get_task_destinations(task):
+      if not task_dest.startswith(USER_HOME + "/"):
+        continue
+      if task.module in _TREE_MODULES or task.args.get("recurse") in ["yes", "true", True]:
+        trees.append(task_dest)
+      # Parent directories created on the fly are owned by root too
+      parent = task_dest
+      while parent != USER_HOME:
+        paths.append(parent)
+        parent = os.path.dirname(parent)
+  return sorted(_unique(paths)), sorted(_unique(trees))
+
+def _get_ownership_task(cmd):
+  """
+  Get the task running a command that fixes the ownership of files in the user home
+  """
+  return {"name": "Change ownership of the files written in the user home",
+          "shell": cmd,
+          "register": "i3xfce_ownership",
+          "changed_when": "i3xfce_ownership.stdout != ''"}
+
+def _get_fix_cmd():
+  """
+  Get the find actions printing and fixing the files whose ownership or mode is wrong
+  """
+  fix_cmd = "{expr} -print -exec chown -h {{{{remote_user}}}}:{{{{remote_user}}}} {{}} + -exec chmod u+rwX {{}} +"
+  return fix_cmd.format(expr=_BAD_OWNERSHIP_EXPR)
+
+def get_ownership_tasks(plan):
+  """
+  Get the task giving the paths written in the user home back to the user, in a single pass that only touches
+  files whose ownership or mode is wrong
+  """
+  paths, trees = get_written_paths(plan)
+  if len(paths) == 0:
+    return []
+  cmd = "for p in {paths}; do [ ! -e \"$p\" ] || find \"$p\" -maxdepth 0 {fix}; done".format(
+      paths=" ".join(paths), fix=_get_fix_cmd())
+  if len(trees) != 0:
+    cmd += "; for p in {trees}; do [ ! -e \"$p\" ] || find \"$p\" -mindepth 1 {fix}; done".format(
+        trees=" ".join(trees), fix=_get_fix_cmd())
+  return [_get_ownership_task(cmd)]
+
+def get_fallback_ownership_tasks():
+  """
+  Get the task giving the trees i3-xfce writes in the user home back to the user, recursively, when the written
+  paths cannot be planned
+  """
+  trees = " ".join("{}/{}".format(USER_HOME, tree) for tree in _HOME_TREES)
+  return [_get_ownership_task("for p in {trees}; do [ ! -e \"$p\" ] || find \"$p\" {fix}; done".format(
+      trees=trees, fix=_get_fix_cmd()))]
+
+def get_play_vars():
+  """
+  Get the variables of the play telling the roles which phases are executed
+  """
+  return {REPOSITORY_PHASE_VAR: True}
+
+def get_pre_tasks(action, plan, offline=False):
+  """
+  Get the phases executed before the roles
+  """
+  if str(action) == "install":
+    if offline:
+      return get_bundle_repository_tasks("present") + get_apt_transaction_tasks(plan)
+    # The downloads run while the apt cache is refreshed and the packages are installed
+    starts, waits = get_prefetch_tasks(plan)
+    return starts + get_repository_tasks(plan, "present") + get_apt_transaction_tasks(plan) + waits
+  return []
+
+def get_post_tasks(action, plan, offline=False):
+  """
+  Get the phases executed after the roles
+  """
+  if str(action) == "install":
+    if offline:
+      return get_ownership_tasks(plan) + get_bundle_repository_tasks("absent")
+    return get_ownership_tasks(plan)
+  if str(action) == "uninstall":
+    return get_repository_tasks(plan, "absent")
+  return []
@@ -0,0 +1,233 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce planner module
+"""
+
+import os
+import sys
+from collections import namedtuple
+
+try:
+  import yaml
+except ImportError:
+  sys.exit("pyyaml package is missing")
+
+try:
+  from ansible.parsing.splitter import parse_kv
+except ImportError:
+  sys.exit("ansible package is missing")
+
+import i3xfce.loggers
+
+PlannedTask = namedtuple("PlannedTask", ["role", "index", "name", "module", "args", "items",
+                                         "loop_size"])
+
+class PlanningException(Exception):
+  """
+  Exception raised when a role uses a construct the planner cannot handle
+  """
+
+  def __init__(self, msg):
+    """
+    Constructor
+    """
+    Exception.__init__(self)
+    self._msg = msg
+
+  def __str__(self):
+    """
+    Convert exception to string
+    """
+    return self._msg
+
+class ExecutionPlan(object):
+  """
+  Ordered list of the tasks a play is going to execute
+  """
+
+  def __init__(self, tasks):
+    """
+    Constructor
+    """
+    self._tasks = tasks
+
+  def get_tasks(self):
+    """
+    Get the planned tasks
+    """
+    return self._tasks
+
+  def get_roles(self):
+    """
+    Get the roles of the planned tasks in execution order
+    """
+    res = []
+    for task in self._tasks:
+      if task.role not in res:
+        res.append(task.role)
+    return res
+
+  def get_role_tasks(self, role):
+    """
+    Get the planned tasks of a role
+    """
+    return [task for task in self._tasks if task.role == role]
+
+  def get_total_tasks_num(self):
+    """
+    Get the total number of tasks being executed
+    """
+    return len(self._tasks)
+
+  def get_task_name_max_len(self):
+    """
+    Get the maximum length of the name between each tasks being executed
+    """
+    return max([len(task.name) for task in self._tasks] + [0])
+
+class RolePlanner(object):
+  """
+  Class reading the role task files to know what a play will execute without running it
+  """
+
+  # Keywords that can be found on a task without changing the number of times it starts
+  _TASK_KEYWORDS = frozenset(["name", "args", "when", "register", "with_items", "ignore_errors", "changed_when",
+                              "failed_when", "check_mode", "always_run", "become", "become_user", "tags", "notify",
+                              "environment", "no_log", "run_once", "delegate_to", "until", "retries", "delay",
+                              "async", "poll", "vars"])
+  # Modules taking a free form command line instead of key=value arguments
+  _RAW_PARAMS_MODULES = frozenset(["shell", "command", "script", "raw"])
+  # Keywords the planner does not know how to expand
+  _UNSUPPORTED_KEYWORDS = frozenset(["include", "include_role", "include_vars", "block", "meta"])
+
+  def __init__(self, roles_dir):
+    """
+    Constructor
+    """
+    self._roles_dir = roles_dir
+
+  def get_role_dir(self, action, role):
+    """
+    Get the directory of a role
+    """
+    return os.path.join(self._roles_dir, str(action), role)
+
+  def get_role_defaults(self, action, role):
+    """
+    Get the default variables of a role
+    """
+    defaults_file = os.path.join(self.get_role_dir(action, role), "defaults", "main.yml")
+    if not os.path.exists(defaults_file):
+      return {}
+    try:
+      with open(defaults_file) as defaults_stream:
+        return yaml.safe_load(defaults_stream) or {}
+    except (IOError, yaml.YAMLError) as exc:
+      raise PlanningException("Unable to read defaults of role {}: {}".format(role, exc))
+
+  def plan(self, action, roles):
+    """
+    Plan the tasks executed by the given roles for an action
+    """
+    tasks = []
+    for role in roles:
+      tasks.extend(self._plan_role(action, role))
+    i3xfce.loggers.ROOTLOGGER.debug("%i tasks planned for the %s action", len(tasks), action)
+    return ExecutionPlan(tasks)
+
+  def plan_tasks(self, role, raw_tasks):
+    """
+    Plan tasks that are not read from a role file, such as the pre_tasks of the play
+    """
+    return [self._plan_task(role, index, raw_task) for index, raw_task in enumerate(raw_tasks)]
+
+  def _plan_role(self, action, role):
+    """
+    Plan the tasks of a single role
+    """
+    role_dir = self.get_role_dir(action, role)
+    if os.path.exists(os.path.join(role_dir, "meta", "main.yml")):
+      raise PlanningException("Role {} has dependencies".format(role))
+    if os.path.exists(os.path.join(role_dir, "handlers", "main.yml")):
+      raise PlanningException("Role {} has handlers".format(role))
+
+    tasks_file = os.path.join(role_dir, "tasks", "main.yml")
+    try:
+      with open(tasks_file) as tasks_stream:
+        raw_tasks = yaml.safe_load(tasks_stream)
+    except (IOError, yaml.YAMLError) as exc:
+      raise PlanningException("Unable to read tasks of role {}: {}".format(role, exc))
+
+    if raw_tasks is None:
+      return []
+    if not isinstance(raw_tasks, list):
+      raise PlanningException("Tasks of role {} are not a list".format(role))
+    return self.plan_tasks(role, raw_tasks)
+
+  def _plan_task(self, role, index, raw_task):
+    """
+    Plan a single task
+    """
+    if not isinstance(raw_task, dict):
+      raise PlanningException("Task {} of role {} is not a mapping".format(index, role))
+
+    unsupported = self._UNSUPPORTED_KEYWORDS.intersection(raw_task)
+    if unsupported:
+      raise PlanningException("Task {} of role {} uses {}".format(index, role, ", ".join(sorted(unsupported))))
+
+    module = None
+    module_args = None
+    for key, value in raw_task.items():
+      if key in self._TASK_KEYWORDS:
+        continue
+      if key.startswith("with_"):
+        raise PlanningException("Task {} of role {} uses unsupported loop {}".format(index, role, key))
+      if module is not None:
+        raise PlanningException("Task {} of role {} has several modules".format(index, role))
+      module, module_args = key, value
+
+    if module is None:
+      raise PlanningException("Task {} of role {} has no module".format(index, role))
+    if module in ["action", "local_action"]:
+      module, _, module_args = str(module_args).strip().partition(" ")
+
+    args = RolePlanner._parse_args(module, module_args)
+    args.update(raw_task.get("args") or {})
+
+    items = raw_task.get("with_items")
+    if not isinstance(items, list):
+      items = None
+
+    name = raw_task.get("name") or module
+    return PlannedTask(role=role, index=index, name=name.strip(), module=module, args=args, items=items,
+                       loop_size=len(items) if items is not None else None)
+
+  @staticmethod
+  def _parse_args(module, module_args):
+    """
+    Parse module arguments given either as a mapping or as a key=value string
+    """
+    if module_args is None:
+      return {}
+    if isinstance(module_args, dict):
+      return dict(module_args)
+    # Like Ansible, only the free form modules keep the tokens that are not one of their options as the command line
+    return parse_kv(str(module_args), check_raw=module in RolePlanner._RAW_PARAMS_MODULES)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce profiler module
+"""
+
+import json
+import time
+import functools
+
+import i3xfce.loggers
+
+REPORT_VERSION = 1
+
+def profiled(func):
+  """
+  Decorator accounting the time spent in a callback method to the profiler of the callback, if any
+  """
+  @functools.wraps(func)
+  def wrapper(self, *args, **kwargs):
+    """
+    Wrapped callback method
+    """
+    start = time.time()
+    try:
+      return func(self, *args, **kwargs)
+    finally:
+      if self.get_profiler() is not None:
+        self.get_profiler().add_callback_time(time.time() - start)
+  return wrapper
+
+class TaskProfiler(object):
+  """
+  Class recording the time spent in each task, loop item and role
+  """
+
+  def __init__(self):
+    """
+    Constructor
+    """
+    self._start = time.time()
+    self._end = None
+    self._tasks = []
+    self._current = None
+    self._callback_time = 0.0
+
+  def task_started(self, role, name):
+    """
+    Record the start of a task
+    """
+    now = time.time()
+    self._close_current()
+    self._current = dict(role=role, name=name, start=now, end=now, last_event=now, callback_time=0.0, results=0,
+                         items=[])
+
+  def item_completed(self, item):
+    """
+    Record the completion of a loop item of the current task
+    """
+    if self._current is None:
+      return
+    now = time.time()
+    self._current["items"].append(dict(item=str(item), time=now - self._current["last_event"]))
+    self._current["last_event"] = now
+
+  def result_received(self):
+    """
+    Record a task result, the task lasts until its last result is received
+    """
+    if self._current is None:
+      return
+    now = time.time()
+    self._current["results"] += 1
+    self._current["end"] = now
+    self._current["last_event"] = now
+
+  def add_callback_time(self, duration):
+    """
+    Account time spent in the Ansible callback
+    """
+    self._callback_time += duration
+    if self._current is not None:
+      self._current["callback_time"] += duration
+
+  def _close_current(self):
+    """
+    Store the task being recorded
+    """
+    if self._current is None:
+      return
+    task = self._current
+    wall_time = task["end"] - task["start"]
+    self._tasks.append(dict(role=task["role"], name=task["name"], wall_time=wall_time,
+                            worker_time=max(wall_time - task["callback_time"], 0.0),
+                            callback_time=task["callback_time"], results=task["results"], items=task["items"]))
+    self._current = None
+
+  def stop(self):
+    """
+    Stop recording
+    """
+    self._close_current()
+    if self._end is None:
+      self._end = time.time()
+
+  def get_report(self):
+    """
+    Get the report as a dictionary
+    """
+    roles = {}
+    for task in self._tasks:
+      role = roles.setdefault(task["role"], dict(wall_time=0.0, worker_time=0.0, callback_time=0.0, tasks=0))
+      role["tasks"] += 1
+      for key in ["wall_time", "worker_time", "callback_time"]:
+        role[key] += task[key]
+    return dict(version=REPORT_VERSION,
+                started=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self._start)),
+                wall_time=(self._end or time.time()) - self._start,
+                callback_time=self._callback_time,
+                roles=roles,
+                tasks=self._tasks)
+
+  def get_top_tasks(self, top_nb):
+    """
+    Get the slowest tasks
+    """
+    return sorted(self._tasks, key=lambda task: task["wall_time"], reverse=True)[:top_nb]
+
+  def write_report(self, path):
+    """
+    Write the report as JSON
+    """
+    with open(path, "w") as report_file:
+      json.dump(self.get_report(), report_file, indent=2, sort_keys=True)
+    i3xfce.loggers.ROOTLOGGER.info("Profiling report written to %s", path)
+
+  def log_summary(self, top_nb):
+    """
+    Log the slowest tasks and the time spent in each role
+    """
+    report = self.get_report()
+    i3xfce.loggers.ROOTLOGGER.info("Run took %.2fs, %.2fs spent in callbacks", report["wall_time"],
+                                   report["callback_time"])
+    for role, role_report in sorted(report["roles"].items(), key=lambda role: role[1]["wall_time"], reverse=True):
+      i3xfce.loggers.ROOTLOGGER.info("%8.2fs  part %s (%i tasks)", role_report["wall_time"], role,
+                                     role_report["tasks"])
+    for task in self.get_top_tasks(top_nb):
+      i3xfce.loggers.ROOTLOGGER.info("%8.2fs  %s : %s (worker %.2fs, callback %.2fs)", task["wall_time"],
+                                     task["role"], task["name"], task["worker_time"], task["callback_time"])
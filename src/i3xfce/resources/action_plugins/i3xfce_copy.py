@@ -0,0 +1,56 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Action plugin executing the copy module in-process
+"""
+
+from ansible.errors import AnsibleError
+from ansible.plugins.action.copy import ActionModule as CopyActionModule
+
+from i3xfce.fastpath import InProcessAction, UnsupportedTask, run_copy
+
+class ActionModule(InProcessAction):
+  """
+  In-process copy action
+  """
+
+  MODULE = "copy"
+  SUPPORTED_ARGS = frozenset(["src", "dest", "owner", "group", "mode", "force"])
+
+  def _run_module(self, tmp, task_vars):
+    """
+    Execute the stock copy action, which transfers the source file first
+    """
+    action = CopyActionModule(self._task, self._connection, self._play_context, self._loader, self._templar,
+                              self._shared_loader_obj)
+    return action.run(tmp, task_vars)
+
+  def _run_in_process(self, check_mode):
+    """
+    Execute the task in-process
+    """
+    if self._task.args.get("src") is None or self._task.args.get("dest") is None:
+      raise UnsupportedTask()
+    try:
+      src = self._find_needle("files", self._task.args["src"])
+    except AnsibleError:
+      # The stock action reports the missing source
+      raise UnsupportedTask()
+    return run_copy(src, self._task.args, check_mode)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Action plugin executing the lineinfile module in-process
+"""
+
+from i3xfce.fastpath import InProcessAction, run_lineinfile
+
+class ActionModule(InProcessAction):
+  """
+  In-process lineinfile action
+  """
+
+  MODULE = "lineinfile"
+  SUPPORTED_ARGS = frozenset(["dest", "path", "name", "state", "line", "regexp", "insertafter", "owner", "group",
+                              "mode"])
+
+  def _run_in_process(self, check_mode):
+    """
+    Execute the task in-process
+    """
+    return run_lineinfile(self._task.args, check_mode)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Ansible module building a source tarball with cmake and caching the result
+"""
+
+DOCUMENTATION = '''
+---
+module: i3xfce_build
+short_description: Build and install a cmake project, reusing a cached build when possible
+description:
+  - The build output is stored in I(cache_dir) under a key made of the source tarball hash and of the
+    toolchain versions. A cached build is installed without compiling anything.
+options:
+  name:
+    description: Name of the artifact in the cache
+    required: true
+  src:
+    description: Path of the source tarball on the target
+    required: true
+  cache_dir:
+    description: Directory holding the build artifacts, it can be read-only
+    default: /var/cache/i3-xfce/builds
+  jobs:
+    description: Number of parallel make jobs, 0 uses every core
+    default: 0
+  sysroot:
+    description: Root of the system the build is installed in, its existing directories are left untouched
+    default: /
+'''
+
+import os
+import sys
+import stat
+import signal
+import hashlib
+import shutil
+import tarfile
+import tempfile
+import multiprocessing
+
+from ansible.module_utils.basic import AnsibleModule
+
+TOOLCHAIN_COMMANDS = [["cc", "--version"], ["c++", "--version"], ["cmake", "--version"], ["make", "--version"]]
+
+def file_hash(path):
+  """
+  Compute the sha256 of a file
+  """
+  res = hashlib.sha256()
+  with open(path, "rb") as stream:
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+      res.update(chunk)
+  return res.hexdigest()
+
+def toolchain_hash(module):
+  """
+  Compute a hash of the versions of the tools used to build
+  """
+  res = hashlib.sha256()
+  for cmd in TOOLCHAIN_COMMANDS:
+    if module.get_bin_path(cmd[0]) is None:
+      continue
+    _, out, _ = module.run_command(cmd)
+    res.update(out)
+  return res.hexdigest()
+
+def build(module, src, jobs, stage_dir, work_dir):
+  """
+  Build the sources and install them in the stage directory
+  """
+  with tarfile.open(src) as archive:
+    archive.extractall(work_dir)
+  entries = os.listdir(work_dir)
+  source_dir = os.path.join(work_dir, entries[0]) if len(entries) == 1 else work_dir
+
+  for cmd in [["cmake", "./"],
+              ["make", "-j{}".format(jobs)],
+              ["make", "install", "DESTDIR={}".format(stage_dir)]]:
+    ret, out, err = module.run_command(cmd, cwd=source_dir)
+    if ret != 0:
+      module.fail_json(msg="Command '{}' failed".format(" ".join(cmd)), stdout=out, stderr=err)
+
+def store(stage_dir, artifact):
+  """
+  Store the stage directory in the cache, the artifact appears atomically
+  """
+  if not os.path.isdir(os.path.dirname(artifact)):
+    os.makedirs(os.path.dirname(artifact))
+  tmp_fd, tmp_artifact = tempfile.mkstemp(dir=os.path.dirname(artifact), suffix=".tmp")
+  os.close(tmp_fd)
+  try:
+    with tarfile.open(tmp_artifact, "w:gz") as archive:
+      # The stage directory itself is not archived, it would replace the attributes of the root when installed
+      for name in sorted(os.listdir(stage_dir)):
+        archive.add(os.path.join(stage_dir, name), arcname=name)
+    os.rename(tmp_artifact, artifact)
+  finally:
+    if os.path.exists(tmp_artifact):
+      os.remove(tmp_artifact)
+
+def is_installed(staged, dest):
+  """
+  Check whether a staged file or link is installed with the same content and mode
+  """
+  staged_stat = os.lstat(staged)
+  try:
+    dest_stat = os.lstat(dest)
+  except OSError:
+    return False
+  if stat.S_IFMT(staged_stat.st_mode) != stat.S_IFMT(dest_stat.st_mode):
+    return False
+  if stat.S_ISLNK(staged_stat.st_mode):
+    return os.readlink(staged) == os.readlink(dest)
+  return stat.S_IMODE(staged_stat.st_mode) == stat.S_IMODE(dest_stat.st_mode) and \
+         staged_stat.st_size == dest_stat.st_size and file_hash(staged) == file_hash(dest)
+
+def get_changed_files(stage_dir, sysroot):
+  """
+  Get the staged files and links that differ from the ones installed in the system root, as relative paths
+  """
+  res = []
+  for root, dirs, files in os.walk(stage_dir):
+    for name in sorted(files) + sorted(name for name in dirs if os.path.islink(os.path.join(root, name))):
+      path = os.path.relpath(os.path.join(root, name), stage_dir)
+      if not is_installed(os.path.join(stage_dir, path), os.path.join(sysroot, path)):
+        res.append(path)
+  return res
+
+def install(module, artifact, sysroot):
+  """
+  Extract a build in the system root, the existing directories keep their attributes
+  """
+  ret, out, err = module.run_command(["tar", "--no-overwrite-dir", "-xzf", artifact, "-C", sysroot])
+  if ret != 0:
+    module.fail_json(msg="Unable to install the build", stdout=out, stderr=err)
+
+def terminate(signum, _):
+  """
+  Exit through the cleanup of the work directory when the run is cancelled
+  """
+  sys.exit(128 + signum)
+
+def main():
+  """
+  Module entry point
+  """
+  signal.signal(signal.SIGTERM, terminate)
+  module = AnsibleModule(
+      argument_spec=dict(
+          name=dict(required=True),
+          src=dict(required=True, type="path"),
+          cache_dir=dict(default="/var/cache/i3-xfce/builds", type="path"),
+          jobs=dict(default=0, type="int"),
+          sysroot=dict(default="/", type="path"),
+      ),
+      supports_check_mode=True
+  )
+  src = module.params["src"]
+  sysroot = module.params["sysroot"]
+  if not os.path.exists(src):
+    if module.check_mode:
+      module.exit_json(changed=True, cache_hit=False)
+    module.fail_json(msg="Source tarball {} does not exist".format(src))
+
+  key = "{}-{}".format(file_hash(src), toolchain_hash(module)[:16])
+  artifact = os.path.join(module.params["cache_dir"], "{}-{}.tar.gz".format(module.params["name"], key))
+  cache_hit = os.path.exists(artifact)
+  if module.check_mode and not cache_hit:
+    module.exit_json(changed=True, cache_hit=cache_hit, artifact=artifact)
+
+  warnings = []
+  work_dir = tempfile.mkdtemp(prefix="i3xfce-build-")
+  try:
+    stage_dir = os.path.join(work_dir, "stage")
+    build_archive = artifact
+    if cache_hit:
+      with tarfile.open(artifact) as archive:
+        archive.extractall(stage_dir)
+    else:
+      jobs = module.params["jobs"] or multiprocessing.cpu_count()
+      sources_dir = os.path.join(work_dir, "sources")
+      os.makedirs(sources_dir)
+      build(module, src, jobs, stage_dir, sources_dir)
+      try:
+        store(stage_dir, artifact)
+      except (IOError, OSError) as exc:
+        # The cache may be a read-only share, the build is still installed
+        warnings.append("Unable to store the build in the cache: {}".format(exc))
+        build_archive = os.path.join(work_dir, "build.tar.gz")
+        store(stage_dir, build_archive)
+    changed_files = get_changed_files(stage_dir, sysroot)
+    if len(changed_files) != 0 and not module.check_mode:
+      install(module, build_archive, sysroot)
+  finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+  module.exit_json(changed=len(changed_files) != 0, cache_hit=cache_hit, artifact=artifact,
+                   changed_files=changed_files, warnings=warnings)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Ansible module setting several keys of an ini file in one pass
+"""
+
+DOCUMENTATION = '''
+---
+module: i3xfce_ini
+short_description: Set or remove several keys of an ini file at once
+description:
+  - The file is read once, every key of every section is set or removed and the file is written back atomically,
+    only when its content changed. Comments, blank lines and the keys that are not given are kept as they are.
+options:
+  dest:
+    description: Path of the ini file
+    required: true
+  create:
+    description: Create the file when it does not exist
+    default: yes
+  sections:
+    description:
+      - Mapping of the section names to the mappings of their keys to their values. A key whose value is null is
+        removed. Missing sections are appended to the file, missing keys to the end of their section.
+    required: true
+'''
+
+import os
+import re
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+
+SECTION_RE = re.compile(r"^\s*\[([^\]]+)\]\s*$")
+KEY_RE = re.compile(r"^\s*([^#;=\s][^=]*?)\s*=")
+
+def format_value(value):
+  """
+  Format a value the way ini files write it
+  """
+  if isinstance(value, bool):
+    return "true" if value else "false"
+  return str(value)
+
+def get_section_ends(lines):
+  """
+  Get the index following the last non blank line of each section, the lines before the first header being the
+  section None
+  """
+  res = {}
+  section = None
+  for index, line in enumerate(lines):
+    match = SECTION_RE.match(line)
+    if match is not None:
+      section = match.group(1).strip()
+      res.setdefault(section, index + 1)
+    elif line.strip():
+      res[section] = index + 1
+  return res
+
+def apply_section(lines, section, keys):
+  """
+  Apply the keys of a section to the lines of a file, returns the new lines
+  """
+  res = []
+  current = None
+  done = set()
+  for line in lines:
+    match = SECTION_RE.match(line)
+    if match is not None:
+      current = match.group(1).strip()
+    elif current == section:
+      match = KEY_RE.match(line)
+      if match is not None and match.group(1) in keys:
+        key = match.group(1)
+        # Only the first occurrence of a key is kept
+        if keys[key] is not None and key not in done:
+          res.append("{}={}\n".format(key, format_value(keys[key])))
+        done.add(key)
+        continue
+    res.append(line)
+
+  missing = ["{}={}\n".format(key, format_value(value)) for key, value in sorted(keys.items())
+             if value is not None and key not in done]
+  if len(missing) == 0:
+    return res
+  ends = get_section_ends(res)
+  if section in ends:
+    # The last line of the section may be the last line of a file without a trailing newline
+    if not res[ends[section] - 1].endswith("\n"):
+      res[ends[section] - 1] += "\n"
+    return res[:ends[section]] + missing + res[ends[section]:]
+  if len(res) != 0 and not res[-1].endswith("\n"):
+    res[-1] += "\n"
+  if len(res) != 0 and res[-1].strip():
+    res.append("\n")
+  return res + ["[{}]\n".format(section)] + missing
+
+def main():
+  """
+  Module entry point
+  """
+  module = AnsibleModule(
+      argument_spec=dict(
+          dest=dict(required=True, type="path"),
+          create=dict(default=True, type="bool"),
+          sections=dict(required=True, type="dict"),
+      ),
+      add_file_common_args=True,
+      supports_check_mode=True
+  )
+  dest = module.params["dest"]
+  current = None
+  if os.path.exists(dest):
+    with open(dest) as dest_file:
+      current = dest_file.read()
+  elif not module.params["create"]:
+    module.fail_json(msg="Ini file {} does not exist".format(dest))
+  elif not os.path.isdir(os.path.dirname(dest)):
+    module.fail_json(msg="Destination directory {} does not exist".format(os.path.dirname(dest)))
+
+  lines = (current or "").splitlines(True)
+  for section, keys in sorted(module.params["sections"].items()):
+    if not isinstance(keys, dict):
+      module.fail_json(msg="Keys of section {} are not a mapping".format(section))
+    lines = apply_section(lines, section, keys)
+
+  content = "".join(lines)
+  # A missing file only gets created when there is something to write in it
+  changed = content != (current or "")
+  if changed and not module.check_mode:
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".i3xfce-")
+    with os.fdopen(tmp_fd, "w") as tmp_file:
+      tmp_file.write(content)
+    module.atomic_move(tmp_path, dest)
+
+  file_args = module.load_file_common_arguments(module.params)
+  file_args["path"] = dest
+  if os.path.exists(dest):
+    changed = module.set_fs_attributes_if_different(file_args, changed)
+  module.exit_json(changed=changed, dest=dest)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Ansible module editing the properties of an xfconf channel file in one pass
+"""
+
+DOCUMENTATION = '''
+---
+module: i3xfce_xfconf
+short_description: Set or remove several properties of an xfconf channel file at once
+description:
+  - The channel file is parsed once, every property change is applied and the file is written back atomically,
+    only when its content changed. The file is written in the layout used by xfconfd.
+options:
+  dest:
+    description: Path of the channel file
+    required: true
+  src:
+    description: Channel file the properties are applied to, instead of the current content of I(dest)
+    required: false
+  force:
+    description: Start from I(src) even when I(dest) exists, otherwise I(src) is only used to create I(dest)
+    default: yes
+  properties:
+    description:
+      - List of properties, each one having a I(path) such as /Net/ThemeName and either a I(type) and a I(value),
+        a I(type) of array and a list of I(values) made of I(type) and I(value), or a I(state) of absent.
+    default: []
+'''
+
+import os
+import tempfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import quoteattr
+
+from ansible.module_utils.basic import AnsibleModule
+
+# Attributes in the order xfconfd writes them
+ATTRIBUTES_ORDER = ["name", "type", "value", "version"]
+
+def find_property(parent, name):
+  """
+  Find the child property of an element
+  """
+  for child in parent.findall("property"):
+    if child.get("name") == name:
+      return child
+  return None
+
+def apply_property(channel, prop):
+  """
+  Apply a property change to a channel, returns an error message or None
+  """
+  names = [name for name in prop.get("path", "").split("/") if name]
+  if len(names) == 0:
+    return "Property {} has no path".format(prop)
+  parent = channel
+  for name in names[:-1]:
+    child = find_property(parent, name)
+    if child is None:
+      if prop.get("state") == "absent":
+        return None
+      child = ElementTree.SubElement(parent, "property", name=name, type="empty")
+    parent = child
+
+  node = find_property(parent, names[-1])
+  if prop.get("state") == "absent":
+    if node is not None:
+      parent.remove(node)
+    return None
+  if "type" not in prop:
+    return "Property {} has no type".format(prop["path"])
+  if node is None:
+    node = ElementTree.SubElement(parent, "property", name=names[-1])
+  node.set("type", str(prop["type"]))
+  if prop["type"] == "array":
+    node.attrib.pop("value", None)
+    for value in node.findall("value"):
+      node.remove(value)
+    for value in prop.get("values", []):
+      ElementTree.SubElement(node, "value", type=str(value["type"]), value=str(value["value"]))
+  else:
+    if "value" not in prop:
+      return "Property {} has no value".format(prop["path"])
+    value = prop["value"]
+    node.set("value", str(value).lower() if isinstance(value, bool) else str(value))
+  return None
+
+def serialize(element, depth=0):
+  """
+  Serialize an element the way xfconfd does
+  """
+  attributes = sorted(element.items(), key=lambda attr: (ATTRIBUTES_ORDER.index(attr[0])
+                                                         if attr[0] in ATTRIBUTES_ORDER else len(ATTRIBUTES_ORDER),
+                                                         attr[0]))
+  res = "{}<{}{}".format("  " * depth, element.tag,
+                         "".join(" {}={}".format(name, quoteattr(value)) for name, value in attributes))
+  children = list(element)
+  if len(children) == 0:
+    # Keep the open and close tags of the elements read in that form
+    if element.text is not None:
+      return res + ">\n{}</{}>\n".format("  " * depth, element.tag)
+    return res + "/>\n"
+  return res + ">\n" + "".join(serialize(child, depth + 1) for child in children) + \
+         "{}</{}>\n".format("  " * depth, element.tag)
+
+def main():
+  """
+  Module entry point
+  """
+  module = AnsibleModule(
+      argument_spec=dict(
+          dest=dict(required=True, type="path"),
+          src=dict(required=False, default=None, type="path"),
+          force=dict(default=True, type="bool"),
+          properties=dict(default=[], type="list"),
+      ),
+      add_file_common_args=True,
+      supports_check_mode=True
+  )
+  dest = module.params["dest"]
+  src = module.params["src"]
+  if src is not None and (module.params["force"] or not os.path.exists(dest)):
+    base = src
+  else:
+    base = dest
+  if not os.path.exists(base):
+    module.fail_json(msg="Channel file {} does not exist".format(base))
+  if not os.path.isdir(os.path.dirname(dest)):
+    module.fail_json(msg="Destination directory {} does not exist".format(os.path.dirname(dest)))
+
+  try:
+    channel = ElementTree.parse(base).getroot()
+  except ElementTree.ParseError as exc:
+    module.fail_json(msg="Unable to parse channel file {}: {}".format(base, exc))
+  if channel.tag != "channel":
+    module.fail_json(msg="{} is not an xfconf channel file".format(base))
+  for prop in module.params["properties"]:
+    if not isinstance(prop, dict):
+      module.fail_json(msg="Property {} is not a mapping".format(prop))
+    error = apply_property(channel, prop)
+    if error is not None:
+      module.fail_json(msg=error)
+
+  content = '<?xml version="1.0" encoding="UTF-8"?>\n\n' + serialize(channel)
+  current = None
+  if os.path.exists(dest):
+    with open(dest) as dest_file:
+      current = dest_file.read()
+  changed = current != content
+  if changed and not module.check_mode:
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".i3xfce-")
+    with os.fdopen(tmp_fd, "w") as tmp_file:
+      tmp_file.write(content)
+    module.atomic_move(tmp_path, dest)
+
+  file_args = module.load_file_common_arguments(module.params)
+  file_args["path"] = dest
+  if os.path.exists(dest):
+    changed = module.set_fs_attributes_if_different(file_args, changed)
+  module.exit_json(changed=changed, dest=dest, properties=len(module.params["properties"]))
+
+if __name__ == "__main__":
+  main()
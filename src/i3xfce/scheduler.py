@@ -0,0 +1,276 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce scheduler module
+
+Reorders the tasks of a loaded play along a dependency graph. Dependencies
+are inferred from the variables registered and used by the tasks, the paths
+they read and write and the packages they install, or declared on a task
+with the i3xfce_after variable listing the names of the tasks it waits for.
+Long tasks are started in the background with Ansible async, the tasks that
+do not depend on them run meanwhile and the play only waits for a job when
+a task needs its result.
+"""
+
+import re
+import sys
+
+try:
+  from ansible.playbook.block import Block
+  from ansible.playbook.task import Task
+except ImportError:
+  sys.exit("ansible package is missing")
+
+import i3xfce.loggers
+from i3xfce.planner import PlannedTask
+from i3xfce.phases import get_task_destinations, USER_HOME
+
+# Task variable telling whether a task starts a background job or waits for it
+SCHEDULER_VAR = "i3xfce_scheduled"
+# Task variable listing the names of the tasks a task has to wait for
+AFTER_VAR = "i3xfce_after"
+
+# Maximum duration of a background task in seconds and delay between two checks of its completion
+_JOB_TIMEOUT = 3600
+_JOB_DELAY = 1
+
+# Modules without action plugin, Ansible can only start those in the background
+_BACKGROUND_MODULES = frozenset(["apt", "pip", "git", "get_url", "i3xfce_build", "shell", "command"])
+# Modules only touching the paths given in their arguments
+_FILE_MODULES = frozenset(["copy", "template", "file", "lineinfile", "patch", "unarchive", "stat", "i3xfce_xfconf",
+                           "i3xfce_ini", "i3xfce_copy", "i3xfce_file", "i3xfce_lineinfile"])
+# Modules changing the installed packages, the other tasks may need them
+_PACKAGE_MODULES = frozenset(["apt", "apt_repository", "package", "pip"])
+# Modules whose effects are unknown
+_COMMAND_MODULES = frozenset(["shell", "command", "script", "raw"])
+# Modules whose only effect is to define variables
+_VARIABLE_MODULES = frozenset(["set_fact", "debug"])
+# Arguments giving the paths read by a task, relative sources are files of the role
+_READ_ARGS = ["src", "reference"]
+_ITEM_RE = re.compile(r"{{\s*item\s*}}")
+
+def _paths_overlap(first, second):
+  """
+  Check whether a path is the same as another one or is in its tree
+  """
+  return first == second or first.startswith(second + "/") or second.startswith(first + "/")
+
+class ScheduledTask(object):
+  """
+  What a task of the play reads, writes and defines
+  """
+
+  def __init__(self, task, index):
+    """
+    Constructor
+    """
+    self.task = task
+    self.index = index
+    self.name = task.name or task.action
+    self.module = task.action
+    args = task.args or {}
+    items = task.loop_args if isinstance(task.loop_args, list) else None
+    planned = PlannedTask(role=None, index=index, name=self.name, module=self.module, args=args, items=items,
+                          loop_size=None)
+    self.writes = [] if self.module in ["stat", "async_status"] else get_task_destinations(planned, True)
+    if self.module == "i3xfce_build" and "cache_dir" in args:
+      self.writes.append(str(args["cache_dir"]))
+    self.reads = [str(args[arg]) for arg in _READ_ARGS if str(args.get(arg, "")).startswith(("/", "{{"))]
+    if self.module == "stat" and "path" in args:
+      self.reads.append(str(args["path"]))
+    # Text where the variables used by the task appear
+    self.text = " ".join(str(value) for value in [args, task.loop_args, task.when, task.changed_when,
+                                                  task.failed_when, task.until])
+    self.names = set([task.register] if task.register else [])
+    if self.module == "set_fact":
+      self.names.update(args.keys())
+    self.after = (task.vars or {}).get(AFTER_VAR) or []
+    # The paths of a loop given by a variable cannot be known
+    self.unknown = (task.delegate_to is not None or (items is None and task.loop_args is not None and
+                                                     any(_ITEM_RE.search(path) for path in self.writes + self.reads)))
+
+  def is_file_task(self):
+    """
+    Check whether the task only touches the paths given in its arguments
+    """
+    return self.module in _FILE_MODULES
+
+  def is_user_task(self):
+    """
+    Check whether the task only touches files of the user home
+    """
+    return self.is_file_task() and all(path.startswith(USER_HOME + "/") for path in self.writes + self.reads)
+
+  def uses(self, names):
+    """
+    Check whether the task uses one of the given variables
+    """
+    return any(re.search(r"\b{}\b".format(re.escape(name)), self.text) is not None for name in names)
+
+  def can_run_in_background(self):
+    """
+    Check whether the task can be started in the background and its result collected later
+    """
+    task = self.task
+    return (self.module in _BACKGROUND_MODULES and not task.loop_args and not task.loop and not task.changed_when
+            and not task.failed_when and not task.until and not getattr(task, "async") and not self.unknown)
+
+def depends_on(earlier, later):
+  """
+  Check whether a task of the play has to run after an earlier one
+  """
+  if earlier.unknown or later.unknown:
+    return True
+  if later.uses(earlier.names) or earlier.uses(later.names) or earlier.name in later.after:
+    return True
+  if any(_paths_overlap(written, path) for written in earlier.writes for path in later.writes + later.reads) or \
+     any(_paths_overlap(written, path) for written in later.writes for path in earlier.reads):
+    return True
+  if earlier.is_file_task() and later.is_file_task():
+    return False
+  if earlier.is_file_task() or later.is_file_task():
+    file_task, other = (earlier, later) if earlier.is_file_task() else (later, earlier)
+    # Packages may own the system files, commands may touch any file they name
+    if other.module in _PACKAGE_MODULES or other.module in _COMMAND_MODULES:
+      return not file_task.is_user_task() or any(path in other.text for path in file_task.writes + file_task.reads)
+    return False
+  if earlier.module in _VARIABLE_MODULES or later.module in _VARIABLE_MODULES:
+    return False
+  return any(task.module in _PACKAGE_MODULES or task.module in _COMMAND_MODULES for task in [earlier, later])
+
+class Scheduler(object):
+  """
+  Class rewriting a loaded play so that independent tasks run concurrently
+  """
+
+  def __init__(self, jobs):
+    """
+    Constructor
+    """
+    self._jobs = jobs
+
+  @staticmethod
+  def _get_tasks(play):
+    """
+    Get the tasks of a play in execution order, None when it uses blocks the scheduler cannot reorder
+    """
+    blocks = list(play.pre_tasks)
+    for role in play.get_roles():
+      blocks.extend(role._task_blocks) # pylint: disable=protected-access
+    blocks.extend(play.tasks)
+    blocks.extend(play.post_tasks)
+    res = []
+    for block in blocks:
+      if len(block.rescue) != 0 or len(block.always) != 0 or any(isinstance(task, Block) for task in block.block):
+        return None
+      res.extend(block.block)
+    return res
+
+  def _get_order(self, tasks):
+    """
+    Get the steps executing the tasks, each step being a task to run, to start in the background or to wait for
+    """
+    # Waiting for a job started by the play makes the paths written by the job available
+    for later in tasks:
+      if later.module == "async_status":
+        later.writes.extend(path for earlier in tasks[:later.index] if later.uses(earlier.names)
+                            for path in earlier.writes)
+    deps = [set(earlier.index for earlier in tasks[:later.index] if depends_on(earlier, later)) for later in tasks]
+    pending = list(tasks)
+    running = []
+    done = set()
+    res = []
+    while len(pending) != 0:
+      ready = [task for task in pending if deps[task.index].issubset(done)]
+      if len(ready) == 0:
+        # Wait for the oldest job the first pending task needs
+        blocking = [task for task in running if task.index in deps[pending[0].index]] or running
+        running.remove(blocking[0])
+        done.add(blocking[0].index)
+        res.append(("wait", blocking[0]))
+        continue
+      task = ready[0]
+      pending.remove(task)
+      # The task executed by the play is one of the jobs, a single one runs the tasks in their order
+      if task.can_run_in_background() and self._jobs > 1:
+        if len(running) >= self._jobs - 1:
+          done.add(running[0].index)
+          res.append(("wait", running.pop(0)))
+        running.append(task)
+        res.append(("start", task))
+      else:
+        done.add(task.index)
+        res.append(("run", task))
+    res.extend(("wait", task) for task in running)
+    return res
+
+  @staticmethod
+  def _get_wait_task(task, job_var, block, variable_manager, loader):
+    """
+    Get the task waiting for the background job of a task and registering its result
+    """
+    result_var = task.task.register or job_var + "_result"
+    data = {"name": task.name,
+            "async_status": {"jid": "{{{{{}.ansible_job_id}}}}".format(job_var)},
+            "register": result_var,
+            "until": "{}.finished".format(result_var),
+            "retries": _JOB_TIMEOUT // _JOB_DELAY,
+            "delay": _JOB_DELAY,
+            # A skipped task did not start a job
+            "when": "{}.ansible_job_id is defined".format(job_var),
+            # The wait stands for the task, it keeps its variables
+            "vars": dict(task.task.vars or {}, **{SCHEDULER_VAR: "wait"})}
+    if task.task.ignore_errors is not None:
+      data["ignore_errors"] = task.task.ignore_errors
+    if task.task.run_once is not None:
+      data["run_once"] = task.task.run_once
+    return Task.load(data, block=block, role=task.task._role, variable_manager=variable_manager, # pylint: disable=protected-access
+                     loader=loader)
+
+  def schedule(self, play, variable_manager, loader):
+    """
+    Reorder the tasks of a loaded play, returns False when the play is kept as it is
+    """
+    tasks = Scheduler._get_tasks(play)
+    if tasks is None:
+      i3xfce.loggers.ROOTLOGGER.debug("The play uses blocks, its tasks are executed in order")
+      return False
+    tasks = [ScheduledTask(task, index) for index, task in enumerate(tasks)]
+    block = Block(play=play)
+    for step, task in self._get_order(tasks):
+      job_var = "i3xfce_job_{}".format(task.index)
+      if step == "wait":
+        block.block.append(Scheduler._get_wait_task(task, job_var, block, variable_manager, loader))
+        continue
+      if step == "start":
+        setattr(task.task, "async", _JOB_TIMEOUT)
+        task.task.poll = 0
+        task.task.register = job_var
+        task.task.vars = dict(task.task.vars or {}, **{SCHEDULER_VAR: "start"})
+        i3xfce.loggers.ROOTLOGGER.debug("Task '%s' is started in the background", task.name)
+      task.task._parent = block # pylint: disable=protected-access
+      block.block.append(task.task)
+
+    for role in play.get_roles():
+      role._task_blocks = [] # pylint: disable=protected-access
+    play.pre_tasks = []
+    play.tasks = [block]
+    play.post_tasks = []
+    return True
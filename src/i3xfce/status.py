@@ -0,0 +1,122 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce status module
+
+Compares the system with the manifest of the last installation without
+running Ansible: packages, PPA source files and managed files are checked
+in-process, in parallel.
+"""
+
+import re
+import glob
+from multiprocessing.pool import ThreadPool
+
+import i3xfce.loggers
+from i3xfce.manifest import get_target_state, get_installed_packages
+
+_PPA_RE = re.compile(r"^ppa:([^/]+)/(.+)$")
+
+def get_apt_sources():
+  """
+  Get the active lines of the apt source files, PPAs are always managed on the host
+  """
+  res = []
+  for path in ["/etc/apt/sources.list"] + sorted(glob.glob("/etc/apt/sources.list.d/*.list")):
+    try:
+      with open(path) as sources_file:
+        res.extend([line.strip() for line in sources_file if line.strip() and not line.strip().startswith("#")])
+    except IOError as exc:
+      i3xfce.loggers.ROOTLOGGER.debug("Unable to read apt sources %s: %s", path, exc)
+  return res
+
+def is_repository_enabled(repository, sources):
+  """
+  Check whether a repository of an apt_repository task appears in the active apt sources
+  """
+  match = _PPA_RE.match(repository)
+  if match is None:
+    return " ".join(repository.split()) in [" ".join(line.split()) for line in sources]
+  ppa_path = "/{}/{}/ubuntu".format(match.group(1), match.group(2))
+  return any("launchpad" in line and ppa_path in line for line in sources)
+
+class StatusChecker(object):
+  """
+  Class checking the drift of the installed parts from the manifest
+  """
+
+  def __init__(self, manifest, jobs=8):
+    """
+    Constructor
+    """
+    self._manifest = manifest
+    self._jobs = jobs
+
+  def check(self, parts):
+    """
+    Check the given parts, returns a dictionary giving the list of drifts of each part
+    """
+    records = self._manifest.get_parts()
+    installed_parts = [part for part in parts if part in records]
+    pool = ThreadPool(self._jobs)
+    try:
+      # The package and sources queries run while the managed files are hashed
+      names = sorted(set(pkg for part in installed_parts for pkg in records[part].get("packages", [])))
+      packages = pool.apply_async(get_installed_packages, (names,))
+      sources = pool.apply_async(get_apt_sources)
+      paths = sorted(set(path for part in installed_parts for path in records[part].get("targets", {})))
+      states = dict(zip(paths, pool.map(get_target_state, paths)))
+      packages = packages.get()
+      sources = sources.get()
+    finally:
+      pool.close()
+      pool.join()
+
+    res = {}
+    for part in parts:
+      record = records.get(part)
+      if record is None:
+        res[part] = ["not installed"]
+        continue
+      drifts = []
+      drifts.extend(["package {} is not installed".format(pkg) for pkg in record.get("packages", [])
+                     if pkg not in packages])
+      drifts.extend(["repository {} is not enabled".format(repo) for repo in record.get("repositories", [])
+                     if not is_repository_enabled(repo, sources)])
+      for path, state in sorted(record.get("targets", {}).items()):
+        if states[path] is None:
+          drifts.append("{} is missing".format(path))
+        elif states[path] != state:
+          drifts.append("{} was modified".format(path))
+      res[part] = drifts
+    return res
+
+  @staticmethod
+  def log_report(report):
+    """
+    Log the drifts of each part
+    """
+    for part in sorted(report):
+      if len(report[part]) == 0:
+        i3xfce.loggers.ROOTLOGGER.info("%s: up to date", part)
+        continue
+      i3xfce.loggers.ROOTLOGGER.warn("%s: %i drift(s)", part, len(report[part]))
+      for drift in report[part]:
+        i3xfce.loggers.ROOTLOGGER.warn("  %s", drift)
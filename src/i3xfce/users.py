@@ -0,0 +1,120 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+i3-xfce users module
+
+Configures several local users in one run. Each user is a host of the
+inventory reached with the local connection, so the tasks configuring a user
+run in parallel for all of them, while the tasks that do not depend on the
+user are executed once.
+"""
+
+import os
+import re
+import pwd
+import grp
+import sys
+
+try:
+  from ansible.playbook.block import Block
+except ImportError:
+  sys.exit("ansible package is missing")
+
+# Variables a task uses when it configures a user
+_USER_VARS_RE = re.compile(r"\b(remote_user|user_home)\b")
+
+class UsersException(Exception):
+  """
+  Exception raised when the users to configure cannot be found
+  """
+
+  def __init__(self, msg):
+    """
+    Constructor
+    """
+    Exception.__init__(self)
+    self._msg = msg
+
+  def __str__(self):
+    """
+    Convert exception to string
+    """
+    return self._msg
+
+def get_users(names, group):
+  """
+  Get the users given by name and the members of a group, sorted and without duplicates
+  """
+  res = set()
+  for name in names or []:
+    try:
+      pwd.getpwnam(name)
+    except KeyError:
+      raise UsersException("User {} does not exist".format(name))
+    res.add(name)
+  if group is not None:
+    try:
+      group_entry = grp.getgrnam(group)
+    except KeyError:
+      raise UsersException("Group {} does not exist".format(group))
+    res.update(group_entry.gr_mem)
+    # Users whose primary group is the group are not listed as its members
+    res.update([user.pw_name for user in pwd.getpwall() if user.pw_gid == group_entry.gr_gid])
+  if len(res) == 0:
+    raise UsersException("No user to configure")
+  return sorted(res)
+
+def add_user_hosts(inventory, users):
+  """
+  Add a host reached with the local connection to the inventory for each user
+  """
+  from ansible.inventory.host import Host
+
+  group = inventory.get_group("all")
+  for user in users:
+    host = Host(user)
+    host.set_variable("ansible_connection", "local")
+    host.set_variable("ansible_python_interpreter", sys.executable)
+    host.set_variable("remote_user", user)
+    host.set_variable("user_home", pwd.getpwnam(user).pw_dir or os.path.join("/home", user))
+    group.add_host(host)
+  inventory.clear_pattern_cache()
+
+def is_user_task(task):
+  """
+  Check whether a loaded task configures the user, by looking for the user variables in its arguments, loop and
+  conditions
+  """
+  return any(_USER_VARS_RE.search(str(value)) is not None for value in [task.args, task.loop_args, task.when])
+
+def run_system_tasks_once(play):
+  """
+  Make the tasks of a loaded play that do not configure the user run once for all the hosts
+  """
+  blocks = list(play.pre_tasks) + list(play.tasks) + list(play.post_tasks)
+  for role in play.get_roles():
+    blocks.extend(role._task_blocks) # pylint: disable=protected-access
+  while len(blocks) != 0:
+    block = blocks.pop()
+    for task in block.block + block.rescue + block.always:
+      if isinstance(task, Block):
+        blocks.append(task)
+      elif not is_user_task(task):
+        task.run_once = True
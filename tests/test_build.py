@@ -0,0 +1,127 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the i3xfce_build module
+"""
+
+import os
+import imp
+import stat
+import shutil
+import tarfile
+import tempfile
+import unittest
+import subprocess
+
+LIBRARYDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "i3xfce", "resources", "library")
+i3xfce_build = imp.load_source("i3xfce_build", os.path.join(LIBRARYDIR, "i3xfce_build.py")) # pylint: disable=invalid-name
+
+class BuildTest(unittest.TestCase):
+  """
+  Tests of the storage and comparison of the builds
+  """
+
+  def setUp(self):
+    """
+    Create a stage directory as make install does and an empty system root
+    """
+    self.tmp_dir = tempfile.mkdtemp()
+    self.stage_dir = os.path.join(self.tmp_dir, "stage")
+    self.sysroot = os.path.join(self.tmp_dir, "root")
+    os.makedirs(os.path.join(self.stage_dir, "usr", "local", "bin"))
+    os.chmod(self.stage_dir, 0o700)
+    with open(os.path.join(self.stage_dir, "usr", "local", "bin", "j4-dmenu-desktop"), "w") as binary:
+      binary.write("binary")
+    os.chmod(os.path.join(self.stage_dir, "usr", "local", "bin", "j4-dmenu-desktop"), 0o755)
+    os.makedirs(self.sysroot)
+    os.chmod(self.sysroot, 0o755)
+
+  def tearDown(self):
+    """
+    Remove the temporary files
+    """
+    shutil.rmtree(self.tmp_dir)
+
+  def test_store(self):
+    """
+    The artifact contains the content of the stage directory but not the directory itself
+    """
+    artifact = os.path.join(self.tmp_dir, "cache", "j4.tar.gz")
+    i3xfce_build.store(self.stage_dir, artifact)
+    with tarfile.open(artifact) as archive:
+      names = archive.getnames()
+    self.assertIn("usr/local/bin/j4-dmenu-desktop", names)
+    self.assertEqual([name for name in names if os.path.normpath(name) == "."], [])
+    self.assertEqual(os.listdir(os.path.dirname(artifact)), ["j4.tar.gz"])
+
+  def test_changed_files(self):
+    """
+    Only the files missing or differing from the system root are changed
+    """
+    self.assertEqual(i3xfce_build.get_changed_files(self.stage_dir, self.sysroot), ["usr/local/bin/j4-dmenu-desktop"])
+    shutil.copytree(os.path.join(self.stage_dir, "usr"), os.path.join(self.sysroot, "usr"))
+    self.assertEqual(i3xfce_build.get_changed_files(self.stage_dir, self.sysroot), [])
+    os.chmod(os.path.join(self.sysroot, "usr", "local", "bin", "j4-dmenu-desktop"), 0o700)
+    self.assertEqual(i3xfce_build.get_changed_files(self.stage_dir, self.sysroot), ["usr/local/bin/j4-dmenu-desktop"])
+    os.chmod(os.path.join(self.sysroot, "usr", "local", "bin", "j4-dmenu-desktop"), 0o755)
+    with open(os.path.join(self.sysroot, "usr", "local", "bin", "j4-dmenu-desktop"), "w") as binary:
+      binary.write("binarY")
+    self.assertEqual(i3xfce_build.get_changed_files(self.stage_dir, self.sysroot), ["usr/local/bin/j4-dmenu-desktop"])
+
+  def test_links(self):
+    """
+    Links are compared by target
+    """
+    os.symlink("j4-dmenu-desktop", os.path.join(self.stage_dir, "usr", "local", "bin", "j4"))
+    shutil.copytree(os.path.join(self.stage_dir, "usr"), os.path.join(self.sysroot, "usr"), symlinks=True)
+    self.assertEqual(i3xfce_build.get_changed_files(self.stage_dir, self.sysroot), [])
+    os.remove(os.path.join(self.sysroot, "usr", "local", "bin", "j4"))
+    os.symlink("other", os.path.join(self.sysroot, "usr", "local", "bin", "j4"))
+    self.assertEqual(i3xfce_build.get_changed_files(self.stage_dir, self.sysroot), ["usr/local/bin/j4"])
+
+  def test_install_keeps_directories(self):
+    """
+    Installing a build does not change the attributes of the existing directories
+    """
+    os.makedirs(os.path.join(self.sysroot, "usr"))
+    os.chmod(os.path.join(self.sysroot, "usr"), 0o751)
+    artifact = os.path.join(self.tmp_dir, "j4.tar.gz")
+    i3xfce_build.store(self.stage_dir, artifact)
+    os.chmod(os.path.join(self.stage_dir, "usr"), 0o700)
+
+    class Module(object):
+      """
+      Module running the commands
+      """
+      def run_command(self, cmd): # pylint: disable=no-self-use
+        """
+        Run a command
+        """
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = proc.communicate()
+        return proc.returncode, out, err
+
+    i3xfce_build.install(Module(), artifact, self.sysroot)
+    self.assertEqual(stat.S_IMODE(os.stat(self.sysroot).st_mode), 0o755)
+    self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.sysroot, "usr")).st_mode), 0o751)
+    self.assertEqual(i3xfce_build.get_changed_files(self.stage_dir, self.sysroot), [])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the bundle module
+"""
+
+import os
+import sys
+import json
+import stat
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import i3xfce.phases # pylint: disable=wrong-import-position
+from i3xfce.bundle import BundleException, import_bundle, BUNDLE_FILE, BUNDLE_VERSION # pylint: disable=wrong-import-position
+
+class ImportBundleTest(unittest.TestCase):
+  """
+  Tests of the import_bundle function
+  """
+
+  def setUp(self):
+    """
+    Create the content of a bundle in a private directory, like the exporter does
+    """
+    self.tmp_dir = tempfile.mkdtemp()
+    self.work_dir = tempfile.mkdtemp(dir=self.tmp_dir)
+    os.makedirs(os.path.join(self.work_dir, "git", "oh-my-zsh.git"))
+    with open(os.path.join(self.work_dir, BUNDLE_FILE), "w") as bundle_file:
+      json.dump(dict(version=BUNDLE_VERSION, parts=["utilities"],
+                     overrides=dict(ohmyzsh_repo=dict(module="git", path="git/oh-my-zsh.git"))), bundle_file)
+    self.cache_dir = os.path.join(self.tmp_dir, "cache")
+    os.makedirs(self.cache_dir)
+    os.chmod(self.cache_dir, 0o755)
+    self.bundle = os.path.join(self.tmp_dir, "bundle.tar.gz")
+
+  def tearDown(self):
+    """
+    Remove the temporary files
+    """
+    shutil.rmtree(self.tmp_dir)
+
+  def write_bundle(self, names):
+    """
+    Archive files of the bundle content with the given names
+    """
+    with tarfile.open(self.bundle, "w:gz") as archive:
+      for name, arcname in names:
+        archive.add(os.path.join(self.work_dir, name), arcname=arcname)
+
+  def test_import(self):
+    """
+    The overrides point to the extracted sources
+    """
+    self.write_bundle([(BUNDLE_FILE, BUNDLE_FILE), ("git", "git")])
+    overrides = import_bundle(self.bundle, self.cache_dir, ["utilities"])
+    self.assertEqual(overrides, {i3xfce.phases.OFFLINE_VAR: True,
+                                 "ohmyzsh_repo": os.path.join(self.cache_dir, "git", "oh-my-zsh.git")})
+    self.assertTrue(os.path.isdir(overrides["ohmyzsh_repo"]))
+
+  def test_root_entry(self):
+    """
+    The root entry of a bundle does not change the mode of the cache directory
+    """
+    self.write_bundle([(".", ".")])
+    import_bundle(self.bundle, self.cache_dir, ["utilities"])
+    self.assertEqual(stat.S_IMODE(os.stat(self.cache_dir).st_mode), 0o755)
+
+  def test_unsafe_paths(self):
+    """
+    Bundles writing outside of the cache directory are rejected
+    """
+    self.write_bundle([(BUNDLE_FILE, "../" + BUNDLE_FILE)])
+    self.assertRaises(BundleException, import_bundle, self.bundle, self.cache_dir, ["utilities"])
+
+  def test_missing_parts(self):
+    """
+    Bundles not containing every selected part are rejected
+    """
+    self.write_bundle([(BUNDLE_FILE, BUNDLE_FILE)])
+    self.assertRaises(BundleException, import_bundle, self.bundle, self.cache_dir, ["utilities", "themes"])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the fastpath module, the tasks executed in-process must leave the files as the stock modules do
+"""
+
+import os
+import sys
+import pwd
+import grp
+import json
+import stat
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import ansible # pylint: disable=wrong-import-position
+from i3xfce.fastpath import run_copy, run_file, run_lineinfile # pylint: disable=wrong-import-position
+
+# Directory of the stock file modules of the installed Ansible
+FILES_MODULES_DIR = os.path.join(os.path.dirname(getattr(ansible, "__file__", "")), "modules", "core", "files")
+
+def run_module(module, args):
+  """
+  Execute a stock module with its arguments and return its result
+  """
+  tmp_fd, args_path = tempfile.mkstemp(suffix=".json")
+  try:
+    with os.fdopen(tmp_fd, "w") as args_file:
+      json.dump(dict(ANSIBLE_MODULE_ARGS=args), args_file)
+    proc = subprocess.Popen([sys.executable, os.path.join(FILES_MODULES_DIR, module + ".py"), args_path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+  finally:
+    os.remove(args_path)
+  if proc.returncode != 0:
+    raise AssertionError("Module {} failed: {}{}".format(module, out, err))
+  return json.loads(out)
+
+def get_tree(path):
+  """
+  Get the relative paths of a tree with their type, mode and content
+  """
+  res = {}
+  for root, dirs, files in os.walk(path):
+    for name in dirs + files:
+      file_path = os.path.join(root, name)
+      file_stat = os.lstat(file_path)
+      content = None
+      if stat.S_ISREG(file_stat.st_mode):
+        with open(file_path, "rb") as stream:
+          content = stream.read()
+      res[os.path.relpath(file_path, path)] = (stat.S_IFMT(file_stat.st_mode), stat.S_IMODE(file_stat.st_mode),
+                                               file_stat.st_uid, file_stat.st_gid, content)
+  return res
+
+class FastpathTest(unittest.TestCase):
+  """
+  Tests of the tasks executed in-process
+  """
+
+  def setUp(self):
+    """
+    Create a source file and the directories the tasks are executed in
+    """
+    self.tmp_dir = tempfile.mkdtemp()
+    self.src = os.path.join(self.tmp_dir, "config")
+    with open(self.src, "w") as src_file:
+      src_file.write("set $mod Mod4\n")
+    self.in_process_dir = os.path.join(self.tmp_dir, "in-process")
+    self.module_dir = os.path.join(self.tmp_dir, "module")
+    os.mkdir(self.in_process_dir)
+    os.mkdir(self.module_dir)
+    self.owner = pwd.getpwuid(os.getuid()).pw_name
+    self.group = grp.getgrgid(os.getgid()).gr_name
+
+  def tearDown(self):
+    """
+    Remove the temporary files
+    """
+    shutil.rmtree(self.tmp_dir)
+
+  def run_both(self, module, args, dest_arg):
+    """
+    Execute a task in-process and with the stock module in two identical directories, returns their results
+    """
+    in_process_args = dict(args)
+    in_process_args[dest_arg] = os.path.join(self.in_process_dir, args[dest_arg])
+    if module == "copy":
+      res = run_copy(self.src, in_process_args, False)
+    elif module == "file":
+      res = run_file(in_process_args, False)
+    else:
+      res = run_lineinfile(in_process_args, False)
+    if not os.path.isdir(FILES_MODULES_DIR):
+      return res, None
+    module_args = dict(args)
+    module_args[dest_arg] = os.path.join(self.module_dir, args[dest_arg])
+    if module == "copy":
+      # The stock module moves its source to the destination, so it is given a copy as Ansible transfers one
+      tmp_fd, src = tempfile.mkstemp(dir=self.tmp_dir)
+      os.close(tmp_fd)
+      shutil.copy(self.src, src)
+      module_args.update(src=src, original_basename=os.path.basename(self.src))
+    return res, run_module(module, module_args)
+
+  def assert_same(self, res, module_res):
+    """
+    Check that the in-process execution left the files and reported the change as the stock module did
+    """
+    if module_res is None:
+      return
+    self.assertEqual(res["changed"], module_res["changed"])
+    self.assertEqual(get_tree(self.in_process_dir), get_tree(self.module_dir))
+
+  def test_copy_creates_dirs(self):
+    """
+    Directories created by a copy get the owner of the task but not the mode of the file
+    """
+    args = dict(dest="a/b/", owner=self.owner, group=self.group, mode="u=rw")
+    res, module_res = self.run_both("copy", args, "dest")
+    self.assertTrue(res["changed"])
+    for directory in ["a", "a/b"]:
+      mode = stat.S_IMODE(os.stat(os.path.join(self.in_process_dir, directory)).st_mode)
+      self.assertEqual(mode & stat.S_IRWXU, stat.S_IRWXU)
+    mode = stat.S_IMODE(os.stat(os.path.join(self.in_process_dir, "a", "b", "config")).st_mode)
+    self.assertEqual(mode & stat.S_IRWXU, stat.S_IRUSR | stat.S_IWUSR)
+    self.assert_same(res, module_res)
+
+    res, module_res = self.run_both("copy", args, "dest")
+    self.assertFalse(res["changed"])
+    self.assert_same(res, module_res)
+
+  def test_copy_replaces_file(self):
+    """
+    A copy replaces a file whose content differs and keeps its mode when none is given
+    """
+    for directory in [self.in_process_dir, self.module_dir]:
+      with open(os.path.join(directory, "config"), "w") as dest_file:
+        dest_file.write("old\n")
+      os.chmod(os.path.join(directory, "config"), 0o640)
+    res, module_res = self.run_both("copy", dict(dest="config"), "dest")
+    self.assertTrue(res["changed"])
+    self.assert_same(res, module_res)
+
+  def test_file_directory(self):
+    """
+    Directories created by a file task all get the attributes of the task
+    """
+    args = dict(path="a/b", state="directory", owner=self.owner, group=self.group, mode="u=rwx,g=rx,o=")
+    res, module_res = self.run_both("file", args, "path")
+    self.assertTrue(res["changed"])
+    self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.in_process_dir, "a")).st_mode), 0o750)
+    self.assert_same(res, module_res)
+
+    res, module_res = self.run_both("file", dict(path="a", state="absent"), "path")
+    self.assertTrue(res["changed"])
+    self.assert_same(res, module_res)
+
+  def test_lineinfile(self):
+    """
+    Lines are added to a file without a trailing newline and removed
+    """
+    for directory in [self.in_process_dir, self.module_dir]:
+      with open(os.path.join(directory, "app.desktop"), "w") as dest_file:
+        dest_file.write("[Desktop Entry]\nName=App")
+    res, module_res = self.run_both("lineinfile", dict(dest="app.desktop", line="Hidden=true"), "dest")
+    self.assertTrue(res["changed"])
+    with open(os.path.join(self.in_process_dir, "app.desktop")) as dest_file:
+      self.assertEqual(dest_file.read(), "[Desktop Entry]\nName=App\nHidden=true\n")
+    self.assert_same(res, module_res)
+
+    res, module_res = self.run_both("lineinfile", dict(dest="app.desktop", line="Hidden=true", state="absent"),
+                                    "dest")
+    self.assertTrue(res["changed"])
+    self.assert_same(res, module_res)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the i3xfce_ini module
+"""
+
+import os
+import imp
+import unittest
+
+LIBRARYDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "i3xfce", "resources", "library")
+i3xfce_ini = imp.load_source("i3xfce_ini", os.path.join(LIBRARYDIR, "i3xfce_ini.py")) # pylint: disable=invalid-name
+
+GREETER = """# LightDM GTK+ Configuration
+[greeter]
+theme-name=Greybird
+#icon-theme-name=
+background=/usr/share/backgrounds/xfce.png
+
+[other]
+key=value
+"""
+
+class ApplySectionTest(unittest.TestCase):
+  """
+  Tests of the apply_section function
+  """
+
+  @staticmethod
+  def apply(content, section, keys):
+    """
+    Apply the keys of a section to the content of a file
+    """
+    return "".join(i3xfce_ini.apply_section(content.splitlines(True), section, keys))
+
+  def test_replace_keys(self):
+    """
+    Existing keys are replaced in place, comments and the other sections are kept
+    """
+    res = self.apply(GREETER, "greeter", {"theme-name": "Numix", "background": "/usr/share/backgrounds/numix.png"})
+    self.assertEqual(res, GREETER.replace("Greybird", "Numix").replace("xfce.png", "numix.png"))
+
+  def test_add_keys(self):
+    """
+    Missing keys are added at the end of their section, before the blank lines
+    """
+    res = self.apply(GREETER, "greeter", {"icon-theme-name": "Numix-Circle", "theme-name": "Greybird"})
+    self.assertEqual(res, GREETER.replace("xfce.png\n", "xfce.png\nicon-theme-name=Numix-Circle\n"))
+
+  def test_remove_keys(self):
+    """
+    Keys whose value is null are removed, with their duplicates
+    """
+    res = self.apply(GREETER + "[greeter]\ntheme-name=Other\n", "greeter", {"theme-name": None})
+    self.assertEqual(res, GREETER.replace("theme-name=Greybird\n", "") + "[greeter]\n")
+
+  def test_duplicate_keys(self):
+    """
+    Only the first occurrence of a key is kept
+    """
+    res = self.apply("[greeter]\nfont=A\nfont=B\n", "greeter", {"font": "C"})
+    self.assertEqual(res, "[greeter]\nfont=C\n")
+
+  def test_add_section(self):
+    """
+    Missing sections are appended after a blank line
+    """
+    self.assertEqual(self.apply("[other]\nkey=value", "greeter", {"theme-name": "Numix"}),
+                     "[other]\nkey=value\n\n[greeter]\ntheme-name=Numix\n")
+    self.assertEqual(self.apply("", "greeter", {"theme-name": "Numix"}), "[greeter]\ntheme-name=Numix\n")
+    self.assertEqual(self.apply("", "greeter", {"theme-name": None}), "")
+
+  def test_no_trailing_newline(self):
+    """
+    A key added to the last section of a file without a trailing newline goes on its own line
+    """
+    self.assertEqual(self.apply("[greeter]\ntheme-name=A", "greeter", {"icon-theme-name": "B"}),
+                     "[greeter]\ntheme-name=A\nicon-theme-name=B\n")
+    self.assertEqual(self.apply("[greeter]", "greeter", {"theme-name": "A"}), "[greeter]\ntheme-name=A\n")
+
+  def test_values(self):
+    """
+    Booleans are written the way ini files write them
+    """
+    self.assertEqual(self.apply("[greeter]\n", "greeter", {"show-clock": True, "xft-dpi": 96}),
+                     "[greeter]\nshow-clock=true\nxft-dpi=96\n")
+
+  def test_unchanged(self):
+    """
+    Applying keys that are already set does not change the content
+    """
+    self.assertEqual(self.apply(GREETER, "greeter", {"theme-name": "Greybird"}), GREETER)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the journal module
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from i3xfce.journal import Journal, JOURNAL_VAR, apply_journal, get_task_id, parse_task_id # pylint: disable=wrong-import-position
+
+VARIABLES = dict(remote_user="user", user_home="/home/user", sysroot="")
+INPUTS = dict(version="1", role="a", library="b")
+
+class FakeTask(object): # pylint: disable=too-few-public-methods
+  """
+  Task of a loaded play
+  """
+
+  def __init__(self, register=None):
+    """
+    Constructor
+    """
+    self.register = register
+    self.vars = {}
+
+class FakeBlock(object): # pylint: disable=too-few-public-methods
+  """
+  Block of the tasks of a role
+  """
+
+  def __init__(self, tasks):
+    """
+    Constructor
+    """
+    self.block = tasks
+
+class FakeRole(object):
+  """
+  Role of a loaded play
+  """
+
+  def __init__(self, name, blocks):
+    """
+    Constructor
+    """
+    self._name = name
+    self._task_blocks = blocks
+
+  def get_name(self):
+    """
+    Name getter
+    """
+    return self._name
+
+class FakePlay(object): # pylint: disable=too-few-public-methods
+  """
+  Loaded play
+  """
+
+  def __init__(self, roles):
+    """
+    Constructor
+    """
+    self._roles = roles
+
+  def get_roles(self):
+    """
+    Roles getter
+    """
+    return self._roles
+
+class JournalTest(unittest.TestCase):
+  """
+  Tests of the Journal class
+  """
+
+  def setUp(self):
+    """
+    Create the tasks files of two parts
+    """
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, "state", "journal.json")
+    self.roles = {}
+    for role in ["base", "themes"]:
+      tasks_file = os.path.join(self.tmp_dir, role + ".yml")
+      with open(tasks_file, "w") as stream:
+        stream.write("- name: {}\n".format(role))
+      self.roles[role] = (tasks_file, INPUTS)
+
+  def tearDown(self):
+    """
+    Remove the temporary files
+    """
+    shutil.rmtree(self.tmp_dir)
+
+  def fail_run(self):
+    """
+    Record a run that completed the first two tasks of base and the first one of themes
+    """
+    journal = Journal(self.path, "install", VARIABLES)
+    journal.start(self.roles, False)
+    journal.task_completed("base", 0)
+    journal.task_completed("base", 1)
+    journal.task_completed("base", 1)
+    journal.task_completed("themes", 0)
+    journal.task_completed("unknown", 0)
+
+  def test_resume(self):
+    """
+    A resumed run skips the tasks completed by the failed run
+    """
+    self.fail_run()
+    journal = Journal(self.path, "install", VARIABLES)
+    journal.start(self.roles, True)
+    self.assertEqual(journal.get_done_tasks("base"), set([0, 1]))
+    self.assertEqual(journal.get_done_tasks("themes"), set([0]))
+    self.assertEqual(journal.get_done_tasks("unknown"), set())
+
+  def test_no_resume(self):
+    """
+    Without --resume, every task is executed and the previous journal is replaced
+    """
+    self.fail_run()
+    journal = Journal(self.path, "install", VARIABLES)
+    journal.start(self.roles, False)
+    self.assertEqual(journal.get_done_tasks("base"), set())
+    journal = Journal(self.path, "install", VARIABLES)
+    journal.start(self.roles, True)
+    self.assertEqual(journal.get_done_tasks("base"), set())
+
+  def test_changed_run(self):
+    """
+    A run for another action or user does not resume
+    """
+    self.fail_run()
+    for action, variables in [("uninstall", VARIABLES), ("install", dict(VARIABLES, remote_user="other"))]:
+      journal = Journal(self.path, action, variables)
+      journal.start(self.roles, True)
+      self.assertEqual(journal.get_done_tasks("base"), set())
+      self.fail_run()
+
+  def test_changed_part(self):
+    """
+    A part whose tasks file or inputs changed executes all its tasks again
+    """
+    self.fail_run()
+    with open(self.roles["base"][0], "a") as stream:
+      stream.write("- name: new task\n")
+    journal = Journal(self.path, "install", VARIABLES)
+    journal.start(dict(self.roles, themes=(self.roles["themes"][0], dict(INPUTS, library="c"))), True)
+    self.assertEqual(journal.get_done_tasks("base"), set())
+    self.assertEqual(journal.get_done_tasks("themes"), set())
+
+  def test_unreadable_journal(self):
+    """
+    An unreadable journal is ignored
+    """
+    os.makedirs(os.path.dirname(self.path))
+    with open(self.path, "w") as stream:
+      stream.write("{")
+    journal = Journal(self.path, "install", VARIABLES)
+    journal.start(self.roles, True)
+    self.assertEqual(journal.get_done_tasks("base"), set())
+
+  def test_remove(self):
+    """
+    The journal is removed once the run succeeded
+    """
+    self.fail_run()
+    Journal(self.path, "install", VARIABLES).remove()
+    self.assertFalse(os.path.exists(self.path))
+
+  def test_apply_journal(self):
+    """
+    The completed tasks are removed from the play, except the ones registering a variable
+    """
+    self.fail_run()
+    journal = Journal(self.path, "install", VARIABLES)
+    journal.start(self.roles, True)
+    base_tasks = [FakeTask(), FakeTask(register="result"), FakeTask()]
+    themes_tasks = [FakeTask(), FakeTask()]
+    play = FakePlay([FakeRole("base", [FakeBlock(base_tasks[:2]), FakeBlock(base_tasks[2:])]),
+                     FakeRole("themes", [FakeBlock(themes_tasks)])])
+    self.assertEqual(apply_journal(play, journal), 2)
+    self.assertEqual(play.get_roles()[0]._task_blocks[0].block, [base_tasks[1]]) # pylint: disable=protected-access
+    self.assertEqual(play.get_roles()[0]._task_blocks[1].block, [base_tasks[2]]) # pylint: disable=protected-access
+    self.assertEqual(base_tasks[2].vars[JOURNAL_VAR], "base:2")
+    self.assertEqual(play.get_roles()[1]._task_blocks[0].block, [themes_tasks[1]]) # pylint: disable=protected-access
+    self.assertEqual(parse_task_id(themes_tasks[1].vars[JOURNAL_VAR]), ("themes", 1))
+
+  def test_task_id(self):
+    """
+    Task identifiers give back the role and index
+    """
+    self.assertEqual(parse_task_id(get_task_id("i3-xfce:user", 12)), ("i3-xfce:user", 12))
+
+if __name__ == "__main__":
+  unittest.main()
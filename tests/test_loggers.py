@@ -0,0 +1,97 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the loggers module
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from i3xfce.loggers import RingBufferHandler # pylint: disable=wrong-import-position
+
+class RingBufferHandlerTest(unittest.TestCase):
+  """
+  Tests of the RingBufferHandler class
+  """
+
+  def setUp(self):
+    """
+    Create a logger writing to a crash buffer
+    """
+    self.tmp_dir = tempfile.mkdtemp()
+    self.handler = RingBufferHandler(4096)
+    self.logger = logging.getLogger("i3-xfce.tests")
+    self.logger.propagate = False
+    self.logger.setLevel(logging.DEBUG)
+    self.logger.addHandler(self.handler)
+
+  def tearDown(self):
+    """
+    Remove the handler and the temporary files
+    """
+    self.logger.removeHandler(self.handler)
+    shutil.rmtree(self.tmp_dir)
+
+  def read(self):
+    """
+    Write the buffer and read the messages back
+    """
+    path = os.path.join(self.tmp_dir, "crash.log")
+    self.handler.write(path)
+    with open(path) as crash_file:
+      return [json.loads(line)["message"] for line in crash_file]
+
+  def test_last_records(self):
+    """
+    The oldest records are dropped when the capacity is exceeded
+    """
+    for index in range(100):
+      self.logger.debug("Record %i", index)
+    messages = self.read()
+    self.assertLess(len(messages), 100)
+    self.assertEqual(messages[-1], "Record 99")
+    self.assertEqual(messages, ["Record {}".format(index) for index in range(100 - len(messages), 100)])
+
+  def test_capacity(self):
+    """
+    A capacity of 0 drops every record
+    """
+    self.logger.debug("Record")
+    self.handler.set_capacity(0)
+    self.logger.debug("Record")
+    self.assertEqual(self.read(), [])
+
+  def test_unicode(self):
+    """
+    Non ascii messages and arguments are kept, as well as messages that are not strings
+    """
+    self.logger.debug(u"T\xe2che %s termin\xe9e", u"\xe9t\xe9")
+    self.logger.debug(["install", "base"])
+    self.assertEqual(self.read(), [u"T\xe2che \xe9t\xe9 termin\xe9e", "['install', 'base']"])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the manifest module
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from i3xfce.manifest import Manifest, get_part_targets, get_part_packages, get_part_repositories # pylint: disable=wrong-import-position
+from i3xfce.planner import RolePlanner # pylint: disable=wrong-import-position
+
+ROLESDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "i3xfce", "resources", "roles")
+PARTS = ["base", "themes", "utilities"]
+
+class ManifestTest(unittest.TestCase):
+  """
+  Tests of the manifest built from the plan of the shipped roles
+  """
+
+  def setUp(self):
+    """
+    Plan the install roles for a user of a temporary system root
+    """
+    self.plan = RolePlanner(ROLESDIR).plan("install", PARTS)
+    # Paths in /tmp are scratch files the manifest ignores
+    self.tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(__file__)))
+    self.variables = dict(remote_user="user", user_home=os.path.join(self.tmp_dir, "home"),
+                          sysroot=os.path.join(self.tmp_dir, "root"))
+
+  def tearDown(self):
+    """
+    Remove the temporary system root
+    """
+    shutil.rmtree(self.tmp_dir)
+
+  def get_targets(self, part):
+    """
+    Get the targets of a part relative to the temporary directory
+    """
+    return [os.path.relpath(path, self.tmp_dir) for path in get_part_targets(self.plan, part, self.variables)]
+
+  def test_part_targets(self):
+    """
+    Every file left in a known state by a part is tracked
+    """
+    targets = self.get_targets("base")
+    for path in ["home/.config/autostart/i3.desktop", "home/.config/xfce4/xfconf/xfce-perchannel-xml",
+                 "home/.config/xfce4/xfconf/xfce-perchannel-xml/xfce4-session.xml",
+                 "root/usr/share/applications/xfce-wm-settings.desktop"]:
+      self.assertIn(path, targets)
+    # Removed paths are not targets
+    self.assertNotIn("home/.cache/sessions", targets)
+
+    targets = self.get_targets("themes")
+    for path in ["home/.i3", "home/.i3/config", "home/.conky/conkyrc_left", "home/.compton.conf",
+                 "home/.fonts/openlogos.ttf", "root/etc/lightdm/lightdm-gtk-greeter.conf",
+                 "root/usr/share/backgrounds/Numix_Lightbulb.png"]:
+      self.assertIn(path, targets)
+
+    targets = self.get_targets("utilities")
+    for path in ["home/.config/albert/albert.conf", "home/.zshrc", "home/.oh-my-zsh"]:
+      self.assertIn(path, targets)
+    # Downloads are scratch files
+    self.assertNotIn("/tmp/j4-desktop-menu.tar.gz", get_part_targets(self.plan, "utilities", self.variables))
+
+  def test_unresolved_targets(self):
+    """
+    Destinations using variables the manifest does not know are skipped
+    """
+    targets = get_part_targets(self.plan, "themes", dict(remote_user="user", sysroot=""))
+    self.assertEqual([path for path in targets if "{{" in path], [])
+    self.assertIn("/etc/lightdm/lightdm-gtk-greeter.conf", targets)
+
+  def test_part_packages(self):
+    """
+    The packages and repositories of a part are tracked
+    """
+    self.assertIn("i3-wm", get_part_packages(self.plan, "base"))
+    self.assertIn("numix-gtk-theme", get_part_packages(self.plan, "themes"))
+    self.assertEqual(get_part_repositories(self.plan, "themes"), ["ppa:numix/ppa"])
+    self.assertIn("ppa:aacebedo/fasd", get_part_repositories(self.plan, "utilities"))
+
+  def test_change_reason(self):
+    """
+    A part changes when its inputs or one of its targets change
+    """
+    zshrc = os.path.join(self.variables["user_home"], ".zshrc")
+    os.makedirs(self.variables["user_home"])
+    with open(zshrc, "w") as zshrc_file:
+      zshrc_file.write("ZSH_THEME=agnoster\n")
+    path = os.path.join(self.tmp_dir, "state", "manifest.json")
+    manifest = Manifest(path, self.variables)
+    inputs = dict(version="1", role="a", library="b")
+    manifest.update_part("utilities", inputs, self.plan, self.variables)
+    manifest.save()
+
+    manifest = Manifest(path, self.variables)
+    manifest.load()
+    self.assertEqual(manifest.get_change_reason("base", inputs), "not installed by a previous run")
+    self.assertEqual(manifest.get_change_reason("utilities", dict(inputs, role="c")), "its files changed")
+    with open(zshrc, "a") as zshrc_file:
+      zshrc_file.write("plugins=(git)\n")
+    self.assertEqual(manifest.get_change_reason("utilities", inputs), "{} was modified".format(zshrc))
+    self.assertEqual(Manifest(path, dict(self.variables, remote_user="other")).get_change_reason("utilities", inputs),
+                     "not installed by a previous run")
+
+if __name__ == "__main__":
+  unittest.main()
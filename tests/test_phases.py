@@ -0,0 +1,163 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the phases module
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import i3xfce.phases # pylint: disable=wrong-import-position
+from i3xfce.planner import RolePlanner # pylint: disable=wrong-import-position
+
+ROLESDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "i3xfce", "resources", "roles")
+PARTS = ["base", "themes", "utilities"]
+
+class PhasesTest(unittest.TestCase):
+  """
+  Tests of the phases built from the plan of the shipped roles
+  """
+
+  def setUp(self):
+    """
+    Plan the roles shipped with the package
+    """
+    planner = RolePlanner(ROLESDIR)
+    self.install = planner.plan("install", PARTS)
+    self.uninstall = planner.plan("uninstall", PARTS)
+
+  @staticmethod
+  def get_role_items(plan, module, state):
+    """
+    Get the items looped over by the role tasks of a module for a state
+    """
+    return [item for task in plan.get_tasks() if task.module == module and task.args.get("state") == state
+            for item in task.items]
+
+  def test_install_repositories(self):
+    """
+    Every PPA of the install roles is added before the packages are installed
+    """
+    tasks = i3xfce.phases.get_pre_tasks("install", self.install)
+    repositories = [task for task in tasks if "apt_repository" in task]
+    self.assertEqual(len(repositories), 1)
+    self.assertIn("state=present", repositories[0]["apt_repository"])
+    self.assertEqual(sorted(repositories[0]["with_items"]),
+                     sorted(set(self.get_role_items(self.install, "apt_repository", "present"))))
+    names = [task["name"] for task in tasks]
+    self.assertLess(names.index(repositories[0]["name"]), names.index("Refresh apt cache"))
+    self.assertLess(names.index("Refresh apt cache"), names.index("Install packages of the selected parts using apt"))
+
+  def test_uninstall_repositories(self):
+    """
+    Every PPA removed by the uninstall roles is removed after them
+    """
+    expected = self.get_role_items(self.uninstall, "apt_repository", "absent")
+    self.assertNotEqual(len(expected), 0)
+    tasks = i3xfce.phases.get_post_tasks("uninstall", self.uninstall)
+    self.assertIn("state=absent", tasks[0]["apt_repository"])
+    self.assertEqual(sorted(tasks[0]["with_items"]), sorted(set(expected)))
+    self.assertEqual(tasks[1]["name"], "Refresh apt cache")
+    self.assertEqual(i3xfce.phases.get_pre_tasks("uninstall", self.uninstall), [])
+
+  def test_apt_transaction(self):
+    """
+    The packages of every part are installed in one transaction
+    """
+    tasks = [task for task in i3xfce.phases.get_pre_tasks("install", self.install) if "apt" in task]
+    self.assertEqual(len(tasks), 1)
+    self.assertEqual(sorted(tasks[0]["apt"]["name"]),
+                     sorted(set(self.get_role_items(self.install, "apt", "installed"))))
+
+  def test_prefetch_tasks(self):
+    """
+    The downloads of the roles are started in the background before the apt phases and waited for after them
+    """
+    tasks = i3xfce.phases.get_pre_tasks("install", self.install)
+    names = [task["name"] for task in tasks]
+    self.assertEqual(names[:3], ["Start prefetch of j4-desktop-menu.tar.gz", "Start prefetch of git mirrors",
+                                 "Start prefetch of python wheels"])
+    self.assertEqual(names[-3:], ["Wait for prefetch of j4-desktop-menu.tar.gz", "Wait for prefetch of git mirrors",
+                                  "Wait for prefetch of python wheels"])
+
+    download = tasks[0]
+    self.assertEqual(download["get_url"], {"url": "{{j4_dmenu_url}}", "dest": "/tmp/j4-desktop-menu.tar.gz"})
+    self.assertEqual(download["poll"], 0)
+    self.assertEqual(tasks[-3]["async_status"], "jid={{{{{}.ansible_job_id}}}}".format(download["register"]))
+
+    mirror = tasks[1]["shell"]
+    self.assertIn("git clone -q --mirror {{ohmyzsh_repo}} {{i3xfce_git_mirror_dir}}/{{ohmyzsh_repo|basename}}.tmp",
+                  mirror)
+    self.assertEqual(tasks[-2]["register"], i3xfce.phases.PREFETCH_GIT_VAR)
+    self.assertIn("pip wheel", tasks[2]["shell"])
+
+  def test_offline_prefetch(self):
+    """
+    Nothing is downloaded when installing from a bundle
+    """
+    names = [task["name"] for task in i3xfce.phases.get_pre_tasks("install", self.install, offline=True)]
+    self.assertFalse([name for name in names if "prefetch" in name])
+
+  def test_mirror_path(self):
+    """
+    Mirrors are named after the last component of the repository url
+    """
+    self.assertEqual(i3xfce.phases.get_mirror_path("https://github.com/robbyrussell/oh-my-zsh.git/"),
+                     "{{i3xfce_git_mirror_dir}}/oh-my-zsh.git")
+    self.assertEqual(i3xfce.phases.get_mirror_path("{{ ohmyzsh_repo }}"),
+                     "{{i3xfce_git_mirror_dir}}/{{ohmyzsh_repo|basename}}")
+
+  def test_written_paths(self):
+    """
+    Every path the install roles write in the user home gets its ownership fixed
+    """
+    paths, trees = i3xfce.phases.get_written_paths(self.install)
+    for path in [".config/autostart/i3.desktop", ".config/albert/albert.conf", ".i3", ".i3/config", ".conky",
+                 ".conky/conkyrc_left", ".fonts", ".zshrc", ".compton.conf", ".oh-my-zsh",
+                 ".config/xfce4/xfconf/xfce-perchannel-xml/xsettings.xml"]:
+      self.assertIn("{{user_home}}/" + path, paths)
+    self.assertEqual(trees, ["{{user_home}}/.oh-my-zsh"])
+    self.assertFalse([path for path in paths if not path.startswith("{{user_home}}/")])
+
+  def test_ownership_tasks(self):
+    """
+    The ownership is fixed after the roles, recursively for the trees
+    """
+    tasks = i3xfce.phases.get_post_tasks("install", self.install)
+    self.assertEqual(len(tasks), 1)
+    cmd = tasks[0]["shell"]
+    self.assertIn("{{user_home}}/.i3 ", cmd)
+    self.assertIn("for p in {{user_home}}/.oh-my-zsh; do [ ! -e \"$p\" ] || find \"$p\" -mindepth 1 ", cmd)
+
+  def test_fallback_ownership_tasks(self):
+    """
+    Without a plan, the trees written in the user home are fixed recursively
+    """
+    cmd = i3xfce.phases.get_fallback_ownership_tasks()[0]["shell"]
+    for tree in [".config", ".i3", ".conky", ".fonts", ".oh-my-zsh"]:
+      self.assertIn("{{user_home}}/" + tree, cmd)
+    self.assertNotIn("-maxdepth", cmd)
+    self.assertNotIn("-mindepth", cmd)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the planner module
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from i3xfce.planner import RolePlanner, PlanningException # pylint: disable=wrong-import-position
+
+ROLESDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "i3xfce", "resources", "roles")
+PARTS = ["base", "themes", "utilities"]
+
+class RolePlannerTest(unittest.TestCase):
+  """
+  Tests of the RolePlanner class
+  """
+
+  def setUp(self):
+    """
+    Plan the roles shipped with the package
+    """
+    planner = RolePlanner(ROLESDIR)
+    self.install = planner.plan("install", PARTS)
+    self.uninstall = planner.plan("uninstall", PARTS)
+
+  def get_task(self, plan, role, name):
+    """
+    Get a planned task by role and name
+    """
+    tasks = [task for task in plan.get_role_tasks(role) if task.name == name]
+    self.assertEqual(len(tasks), 1, "Task '{}' of role {} not found".format(name, role))
+    return tasks[0]
+
+  def test_key_value_args(self):
+    """
+    Arguments given as key=value are parsed like Ansible does
+    """
+    task = self.get_task(self.install, "themes", "Copy i3 configuration files")
+    self.assertEqual(task.module, "copy")
+    self.assertEqual(task.args, {"src": "i3/{{item}}", "dest": "{{user_home}}/.i3/", "owner": "{{remote_user}}",
+                                 "group": "{{remote_user}}", "mode": "u=rw"})
+    self.assertEqual(task.loop_size, len(task.items))
+
+    task = self.get_task(self.install, "utilities", "Download j4-desktop-menu")
+    self.assertEqual(task.args, {"url": "{{j4_dmenu_url}}", "dest": "/tmp/j4-desktop-menu.tar.gz"})
+
+    task = self.get_task(self.install, "utilities", "Install ohmyzsh")
+    self.assertEqual(task.args["repo"], "{{ohmyzsh_repo}}")
+    self.assertEqual(task.args["dest"], "{{user_home}}/.oh-my-zsh")
+
+  def test_no_raw_params(self):
+    """
+    Only the free form modules have a command line
+    """
+    for plan in [self.install, self.uninstall]:
+      for task in plan.get_tasks():
+        if task.module in ["shell", "command", "script", "raw"]:
+          self.assertIn("_raw_params", task.args)
+        else:
+          self.assertNotIn("_raw_params", task.args, "{} of role {}".format(task.name, task.role))
+
+  def test_repository_states(self):
+    """
+    The state of the repository tasks is parsed
+    """
+    for plan, state in [(self.install, "present"), (self.uninstall, "absent")]:
+      tasks = [task for task in plan.get_tasks() if task.module == "apt_repository"]
+      self.assertNotEqual(len(tasks), 0)
+      for task in tasks:
+        self.assertEqual(task.args["state"], state)
+        self.assertEqual(task.args["repo"], "{{item}}")
+
+  def test_raw_params(self):
+    """
+    Free form commands keep their options apart from the command line
+    """
+    planner = RolePlanner(ROLESDIR)
+    task = planner.plan_tasks("test", [{"shell": "make install chdir=/tmp/build creates=/usr/bin/tool"}])[0]
+    self.assertEqual(task.args, {"_raw_params": "make install", "chdir": "/tmp/build", "creates": "/usr/bin/tool"})
+
+  def test_args_keyword(self):
+    """
+    Arguments given with the args keyword are merged
+    """
+    planner = RolePlanner(ROLESDIR)
+    task = planner.plan_tasks("test", [{"file": "path=/tmp/a", "args": {"state": "directory"}}])[0]
+    self.assertEqual(task.args, {"path": "/tmp/a", "state": "directory"})
+
+  def test_unsupported_task(self):
+    """
+    Tasks the planner cannot expand are rejected
+    """
+    planner = RolePlanner(ROLESDIR)
+    self.assertRaises(PlanningException, planner.plan_tasks, "test", [{"include": "other.yml"}])
+    self.assertRaises(PlanningException, planner.plan_tasks, "test", [{"name": "no module"}])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the profiler module
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import i3xfce.loggers # pylint: disable=wrong-import-position
+import i3xfce.profiler # pylint: disable=wrong-import-position
+
+class FakeTime(object):
+  """
+  Clock of the profiler, only moving when told to
+  """
+
+  def __init__(self):
+    """
+    Constructor
+    """
+    self.now = 1000.0
+    self.gmtime = time.gmtime
+    self.strftime = time.strftime
+
+  def time(self):
+    """
+    Get the current time
+    """
+    return self.now
+
+class ListHandler(logging.Handler):
+  """
+  Handler keeping the messages it receives
+  """
+
+  def __init__(self):
+    """
+    Constructor
+    """
+    logging.Handler.__init__(self)
+    self.messages = []
+
+  def emit(self, record):
+    """
+    Keep a message
+    """
+    self.messages.append(record.getMessage())
+
+class TaskProfilerTest(unittest.TestCase):
+  """
+  Tests of the TaskProfiler class
+  """
+
+  def setUp(self):
+    """
+    Record a run of three tasks in two roles with a fake clock
+    """
+    self.tmp_dir = tempfile.mkdtemp()
+    self.clock = FakeTime()
+    self.time_module = i3xfce.profiler.time
+    i3xfce.profiler.time = self.clock
+    self.profiler = i3xfce.profiler.TaskProfiler()
+
+    self.at_time(1, self.profiler.task_started, "base", "Install packages")
+    self.at_time(6, self.profiler.result_received)
+    self.at_time(6, self.profiler.task_started, "base", "Copy i3 config")
+    self.at_time(7, self.profiler.result_received)
+    self.at_time(7, self.profiler.task_started, "themes", "Download fonts")
+    self.at_time(8, self.profiler.item_completed, "font-a")
+    self.profiler.add_callback_time(0.5)
+    self.at_time(10, self.profiler.item_completed, "font-b")
+    self.at_time(10, self.profiler.result_received)
+    self.at_time(11, self.profiler.stop)
+
+  def tearDown(self):
+    """
+    Restore the clock and remove the temporary files
+    """
+    i3xfce.profiler.time = self.time_module
+    shutil.rmtree(self.tmp_dir)
+
+  def at_time(self, offset, event, *args):
+    """
+    Send an event to the profiler a number of seconds after the start of the run
+    """
+    self.clock.now = 1000.0 + offset
+    event(*args)
+
+  def test_report(self):
+    """
+    The written report has the time of every task and the totals of every role
+    """
+    path = os.path.join(self.tmp_dir, "profile.json")
+    self.profiler.write_report(path)
+    with open(path) as report_file:
+      report = json.load(report_file)
+
+    self.assertEqual(report["version"], i3xfce.profiler.REPORT_VERSION)
+    self.assertEqual(report["wall_time"], 11.0)
+    self.assertEqual(report["callback_time"], 0.5)
+    self.assertEqual([(task["role"], task["name"], task["wall_time"], task["results"]) for task in report["tasks"]],
+                     [("base", "Install packages", 5.0, 1), ("base", "Copy i3 config", 1.0, 1),
+                      ("themes", "Download fonts", 3.0, 1)])
+    fonts = report["tasks"][2]
+    self.assertEqual(fonts["worker_time"], 2.5)
+    self.assertEqual(fonts["callback_time"], 0.5)
+    self.assertEqual(fonts["items"], [dict(item="font-a", time=1.0), dict(item="font-b", time=2.0)])
+    self.assertEqual(report["roles"], dict(base=dict(wall_time=6.0, worker_time=6.0, callback_time=0.0, tasks=2),
+                                           themes=dict(wall_time=3.0, worker_time=2.5, callback_time=0.5, tasks=1)))
+
+  def test_top_tasks(self):
+    """
+    The slowest tasks are given first and only the requested number of them is logged
+    """
+    self.assertEqual([task["name"] for task in self.profiler.get_top_tasks(2)],
+                     ["Install packages", "Download fonts"])
+    handler = ListHandler()
+    level = i3xfce.loggers.ROOTLOGGER.level
+    i3xfce.loggers.ROOTLOGGER.addHandler(handler)
+    i3xfce.loggers.ROOTLOGGER.setLevel(logging.INFO)
+    try:
+      self.profiler.log_summary(2)
+    finally:
+      i3xfce.loggers.ROOTLOGGER.removeHandler(handler)
+      i3xfce.loggers.ROOTLOGGER.setLevel(level)
+    self.assertEqual(handler.messages[1:], ["    6.00s  part base (2 tasks)",
+                                            "    3.00s  part themes (1 tasks)",
+                                            "    5.00s  base : Install packages (worker 5.00s, callback 0.00s)",
+                                            "    3.00s  themes : Download fonts (worker 2.50s, callback 0.50s)"])
+
+if __name__ == "__main__":
+  unittest.main()
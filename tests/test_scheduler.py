@@ -0,0 +1,125 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the scheduler module
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from i3xfce.planner import PlannedTask # pylint: disable=wrong-import-position
+from i3xfce.scheduler import Scheduler, ScheduledTask, depends_on # pylint: disable=wrong-import-position
+
+APT = PlannedTask(role="base", index=0, name="Install xfce4", module="apt",
+                  args=dict(name="xfce4", state="installed"), items=None, loop_size=None)
+LIGHTDM = PlannedTask(role="base", index=1, name="Configure lightdm", module="copy",
+                      args=dict(src="lightdm.conf", dest="/etc/lightdm/lightdm.conf"), items=None, loop_size=None)
+I3_DIR = PlannedTask(role="themes", index=0, name="Create i3 directory", module="file",
+                     args=dict(path="{{user_home}}/.i3", state="directory"), items=None, loop_size=None)
+I3_CONFIG = PlannedTask(role="themes", index=1, name="Copy i3 config", module="copy",
+                        args=dict(src="config", dest="{{user_home}}/.i3/config"), items=None, loop_size=None)
+DOWNLOAD = PlannedTask(role="utilities", index=0, name="Download j4-desktop-menu", module="get_url",
+                       args=dict(url="{{j4_dmenu_url}}", dest="/tmp/j4-desktop-menu.tar.gz"), items=None,
+                       loop_size=None)
+CLONE = PlannedTask(role="utilities", index=1, name="Clone oh-my-zsh", module="git",
+                    args=dict(repo="{{ohmyzsh_repo}}", dest="{{user_home}}/.oh-my-zsh"), items=None, loop_size=None)
+ZSHRC = PlannedTask(role="utilities", index=2, name="Copy zsh config", module="copy",
+                    args=dict(src="zshrc", dest="{{user_home}}/.zshrc"), items=None, loop_size=None)
+BUILD = PlannedTask(role="utilities", index=3, name="Build j4-desktop-menu", module="i3xfce_build",
+                    args=dict(src="/tmp/j4-desktop-menu.tar.gz", cache_dir="{{i3xfce_cache_dir}}/builds",
+                              sysroot="{{sysroot}}/"), items=None, loop_size=None)
+
+class FakeTask(object): # pylint: disable=too-few-public-methods,too-many-instance-attributes
+  """
+  Task of a loaded play
+  """
+
+  def __init__(self, planned):
+    """
+    Constructor
+    """
+    self.name = planned.name
+    self.action = planned.module
+    self.args = dict(planned.args)
+    self.loop_args = planned.items
+    self.loop = "items" if planned.items is not None else None
+    self.when = None
+    self.changed_when = None
+    self.failed_when = None
+    self.until = None
+    self.register = None
+    self.vars = {}
+    self.delegate_to = None
+    setattr(self, "async", 0)
+
+class SchedulerTest(unittest.TestCase):
+  """
+  Tests of the order given by the Scheduler class
+  """
+
+  @staticmethod
+  def get_order(planned_tasks, jobs=4):
+    """
+    Get the steps executing planned tasks, as the step and the name of the task
+    """
+    tasks = [ScheduledTask(FakeTask(planned), index) for index, planned in enumerate(planned_tasks)]
+    return [(step, task.name) for step, task in Scheduler(jobs)._get_order(tasks)] # pylint: disable=protected-access
+
+  def test_directory_before_file(self):
+    """
+    A file written in a directory created by an earlier task stays after it
+    """
+    tasks = [ScheduledTask(FakeTask(planned), index) for index, planned in enumerate([I3_DIR, I3_CONFIG])]
+    self.assertTrue(depends_on(tasks[0], tasks[1]))
+
+    order = self.get_order([APT, I3_DIR, I3_CONFIG])
+    self.assertEqual(order, [("start", "Install xfce4"), ("run", "Create i3 directory"), ("run", "Copy i3 config"),
+                             ("wait", "Install xfce4")])
+
+  def test_wait_for_packages(self):
+    """
+    System files wait for the apt transaction, the files of the user home do not
+    """
+    order = self.get_order([APT, LIGHTDM, I3_CONFIG])
+    self.assertEqual(order, [("start", "Install xfce4"), ("run", "Copy i3 config"), ("wait", "Install xfce4"),
+                             ("run", "Configure lightdm")])
+
+  def test_background_downloads(self):
+    """
+    Independent downloads are started in the background and waited for before their first consumer
+    """
+    order = self.get_order([DOWNLOAD, CLONE, ZSHRC, BUILD])
+    self.assertEqual(order[:3], [("start", "Download j4-desktop-menu"), ("start", "Clone oh-my-zsh"),
+                                 ("run", "Copy zsh config")])
+    self.assertLess(order.index(("wait", "Download j4-desktop-menu")), order.index(("start", "Build j4-desktop-menu")))
+    self.assertIn(("wait", "Clone oh-my-zsh"), order)
+
+  def test_single_job(self):
+    """
+    With a single job the tasks are executed in their order
+    """
+    planned_tasks = [APT, LIGHTDM, I3_DIR, I3_CONFIG, DOWNLOAD, CLONE, ZSHRC, BUILD]
+    self.assertEqual(self.get_order(planned_tasks, 1), [("run", planned.name) for planned in planned_tasks])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the status module
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from i3xfce.manifest import Manifest # pylint: disable=wrong-import-position
+from i3xfce.planner import RolePlanner # pylint: disable=wrong-import-position
+from i3xfce.status import StatusChecker, is_repository_enabled # pylint: disable=wrong-import-position
+
+ROLESDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "i3xfce", "resources", "roles")
+PARTS = ["base", "themes", "utilities"]
+
+class StatusCheckerTest(unittest.TestCase):
+  """
+  Tests of the StatusChecker class over the plan of the shipped roles
+  """
+
+  def setUp(self):
+    """
+    Record the themes part as installed for a temporary home and system root
+    """
+    # Paths in /tmp are scratch files the manifest ignores
+    self.tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(__file__)))
+    self.home = os.path.join(self.tmp_dir, "home")
+    self.sysroot = os.path.join(self.tmp_dir, "root")
+    self.variables = dict(remote_user="user", user_home=self.home, sysroot=self.sysroot)
+    for name, content in [("home/.i3/config", "set $mod Mod4\n"), ("home/.compton.conf", "shadow = true;\n"),
+                          ("root/etc/lightdm/lightdm-gtk-greeter.conf", "[greeter]\n")]:
+      path = os.path.join(self.tmp_dir, name)
+      if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+      with open(path, "w") as stream:
+        stream.write(content)
+    self.manifest = Manifest(os.path.join(self.tmp_dir, "manifest.json"), self.variables)
+    self.manifest.update_part("themes", {}, RolePlanner(ROLESDIR).plan("install", PARTS), self.variables)
+
+  def tearDown(self):
+    """
+    Remove the temporary system root
+    """
+    shutil.rmtree(self.tmp_dir)
+
+  def check(self):
+    """
+    Get the drifts of the files of the themes part, its packages and repositories are checked on the host
+    """
+    report = StatusChecker(self.manifest, 2).check(["base", "themes"])
+    self.assertEqual(report["base"], ["not installed"])
+    return [drift for drift in report["themes"] if not drift.startswith(("package ", "repository "))]
+
+  def test_unchanged(self):
+    """
+    Files left as they were installed are not reported
+    """
+    drifts = self.check()
+    self.assertNotIn("{} was modified".format(os.path.join(self.home, ".i3", "config")), drifts)
+    self.assertNotIn("{} is missing".format(os.path.join(self.home, ".compton.conf")), drifts)
+    self.assertNotIn("{} is missing".format(os.path.join(self.sysroot, "etc", "lightdm", "lightdm-gtk-greeter.conf")),
+                     drifts)
+
+  def test_drifts(self):
+    """
+    Modified and removed files are reported
+    """
+    with open(os.path.join(self.home, ".i3", "config"), "a") as stream:
+      stream.write("bindsym $mod+Return exec xfce4-terminal\n")
+    os.remove(os.path.join(self.home, ".compton.conf"))
+    with open(os.path.join(self.sysroot, "etc", "lightdm", "lightdm-gtk-greeter.conf"), "w") as stream:
+      stream.write("[greeter]\ntheme-name=Numix\n")
+    drifts = self.check()
+    self.assertIn("{} was modified".format(os.path.join(self.home, ".i3", "config")), drifts)
+    self.assertIn("{} is missing".format(os.path.join(self.home, ".compton.conf")), drifts)
+    self.assertIn("{} was modified".format(os.path.join(self.sysroot, "etc", "lightdm", "lightdm-gtk-greeter.conf")),
+                  drifts)
+
+  def test_repository_enabled(self):
+    """
+    PPAs are matched against the launchpad sources
+    """
+    sources = ["deb http://ppa.launchpad.net/numix/ppa/ubuntu xenial main"]
+    self.assertTrue(is_repository_enabled("ppa:numix/ppa", sources))
+    self.assertFalse(is_repository_enabled("ppa:aacebedo/fasd", sources))
+    self.assertTrue(is_repository_enabled("deb  http://ppa.launchpad.net/numix/ppa/ubuntu xenial main", sources))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python2
+
+##########################################################################
+# i3-xfce
+# Copyright (c) 2014, Alexandre ACEBEDO, All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3.0 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.
+##########################################################################
+"""
+Tests of the i3xfce_xfconf module
+"""
+
+import os
+import imp
+import unittest
+from xml.etree import ElementTree
+
+LIBRARYDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "i3xfce", "resources", "library")
+i3xfce_xfconf = imp.load_source("i3xfce_xfconf", os.path.join(LIBRARYDIR, "i3xfce_xfconf.py")) # pylint: disable=invalid-name
+
+XSETTINGS = """<?xml version="1.0" encoding="UTF-8"?>
+
+<channel name="xsettings" version="1.0">
+  <property name="Net" type="empty">
+    <property name="ThemeName" type="string" value="Greybird"/>
+    <property name="IconThemeName" type="string" value="elementary-xfce-dark"/>
+  </property>
+  <property name="Xft" type="empty">
+    <property name="DPI" type="empty"/>
+  </property>
+</channel>
+"""
+
+class ApplyPropertyTest(unittest.TestCase):
+  """
+  Tests of the apply_property function
+  """
+
+  def setUp(self):
+    """
+    Parse a channel
+    """
+    self.channel = ElementTree.fromstring(XSETTINGS.split("\n", 2)[2])
+
+  def get_property(self, path):
+    """
+    Get the element of a property by path
+    """
+    node = self.channel
+    for name in path.strip("/").split("/"):
+      node = i3xfce_xfconf.find_property(node, name)
+      if node is None:
+        return None
+    return node
+
+  def serialize(self):
+    """
+    Serialize the channel like the module writes it
+    """
+    return '<?xml version="1.0" encoding="UTF-8"?>\n\n' + i3xfce_xfconf.serialize(self.channel)
+
+  def test_serialize(self):
+    """
+    A channel is written back as xfconfd wrote it
+    """
+    self.assertEqual(self.serialize(), XSETTINGS)
+
+  def test_set_property(self):
+    """
+    An existing property is changed in place
+    """
+    self.assertIsNone(i3xfce_xfconf.apply_property(self.channel, dict(path="/Net/ThemeName", type="string",
+                                                                      value="Numix")))
+    self.assertEqual(self.serialize(), XSETTINGS.replace("Greybird", "Numix"))
+
+  def test_new_property(self):
+    """
+    Missing properties and their parents are created
+    """
+    self.assertIsNone(i3xfce_xfconf.apply_property(self.channel, dict(path="/Gtk/CursorThemeName", type="string",
+                                                                      value="DMZ-White")))
+    self.assertEqual(self.get_property("/Gtk").get("type"), "empty")
+    self.assertEqual(self.get_property("/Gtk/CursorThemeName").get("value"), "DMZ-White")
+    self.assertIn('  <property name="Gtk" type="empty">\n'
+                  '    <property name="CursorThemeName" type="string" value="DMZ-White"/>\n'
+                  '  </property>\n</channel>\n', self.serialize())
+
+  def test_values(self):
+    """
+    Booleans are written in lower case and other values as strings
+    """
+    i3xfce_xfconf.apply_property(self.channel, dict(path="/Net/EnableEventSounds", type="bool", value=False))
+    i3xfce_xfconf.apply_property(self.channel, dict(path="/Xft/DPI", type="int", value=96))
+    self.assertEqual(self.get_property("/Net/EnableEventSounds").get("value"), "false")
+    self.assertEqual(self.get_property("/Xft/DPI").get("value"), "96")
+    self.assertIn('<property name="DPI" type="int" value="96"/>', self.serialize())
+
+  def test_array(self):
+    """
+    The values of an array are replaced
+    """
+    prop = dict(path="/Net/Themes", type="array", values=[dict(type="string", value="Numix"),
+                                                          dict(type="string", value="Greybird")])
+    i3xfce_xfconf.apply_property(self.channel, prop)
+    i3xfce_xfconf.apply_property(self.channel, dict(prop, values=[dict(type="string", value="Numix")]))
+    node = self.get_property("/Net/Themes")
+    self.assertEqual([value.get("value") for value in node.findall("value")], ["Numix"])
+    self.assertIsNone(node.get("value"))
+
+  def test_remove_property(self):
+    """
+    Removed properties disappear, removing a missing one does nothing
+    """
+    i3xfce_xfconf.apply_property(self.channel, dict(path="/Net/ThemeName", state="absent"))
+    self.assertIsNone(self.get_property("/Net/ThemeName"))
+    self.assertIsNone(i3xfce_xfconf.apply_property(self.channel, dict(path="/Gtk/Missing", state="absent")))
+    self.assertIsNone(self.get_property("/Gtk"))
+
+  def test_errors(self):
+    """
+    Incomplete properties are reported
+    """
+    self.assertIsNotNone(i3xfce_xfconf.apply_property(self.channel, dict(type="string", value="Numix")))
+    self.assertIsNotNone(i3xfce_xfconf.apply_property(self.channel, dict(path="/Net/ThemeName", value="Numix")))
+    self.assertIsNotNone(i3xfce_xfconf.apply_property(self.channel, dict(path="/Net/ThemeName", type="string")))
+
+if __name__ == "__main__":
+  unittest.main()